@@ -15,10 +15,63 @@ Visit quick start guide at: https://platform.openai.com/docs/quickstart
 # get api key from environment variable
 # OPENAI_API_KEY="your-openai-api-key-here"  # Replace with your actual OpenAI API key
 import os 
+import asyncio
+import httpx
+import textwrap
+import weakref
+from collections import OrderedDict
+import numpy as np
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # OR, get from environment variable if set
 
-from openai import OpenAI
-client = OpenAI(api_key=OPENAI_API_KEY)
+from openai import AsyncOpenAI, DefaultAioHttpClient
+# aiohttp transport handles many concurrent requests better than the default httpx one
+# (pip install "openai[aiohttp]")
+# Keep warm connections around so repeated calls skip the TCP/TLS handshake
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0)
+# Cap in-flight requests: unbounded parallel calls make latency worse,
+# not better. Kept below max_connections so the semaphore, not the pool, is the limit.
+_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+
+# The aiohttp session and the semaphore are bound to the loop they were created on,
+# so keep one of each per running loop; repeated asyncio.run() calls then never
+# reuse a client whose loop has already been closed.
+_LOOP_RESOURCES = weakref.WeakKeyDictionary()
+
+
+def _loop_resources():
+    loop = asyncio.get_running_loop()
+    resources = _LOOP_RESOURCES.get(loop)
+    if resources is None:
+        resources = (
+            AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                http_client=DefaultAioHttpClient(limits=_HTTP_LIMITS, timeout=120.0),
+            ),
+            asyncio.Semaphore(_MAX_CONCURRENCY),
+        )
+        _LOOP_RESOURCES[loop] = resources
+    return resources
+
+
+def _get_client():
+    return _loop_resources()[0]
+
+
+def _get_semaphore():
+    return _loop_resources()[1]
+
+async def _print_stream(**request):
+    """Stream a response, printing text deltas as they arrive; returns the full text."""
+    chunks = []
+    async with _get_semaphore():
+        stream = await _get_client().responses.create(stream=True, **request)
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                print(event.delta, end="", flush=True)
+                chunks.append(event.delta)
+    print()
+    return "".join(chunks)
+
 
 """
 Basic example
@@ -64,60 +117,180 @@ Ask with placeholder example
 
 
 
+"""
+Semantic cache - reuse answers for questions that mean the same thing
+"""
+class SemanticCache:
+    """
+    Embedding-based response cache. A new query reuses a stored response when its
+    cosine similarity to a previous query (with the same scope) is >= threshold.
+    Only use it for deterministic (temperature=0.0) calls whose inputs are short
+    rephrasable topics; factual questions that differ in one entity or number
+    still score high, so ask_question does not go through it.
+    """
+    def __init__(self, threshold=0.97, max_entries=1024, model="text-embedding-3-small"):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.model = model
+        self.scopes = {}   # scope -> [embedding matrix (max_entries, dim) float32, responses, count]
+
+    async def embed(self, text):
+        async with _get_semaphore():
+            response = await _get_client().embeddings.create(model=self.model, input=text)
+        return np.asarray(response.data[0].embedding, dtype=np.float32)
+
+    def search(self, scope, embedding):
+        entry = self.scopes.get(scope)
+        if entry is None:
+            return None
+        matrix, responses, count = entry
+        # OpenAI embeddings are unit length, so one matrix-vector product gives every cosine similarity
+        scores = matrix[:min(count, self.max_entries)] @ embedding
+        best = int(np.argmax(scores))
+        return responses[best] if scores[best] >= self.threshold else None
+
+    def store(self, scope, embedding, response):
+        entry = self.scopes.get(scope)
+        if entry is None:
+            entry = self.scopes[scope] = [np.empty((self.max_entries, embedding.shape[0]), dtype=np.float32),
+                                          [None] * self.max_entries, 0]
+        matrix, responses, count = entry
+        # Ring buffer: once full, the oldest entry is overwritten
+        row = count % self.max_entries
+        matrix[row] = embedding
+        responses[row] = response
+        entry[2] = count + 1
+
+_SEMANTIC_CACHE = SemanticCache()
+
+
 """
 Wrap up example to a function
 """
-def research_topic(topic, model="gpt-4.1-mini", 
-                   instructions="You are a research assistant. Read the user's topic and return a concise summary of recent and reliable information in one paragraph. Include sources when relevant.", 
+# System prompts are module constants so every call sends a byte-identical prefix,
+# which lets OpenAI's server-side prompt caching reuse it across calls.
+# Variable content (topic, text, user request) always goes into `input`.
+RESEARCH_INSTRUCTIONS = "You are a research assistant. Read the user's topic and return a concise summary of recent and reliable information in one paragraph. Include sources when relevant."
+
+async def _create_text(**request):
+    async with _get_semaphore():
+        response = await _get_client().responses.create(**request)
+    return response.output_text
+
+async def research_topic(topic, model="gpt-4.1-mini", 
+                   instructions=RESEARCH_INSTRUCTIONS, 
                    input_template="Can you help me research {topic} and summarize the latest findings?", 
-                   temperature=0.0):
-    response = client.responses.create(
+                   temperature=0.0, stream=False):
+    request = dict(
         model=model,
         instructions=instructions,
         input=input_template.format(topic=topic),
         temperature=temperature
     )
-    return response.output_text
+    if stream:
+        return await _print_stream(**request)
+
+    if temperature != 0.0:
+        return await _create_text(**request)
+
+    # Deterministic calls go through the semantic cache: "filter bubbles" and
+    # "echo chamber effect" style rephrasings reuse the earlier summary.
+    # The completion starts alongside the embedding so a miss waits for no extra round trip;
+    # on a hit the in-flight completion is cancelled.
+    scope = (model, instructions, input_template, temperature)
+    completion = asyncio.create_task(_create_text(**request))
+    try:
+        embedding = await _SEMANTIC_CACHE.embed(topic)
+    except BaseException:
+        completion.cancel()
+        raise
+    cached = _SEMANTIC_CACHE.search(scope, embedding)
+    if cached is not None:
+        completion.cancel()
+        return cached
+    output_text = await completion
+    _SEMANTIC_CACHE.store(scope, embedding, output_text)
+    return output_text
 
 # Example usage
-# result = research_topic("Echo chambers in social media")
+# result = asyncio.run(research_topic("Echo chambers in social media"))
 # print(result)
+# Or print tokens as they arrive:
+# result = asyncio.run(research_topic("Echo chambers in social media", stream=True))
  
  
 """
 General purpose function - ask question and get response
 """
-def ask_question(question, model="gpt-4.1-mini", instructions="You are a helpful assistant.", temperature=0.7):
+# Response cache for deterministic (temperature=0.0) calls.
+# functools.lru_cache cannot wrap coroutines (it would cache the coroutine object),
+# so a small OrderedDict-based LRU is used instead.
+_RESPONSE_CACHE = OrderedDict()
+_RESPONSE_CACHE_SIZE = 1024
+
+async def _cached_ask(model, instructions, question, temperature):
+    key = (model, instructions, question, temperature)
+    if key in _RESPONSE_CACHE:
+        _RESPONSE_CACHE.move_to_end(key)
+        return _RESPONSE_CACHE[key]
+
+    output_text = await _create_text(model=model, instructions=instructions, input=question, temperature=temperature)
+    _RESPONSE_CACHE[key] = output_text
+    if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_SIZE:
+        _RESPONSE_CACHE.popitem(last=False)
+    return output_text
+
+
+async def ask_question(question, model="gpt-4.1-mini", instructions="You are a helpful assistant.", temperature=0.7, stream=False):
     """
     General purpose function to ask a question and get a response from OpenAI API.
+    Calls with temperature=0.0 are cached; identical prompts skip the API round trip.
     
     Args:
         question (str): The question or prompt to send to the AI
         model (str): The OpenAI model to use (default: "gpt-4.1-mini")
         instructions (str): System instructions for the AI (default: "You are a helpful assistant.")
         temperature (float): Creativity level 0.0-1.0 (default: 0.7)
+        stream (bool): Print tokens as they arrive instead of waiting for the full response (default: False)
     
     Returns:
         str: The AI's response
     """
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=question,
-        temperature=temperature
-    )
+    if stream:
+        return await _print_stream(model=model, instructions=instructions, input=question, temperature=temperature)
+
+    if temperature == 0.0:
+        return await _cached_ask(model, instructions, question, temperature)
+
+    async with _get_semaphore():
+        response = await _get_client().responses.create(
+            model=model,
+            instructions=instructions,
+            input=question,
+            temperature=temperature
+        )
     return response.output_text
 
 # Example usage
-# answer = ask_question("What is the capital of France?")
+# answer = asyncio.run(ask_question("What is the capital of France?"))
 # print(answer) 
+# answer = asyncio.run(ask_question("What is the capital of France?", stream=True))
  
  
 """
 Translator function - translate between Chinese and English
 """
-def translator(text, model="gpt-4.1-mini", temperature=0.3):
-    def _ask(text, model="gpt-4.1-mini", temperature=0.3):
+TRANSLATOR_INSTRUCTIONS = textwrap.dedent("""\
+    You are a professional translator.
+    If the input is in Traditional Chinese, translate it to English.
+    If the input is in English, translate it to Traditional Chinese.
+
+    Please structure your response in exactly this format:
+    [translated text here]
+""").strip()
+
+async def translator(text, model="gpt-4.1-mini", temperature=0.3, stream=False):
+    async def _ask(text, model="gpt-4.1-mini", temperature=0.3):
         """
         Translate text between Traditional Chinese and English automatically.
         If input is Traditional Chinese, translate to English. If input is English, translate to Traditional Chinese.
@@ -130,48 +303,53 @@ def translator(text, model="gpt-4.1-mini", temperature=0.3):
         Returns:
             str: Formatted output with original text and translated text
         """
-        instructions = """You are a professional translator. 
-        If the input is in Traditional Chinese, translate it to English.
-        If the input is in English, translate it to Traditional Chinese.
-        
-        Please structure your response in exactly this format:
-        [translated text here]"""
-        
-        response = client.responses.create(
-            model=model,
-            instructions=instructions,
-            input=text,
-            temperature=temperature
-        )
+        async with _get_semaphore():
+            response = await _get_client().responses.create(
+                model=model,
+                instructions=TRANSLATOR_INSTRUCTIONS,
+                input=text,
+                temperature=temperature
+            )
         return response.output_text
-    result = _ask(text, model=model, temperature=temperature)
+    if stream:
+        print(text)
+        return await _print_stream(model=model, instructions=TRANSLATOR_INSTRUCTIONS, input=text, temperature=temperature)
+    result = await _ask(text, model=model, temperature=temperature)
     print(text)
     print(result)
     return result
 
 # Example usage
-# result1 = translator("Hello, how are you today?")
+# result1 = asyncio.run(translator("Hello, how are you today?"))
 # 
 # print("\n" + "="*50 + "\n")
 
-# result2 = translator("你好,今天天氣很好")
+# result2 = asyncio.run(translator("你好,今天天氣很好"))
 
 
 """
 News 5W1H summarization example
 """
 import json
+import re
+from typing import Literal
 from pydantic import BaseModel
-
-class News5W1H(BaseModel):
-    who: str
-    what: str
-    when: str
-    where: str
-    why: str
-    how: str
-
-def news_5w1h_summarize(news_text, model="gpt-4.1-mini", temperature=0.2):
+from schemas import News5W1H, News5W1HList, NEWS_5W1H_TEXT_FORMAT
+
+NEWS_5W1H_INSTRUCTIONS = textwrap.dedent("""\
+    You are a professional news analyst. Extract the 5W1H information from the given news article.
+    Analyze carefully and provide concise but complete information for each element:
+    - who: Main people, organizations, or entities involved
+    - what: The main event or action that occurred
+    - when: Time information (date, time, or period)
+    - where: Location or place where the event occurred
+    - why: Reasons, causes, or motivations behind the event
+    - how: Methods, processes, or manner in which it happened
+
+    If any information is not explicitly mentioned in the text, write "Not specified" for that field.
+""").strip()
+
+async def news_5w1h_summarize(news_text, model="gpt-4.1-mini", temperature=0.2):
     """
     Extract 5W1H (Who, What, When, Where, Why, How) from news text with structured output.
     
@@ -184,35 +362,44 @@ def news_5w1h_summarize(news_text, model="gpt-4.1-mini", temperature=0.2):
         dict: A dictionary containing 5W1H information
     """
     
-    response = client.responses.parse(
-        model=model,
-        input=[
-            {
-                "role": "system",
-                "content": """You are a professional news analyst. Extract the 5W1H information from the given news article.
-                Analyze carefully and provide concise but complete information for each element:
-                - who: Main people, organizations, or entities involved
-                - what: The main event or action that occurred
-                - when: Time information (date, time, or period)
-                - where: Location or place where the event occurred
-                - why: Reasons, causes, or motivations behind the event
-                - how: Methods, processes, or manner in which it happened
-                
-                If any information is not explicitly mentioned in the text, write "Not specified" for that field."""
-            },
-            {
-                "role": "user",
-                "content": news_text
-            }
-        ],
-        temperature=temperature,
-        text_format=News5W1H
-    )
+    async with _get_semaphore():
+        response = await _get_client().responses.parse(
+            model=model,
+            instructions=NEWS_5W1H_INSTRUCTIONS,
+            input=news_text,
+            temperature=temperature,
+            text_format=News5W1H
+        )
     
     # Get the parsed output
     result = response.output_parsed
     return result.model_dump()
 
+async def news_5w1h_summarize_many(news_texts, model="gpt-4.1-mini", temperature=0.2):
+    """
+    Extract 5W1H from several news articles in a single structured-output call.
+    The system prompt is sent once for the whole set instead of once per article.
+    
+    Args:
+        news_texts (list[str]): The news articles to analyze
+        model (str): The OpenAI model to use (default: "gpt-4.1-mini")
+        temperature (float): Creativity level 0.0-1.0 (default: 0.2)
+    
+    Returns:
+        list[dict]: One 5W1H dictionary per article, in input order
+    """
+    articles = "\n---\n".join(news_texts)
+    async with _get_semaphore():
+        response = await _get_client().responses.parse(
+            model=model,
+            instructions=NEWS_5W1H_INSTRUCTIONS,
+            input=f"There are {len(news_texts)} articles separated by ---. "
+                  f"Return one item per article, in the same order.\n\nArticles:\n---\n{articles}",
+            temperature=temperature,
+            text_format=News5W1HList
+        )
+    return [item.model_dump() for item in response.output_parsed.items]
+
 # Example usage
 sample_news = """
 Tesla CEO Elon Musk announced on Tuesday that the company will open a new Gigafactory 
@@ -222,16 +409,93 @@ to reduce logistics costs and improve delivery times for customers in the region
 factory will employ over 5,000 workers and use advanced automation technology.
 """
 
-# result = news_5w1h_summarize(sample_news)
+# result = asyncio.run(news_5w1h_summarize(sample_news))
 # print(json.dumps(result, indent=2, ensure_ascii=False))
+# results = asyncio.run(news_5w1h_summarize_many([sample_news, another_news]))
 
 
 """
 Task dispatcher
 """
-def task_dispatcher(user_request):
+# `function` is constrained to exactly one of four routes. News and general questions
+# return an empty payload and the handler reads the original request, so the model
+# never has to echo a whole article back as output tokens.
+class Dispatch(BaseModel):
+    function: Literal["translator", "news_5w1h_summarize", "research_topic", "ask_question"]
+    payload: str
+
+CLASSIFIER_INSTRUCTIONS = textwrap.dedent("""\
+    Analyze the user request, decide which function should handle it, and extract the input for that function.
+
+    Available functions:
+    1. translator - For translation requests between Chinese and English (keywords: 翻譯, translate, 中文, 英文, English, Chinese)
+       payload: only the text that should be translated
+    2. news_5w1h_summarize - For news analysis and extracting 5W1H information (keywords: 新聞, news, 5W1H, 分析, analyze, 摘要, summarize)
+       payload: empty string (the original request is used as-is, so do not copy the article)
+    3. research_topic - For research and information gathering on topics (keywords: 研究, research, 查詢, 調查, investigate, 資料, information)
+       payload: only the topic to research
+    4. ask_question - For general questions and conversations (default for everything else)
+       payload: empty string (the original request is used as-is)
+""").strip()
+
+# Regex + LLM fallback: requests shaped like "<command>: <content>" whose command part
+# contains an explicit keyword are routed locally without a classifier round trip.
+# Everything else (no separator, no keyword) is left to the model.
+_ROUTES = [
+    (re.compile(r"翻譯|translate|中翻英|英翻中", re.I), "translator"),
+    (re.compile(r"新聞|5W1H|摘要|news|summari[sz]e", re.I), "news_5w1h_summarize"),
+    (re.compile(r"研究|research|調查|investigate", re.I), "research_topic"),
+]
+_COMMAND_SEPARATOR = re.compile(r"[:：\n]")
+
+
+def _fast_route(user_request):
+    parts = _COMMAND_SEPARATOR.split(user_request, maxsplit=1)
+    if len(parts) != 2 or not parts[1].strip():
+        return None
+    command, payload = parts
+    for pattern, function in _ROUTES:
+        if pattern.search(command):
+            return Dispatch(function=function, payload=payload.strip())
+    return None
+
+
+# Routing is a pick-one-of-four task, so it runs on the cheapest, lowest-latency model;
+# the handlers keep using the more capable model.
+CLASSIFIER_MODEL = "gpt-4.1-nano"
+
+
+async def _dispatch(user_request, model=CLASSIFIER_MODEL):
+    """Pick the handler and extract its input with a single structured-output call (cached)."""
+    fast = _fast_route(user_request)
+    if fast is not None:
+        return fast
+
+    key = ("dispatch", model, user_request)
+    if key in _RESPONSE_CACHE:
+        _RESPONSE_CACHE.move_to_end(key)
+        return _RESPONSE_CACHE[key]
+
+    async with _get_semaphore():
+        response = await _get_client().responses.parse(
+            model=model,
+            instructions=CLASSIFIER_INSTRUCTIONS,
+            input=user_request,
+            temperature=0.0,
+            text_format=Dispatch
+        )
+    result = response.output_parsed
+    _RESPONSE_CACHE[key] = result
+    if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_SIZE:
+        _RESPONSE_CACHE.popitem(last=False)
+    return result
+
+
+async def task_dispatcher(user_request):
     """
     Intelligent task dispatcher that analyzes user request and routes to appropriate function.
+    Classification and input extraction happen in one structured-output call
+    on CLASSIFIER_MODEL ("gpt-4.1-nano"); the handlers run on their own default models.
     
     Args:
         user_request (str): The user's request in natural language
@@ -239,69 +503,136 @@ def task_dispatcher(user_request):
     Returns:
         str: The result from the appropriate function
     """
-    # Use ask_question to classify the task
-    classification_prompt = f"""Analyze the following user request and determine which function should handle it.
-
-User request: "{user_request}"
-
-Available functions:
-1. translator - For translation requests between Chinese and English (keywords: 翻譯, translate, 中文, 英文, English, Chinese)
-2. news_5w1h_summarize - For news analysis and extracting 5W1H information (keywords: 新聞, news, 5W1H, 分析, analyze, 摘要, summarize)
-3. research_topic - For research and information gathering on topics (keywords: 研究, research, 查詢, 調查, investigate, 資料, information)
-4. ask_question - For general questions and conversations (default for everything else)
-
-Respond with ONLY the function name, nothing else."""
-
-    function_name = ask_question(
-        classification_prompt, 
-        model="gpt-4.1-mini",
-        instructions="You are a task classifier. Return only the function name.",
-        temperature=0.0
-    ).strip()
+    dispatch = await _dispatch(user_request)
     
-    print(f"🔍 Detected function: {function_name}")
+    print(f"🔍 Detected function: {dispatch.function}")
     print(f"📝 Processing request: {user_request}\n")
     
     # Route to appropriate function
-    if "translator" in function_name.lower():
-        return translator(user_request)
+    if dispatch.function == "translator":
+        return await translator(dispatch.payload)
     
-    elif "news_5w1h_summarize" in function_name.lower():
-        result = news_5w1h_summarize(user_request)
+    elif dispatch.function == "news_5w1h_summarize":
+        result = await news_5w1h_summarize(dispatch.payload or user_request)
         return json.dumps(result, indent=2, ensure_ascii=False)
     
-    elif "research_topic" in function_name.lower():
-        # Extract topic from request
-        topic_prompt = f"Extract the main topic to research from this request: '{user_request}'. Return only the topic, nothing else."
-        topic = ask_question(topic_prompt, temperature=0.0).strip()
-        return research_topic(topic)
+    elif dispatch.function == "research_topic":
+        return await research_topic(dispatch.payload)
     
     else:  # Default to ask_question
-        return ask_question(user_request)
+        return await ask_question(dispatch.payload or user_request)
+
+"""
+Batch API - offline jobs at ~50% of the token price
+"""
+async def submit_batch(requests, poll_interval=30):
+    """
+    Run many /v1/responses requests through the Batch API and wait for the results.
+    Good for offline work with no latency requirement (regression runs, bulk news analysis).
+    
+    Args:
+        requests (list[dict]): Request bodies, same keyword arguments as client.responses.create
+        poll_interval (int): Seconds between status checks (default: 30)
+    
+    Returns:
+        list[dict]: Response bodies in the same order as `requests` (None for failed lines)
+    """
+    lines = [
+        json.dumps({"custom_id": f"request-{i}", "method": "POST", "url": "/v1/responses", "body": body},
+                   ensure_ascii=False)
+        for i, body in enumerate(requests)
+    ]
+    batch_file = await _get_client().files.create(
+        file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch"
+    )
+    batch = await _get_client().batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h"
+    )
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await _get_client().batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status: {batch.status}")
+
+    results = {}
+    if batch.output_file_id:
+        content = await _get_client().files.content(batch.output_file_id)
+        for line in content.text.splitlines():
+            item = json.loads(line)
+            if item.get("response") and item["response"]["status_code"] == 200:
+                results[item["custom_id"]] = item["response"]["body"]
+    return [results.get(f"request-{i}") for i in range(len(requests))]
+
+
+def _output_text(body):
+    """Collect the output_text parts of a raw /v1/responses body."""
+    if body is None:
+        return None
+    return "".join(
+        part["text"]
+        for item in body["output"] if item["type"] == "message"
+        for part in item["content"] if part["type"] == "output_text"
+    )
+
 
 # Example usage
-print("="*60)
-print("Example 1: Translation request")
-print("="*60)
-result1 = task_dispatcher("請幫我翻譯 Hello World")
-print()
-
-print("="*60)
-print("Example 2: General question")
-print("="*60)
-result2 = task_dispatcher("What is the capital of Japan?")
-print(result2)
-print()
-
-print("="*60)
-print("Example 3: Research request")
-print("="*60)
-result3 = task_dispatcher("Can you research artificial intelligence for me?")
-print(result3)
-
-
-print("="*60)
-print("Example 4: News summary request")
-print("="*60)
-result4 = task_dispatcher(f"請摘要這篇新聞:{sample_news}")
-print(result4)
\ No newline at end of file
+async def main():
+    # The four requests are independent, so run them concurrently:
+    # total wall-clock is roughly the slowest request instead of the sum of all four.
+    results = await asyncio.gather(
+        task_dispatcher("請幫我翻譯 Hello World"),
+        task_dispatcher("What is the capital of Japan?"),
+        task_dispatcher("Can you research artificial intelligence for me?"),
+        task_dispatcher(f"請摘要這篇新聞:{sample_news}"),
+    )
+    titles = [
+        "Example 1: Translation request",
+        "Example 2: General question",
+        "Example 3: Research request",
+        "Example 4: News summary request",
+    ]
+    for title, result in zip(titles, results):
+        print("="*60)
+        print(title)
+        print("="*60)
+        print(result)
+        print()
+
+
+async def main_batch():
+    # Same four examples as main(), but the handler for each one is known up front,
+    # so they skip the dispatcher and go out as a single Batch API job.
+    requests = [
+        dict(model="gpt-4.1-mini", instructions=TRANSLATOR_INSTRUCTIONS, input="Hello World", temperature=0.3),
+        dict(model="gpt-4.1-mini", instructions="You are a helpful assistant.", input="What is the capital of Japan?", temperature=0.7),
+        dict(model="gpt-4.1-mini", instructions=RESEARCH_INSTRUCTIONS,
+             input="Can you help me research artificial intelligence and summarize the latest findings?", temperature=0.0),
+        dict(model="gpt-4.1-mini", instructions=NEWS_5W1H_INSTRUCTIONS, input=sample_news, temperature=0.2,
+             text={"format": NEWS_5W1H_TEXT_FORMAT}),
+    ]
+    titles = [
+        "Example 1: Translation request",
+        "Example 2: General question",
+        "Example 3: Research request",
+        "Example 4: News summary request",
+    ]
+    bodies = await submit_batch(requests)
+    for title, body in zip(titles, bodies):
+        print("="*60)
+        print(title)
+        print("="*60)
+        print(_output_text(body))
+        print()
+
+
+# Only run the examples when executed as a script, so importing this module
+# for its helpers does not fire any API calls.
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", action="store_true", help="run the examples through the Batch API (cheaper, not interactive)")
+    args = parser.parse_args()
+    asyncio.run(main_batch() if args.batch else main())
@@ -1,6 +1,14 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAioHttpClient
 from pydantic import BaseModel
+from typing import Literal
+import asyncio
+import httpx
 import json
+import re
+import textwrap
+import weakref
+from collections import OrderedDict
+from schemas import News5W1H, News5W1HList, NEWS_5W1H_TEXT_FORMAT
 
 # OPENAI_API_KEY = "" # insert your api key here, or set environment variable OPENAI_API_KEY
 
@@ -8,20 +16,98 @@ import json
 import os 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # OR, get from environment variable if set
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# aiohttp transport handles many concurrent requests better than the default httpx one
+# (pip install "openai[aiohttp]")
+# Keep warm connections around so repeated calls skip the TCP/TLS handshake
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0)
+# 限制同時送出的請求數,避免大量平行請求反而讓延遲暴增;
+# 這個上限小於連線池的 max_connections,真正的瓶頸是 semaphore 而不是連線池
+_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
 
+# aiohttp 連線與 semaphore 都綁定建立時的 event loop,
+# 每個 loop 各自建立一份,多次呼叫 asyncio.run 時才不會沿用已關閉的 loop
+_LOOP_RESOURCES = weakref.WeakKeyDictionary()
 
-# 定義 5W1H 的 JSON Schema
-class News5W1H(BaseModel):
-    who: str      # 誰 - 新聞主角
-    what: str     # 什麼事 - 發生的事件
-    when: str     # 何時 - 時間
-    where: str    # 何地 - 地點
-    why: str      # 為何 - 原因
-    how: str      # 如何 - 方法或過程
 
+def _loop_resources():
+    loop = asyncio.get_running_loop()
+    resources = _LOOP_RESOURCES.get(loop)
+    if resources is None:
+        resources = (
+            AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                http_client=DefaultAioHttpClient(limits=_HTTP_LIMITS, timeout=120.0),
+            ),
+            asyncio.Semaphore(_MAX_CONCURRENCY),
+        )
+        _LOOP_RESOURCES[loop] = resources
+    return resources
+
+
+def _get_client():
+    return _loop_resources()[0]
+
+
+def _get_semaphore():
+    return _loop_resources()[1]
+
+
+# 系統提示放在模組層級的常數,每次呼叫送出的前綴完全相同,
+# OpenAI 伺服器端的 prompt caching 才能重複使用;會變動的內容一律放在 input
+NEWS_5W1H_INSTRUCTIONS = textwrap.dedent("""\
+    你是一位專業的新聞分析師。請從新聞內容中提取 5W1H 資訊:
+    - who: 新聞中的主要人物或組織
+    - what: 發生了什麼事件
+    - when: 事件發生的時間
+    - where: 事件發生的地點
+    - why: 事件發生的原因或動機
+    - how: 事件如何發生或執行的方式
 
-def ask(input_text, model="gpt-5-nano", instructions="You are a helpful assistant."):
+    請用繁體中文回答,如果某項資訊在新聞中未提及,請填寫「未提及」。
+""").strip()
+
+TRANSLATOR_INSTRUCTIONS = textwrap.dedent("""\
+    You are a professional translator.
+    If the input text is in Traditional Chinese (繁體中文), translate it to English.
+    If the input text is in English, translate it to Traditional Chinese (繁體中文).
+    Only return the translated text, nothing else.
+""").strip()
+
+CLASSIFIER_INSTRUCTIONS = textwrap.dedent("""\
+    請分析使用者請求,判斷應該使用哪個函式處理,並提取該函式需要的內容。
+
+    可用的函式:
+    1. translator - 用於翻譯任務,關鍵詞:翻譯、translate、中翻英、英翻中
+       payload:只放需要翻譯的文字
+    2. news_summarizer - 用於新聞分析和摘要,關鍵詞:新聞、摘要、5W1H、分析新聞
+       payload:留空字串(系統會直接使用原始請求,不需要重複輸出整篇新聞)
+    3. story_creator - 用於創作故事,關鍵詞:故事、床邊故事、創作、寫一個故事
+       payload:只放故事主題關鍵詞
+    4. general_question - 用於一般問答,其他所有情況
+       payload:留空字串(系統會直接使用原始請求)
+""").strip()
+
+
+async def _print_stream(**request):
+    """串流輸出:收到文字就立刻印出,最後回傳完整內容"""
+    chunks = []
+    async with _get_semaphore():
+        stream = await _get_client().responses.create(stream=True, **request)
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                print(event.delta, end="", flush=True)
+                chunks.append(event.delta)
+    print()
+    return "".join(chunks)
+
+
+# 分派結果快取:相同的請求直接回傳上次的分派結果,不再呼叫 API
+# functools.lru_cache 無法用在 async 函式上,所以用 OrderedDict 做簡單的 LRU
+_RESPONSE_CACHE = OrderedDict()
+_RESPONSE_CACHE_SIZE = 1024
+
+
+async def ask(input_text, model="gpt-5-nano", instructions="You are a helpful assistant.", stream=False):
     """
     通用的問答函式
     
@@ -29,19 +115,24 @@ def ask(input_text, model="gpt-5-nano", instructions="You are a helpful assistan
         input_text (str): 輸入的問題或提示
         model (str): 使用的模型,預設為 "gpt-5-nano"
         instructions (str): 系統指示,預設為 "You are a helpful assistant."
+        stream (bool): 是否邊生成邊印出,不必等整段回應完成,預設為 False
     
     回傳:
         str: AI 的回應
     """
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=input_text
-    )
+    if stream:
+        return await _print_stream(model=model, instructions=instructions, input=input_text)
+
+    async with _get_semaphore():
+        response = await _get_client().responses.create(
+            model=model,
+            instructions=instructions,
+            input=input_text
+        )
     return response.output_text
 
 
-def news_5w1h_summarizer(news_text, model="gpt-5-nano"):
+async def news_5w1h_summarizer(news_text, model="gpt-5-nano"):
     """
     新聞 5W1H 摘要函式
     從新聞內容中提取 Who, What, When, Where, Why, How 資訊
@@ -53,35 +144,43 @@ def news_5w1h_summarizer(news_text, model="gpt-5-nano"):
     回傳:
         dict: 包含 5W1H 資訊的字典
     """
-    response = client.responses.parse(
-        model=model,
-        input=[
-            {
-                "role": "system",
-                "content": """你是一位專業的新聞分析師。請從新聞內容中提取 5W1H 資訊:
-- who: 新聞中的主要人物或組織
-- what: 發生了什麼事件
-- when: 事件發生的時間
-- where: 事件發生的地點
-- why: 事件發生的原因或動機
-- how: 事件如何發生或執行的方式
-
-請用繁體中文回答,如果某項資訊在新聞中未提及,請填寫「未提及」。"""
-            },
-            {
-                "role": "user",
-                "content": news_text
-            }
-        ],
-        text_format=News5W1H
-    )
+    async with _get_semaphore():
+        response = await _get_client().responses.parse(
+            model=model,
+            instructions=NEWS_5W1H_INSTRUCTIONS,
+            input=news_text,
+            text_format=News5W1H
+        )
     
     # 取得結構化的輸出
     result = response.output_parsed
     return result.model_dump()
 
 
-def translator(text, model="gpt-5-nano"):
+async def news_5w1h_summarizer_many(news_texts, model="gpt-5-nano"):
+    """
+    多則新聞 5W1H 摘要函式
+    把多則新聞放進同一次 structured output 呼叫,系統提示只需送出一次
+    
+    參數:
+        news_texts (list[str]): 新聞內容文字列表
+        model (str): 使用的模型,預設為 "gpt-5-nano"
+    
+    回傳:
+        list[dict]: 每則新聞各一個 5W1H 字典,順序與輸入相同
+    """
+    articles = "\n---\n".join(news_texts)
+    async with _get_semaphore():
+        response = await _get_client().responses.parse(
+            model=model,
+            instructions=NEWS_5W1H_INSTRUCTIONS,
+            input=f"以下共有 {len(news_texts)} 則新聞,以 --- 分隔。請依相同順序,每則新聞回傳一個項目。\n\n新聞:\n---\n{articles}",
+            text_format=News5W1HList
+        )
+    return [item.model_dump() for item in response.output_parsed.items]
+
+
+async def translator(text, model="gpt-5-nano", stream=False):
     """
     智能翻譯函式:自動判斷語言並翻譯
     - 輸入繁體中文 → 翻譯成英文
@@ -90,29 +189,29 @@ def translator(text, model="gpt-5-nano"):
     參數:
         text (str): 要翻譯的文字
         model (str): 使用的模型,預設為 "gpt-5-nano"
+        stream (bool): 是否邊生成邊印出譯文,預設為 False
     
     回傳:
         str: 翻譯結果
     """
-    def _ask(text, model="gpt-5-nano"):
-        instructions = """You are a professional translator.
-        If the input text is in Traditional Chinese (繁體中文), translate it to English.
-        If the input text is in English, translate it to Traditional Chinese (繁體中文).
-        Only return the translated text, nothing else."""
-        
-        response = client.responses.create(
-            model=model,
-            instructions=instructions,
-            input=text
-        )
+    async def _ask(text, model="gpt-5-nano"):
+        async with _get_semaphore():
+            response = await _get_client().responses.create(
+                model=model,
+                instructions=TRANSLATOR_INSTRUCTIONS,
+                input=text
+            )
         return response.output_text
-    translated_text = _ask(text, model=model)
+    if stream:
+        translated_text = await _print_stream(model=model, instructions=TRANSLATOR_INSTRUCTIONS, input=text)
+    else:
+        translated_text = await _ask(text, model=model)
     return {"original": text, "translated": translated_text}
 
     
-def create_story(topic, model="gpt-5-nano", 
+async def create_story(topic, model="gpt-5-nano", 
                  instructions="Tell the story like 村上春樹", 
-                 word_count=100):
+                 word_count=100, stream=False):
     """
     根據主題創作床邊故事
     
@@ -121,21 +220,87 @@ def create_story(topic, model="gpt-5-nano",
         model (str): 使用的模型,預設為 "gpt-5-nano"
         instructions (str): 寫作風格指示,預設為 "Tell the story like 村上春樹"
         word_count (int): 故事字數,預設為 100
+        stream (bool): 是否邊生成邊印出故事,預設為 False
     
     回傳:
         str: 生成的故事內容
     """
-    response = client.responses.create(
+    request = dict(
         model=model,
         instructions=instructions,
         input=f"寫一個跟{topic}有關的床邊故事，近{word_count}字的段落即可"
     )
+    if stream:
+        return await _print_stream(**request)
+
+    async with _get_semaphore():
+        response = await _get_client().responses.create(**request)
     return response.output_text
 
 
-def task_dispatcher(user_request, model="gpt-5-nano"):
+# 分派結果的 JSON Schema:一次呼叫同時決定任務類型並提取要處理的內容
+# function 用 Literal 限定只能是四個選項之一;新聞與一般問答的 payload 留空,
+# 由程式直接使用原始請求,避免模型把整篇新聞再輸出一次
+class Dispatch(BaseModel):
+    function: Literal["translator", "news_summarizer", "story_creator", "general_question"]
+    payload: str
+
+# 關鍵字快速路由(regex + LLM fallback):
+# 「指令: 內容」格式且指令部分含明確關鍵字的請求直接在本地分派,不必呼叫分類模型;
+# 其他情況(沒有分隔符號或沒有關鍵字)才交給 LLM 判斷
+_ROUTES = [
+    (re.compile(r"翻譯|translate|中翻英|英翻中", re.I), "translator"),
+    (re.compile(r"新聞|5W1H|摘要", re.I), "news_summarizer"),
+    (re.compile(r"故事|床邊|story", re.I), "story_creator"),
+]
+_COMMAND_SEPARATOR = re.compile(r"[:：\n]")
+
+
+def _fast_route(user_request):
+    parts = _COMMAND_SEPARATOR.split(user_request, maxsplit=1)
+    if len(parts) != 2 or not parts[1].strip():
+        return None
+    command, payload = parts
+    for pattern, function in _ROUTES:
+        if pattern.search(command):
+            return Dispatch(function=function, payload=payload.strip())
+    return None
+
+
+# 分派只是從四個選項中挑一個,用最便宜、延遲最低的模型即可;處理任務時才用較強的模型
+CLASSIFIER_MODEL = "gpt-4.1-nano"
+
+
+async def _dispatch(user_request, model=CLASSIFIER_MODEL):
+    """用一次 structured output 呼叫判斷任務類型並提取內容(結果會被快取)"""
+    fast = _fast_route(user_request)
+    if fast is not None:
+        return fast
+
+    key = ("dispatch", model, user_request)
+    if key in _RESPONSE_CACHE:
+        _RESPONSE_CACHE.move_to_end(key)
+        return _RESPONSE_CACHE[key]
+
+    async with _get_semaphore():
+        response = await _get_client().responses.parse(
+            model=model,
+            instructions=CLASSIFIER_INSTRUCTIONS,
+            input=user_request,
+            temperature=0.0,
+            text_format=Dispatch
+        )
+    result = response.output_parsed
+    _RESPONSE_CACHE[key] = result
+    if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_SIZE:
+        _RESPONSE_CACHE.popitem(last=False)
+    return result
+
+
+async def task_dispatcher(user_request, model="gpt-5-nano", verbose=True):
     """
     任務分派器:根據使用者請求自動分派到適當的函式
+    判斷任務類型與提取內容在同一次 structured output 呼叫中完成
     
     支援的任務類型:
     1. translator - 翻譯任務
@@ -145,96 +310,159 @@ def task_dispatcher(user_request, model="gpt-5-nano"):
     
     參數:
         user_request (str): 使用者的請求內容
-        model (str): 使用的模型,預設為 "gpt-5-nano"
+        model (str): 處理任務使用的模型,預設為 "gpt-5-nano";
+            分派固定使用 CLASSIFIER_MODEL ("gpt-4.1-nano")
+        verbose (bool): 是否印出分派過程與結果,預設為 True
     
     回傳:
         根據任務類型回傳不同格式的結果
     """
-    # 使用 AI 判斷任務類型
-    classification_prompt = f"""請分析以下使用者請求,判斷應該使用哪個函式處理。
+    # 使用 AI 判斷任務類型並提取內容
+    dispatch, result = await _dispatch_and_run(user_request, model=model)
+    if verbose:
+        print_dispatch_result(user_request, dispatch, result)
+    return result
 
-使用者請求: "{user_request}"
 
-可用的函式:
-1. translator - 用於翻譯任務,關鍵詞:翻譯、translate、中翻英、英翻中
-2. news_summarizer - 用於新聞分析和摘要,關鍵詞:新聞、摘要、5W1H、分析新聞
-3. story_creator - 用於創作故事,關鍵詞:故事、床邊故事、創作、寫一個故事
-4. general_question - 用於一般問答,其他所有情況
+async def _dispatch_and_run(user_request, model="gpt-5-nano"):
+    """判斷任務類型後執行對應的函式,回傳 (dispatch, result)"""
+    dispatch = await _dispatch(user_request)
+    
+    # 根據判斷結果分派任務
+    if dispatch.function == "translator":
+        result = await translator(dispatch.payload, model=model)
+    elif dispatch.function == "news_summarizer":
+        result = await news_5w1h_summarizer(dispatch.payload or user_request, model=model)
+    elif dispatch.function == "story_creator":
+        result = await create_story(dispatch.payload, model=model)
+    else:  # general_question
+        result = await ask(dispatch.payload or user_request, model=model)
+    return dispatch, result
 
-請只回答函式名稱,不要有其他內容。從以下選項中選一個:
-translator, news_summarizer, story_creator, general_question"""
 
-    function_name = ask(
-        classification_prompt,
-        model=model,
-        instructions="You are a task classifier. Return only the function name."
-    ).strip().lower()
-    
-    print(f"🔍 偵測到的任務類型: {function_name}")
+def print_dispatch_result(user_request, dispatch, result):
+    """印出一次分派的任務類型、請求與結果"""
+    print(f"🔍 偵測到的任務類型: {dispatch.function}")
     print(f"📝 處理請求: {user_request}")
     print("-" * 60)
-    
-    # 根據判斷結果分派任務
-    if "translator" in function_name:
-        # 提取要翻譯的文字
-        extract_prompt = f"從以下請求中提取需要翻譯的文字內容,只回傳要翻譯的文字:\n{user_request}"
-        text_to_translate = ask(extract_prompt, model=model, instructions="Extract only the text to translate.").strip()
-        result = translator(text_to_translate, model=model)
+
+    if dispatch.function == "translator":
         print(f"原文: {result['original']}")
         print(f"譯文: {result['translated']}")
-        return result
-    
-    elif "news_summarizer" in function_name or "news" in function_name:
-        # 提取新聞內容
-        extract_prompt = f"從以下請求中提取新聞內容文字,只回傳新聞文字本身:\n{user_request}"
-        news_content = ask(extract_prompt, model=model, instructions="Extract only the news content.").strip()
-        result = news_5w1h_summarizer(news_content, model=model)
+    elif dispatch.function == "news_summarizer":
         print("新聞 5W1H 摘要:")
         print(json.dumps(result, indent=2, ensure_ascii=False))
-        return result
-    
-    elif "story" in function_name:
-        # 提取故事主題
-        extract_prompt = f"從以下請求中提取故事主題,只回傳主題關鍵詞:\n{user_request}"
-        topic = ask(extract_prompt, model=model, instructions="Extract only the story topic.").strip()
-        result = create_story(topic, model=model)
-        print(f"故事主題: {topic}")
+    elif dispatch.function == "story_creator":
+        print(f"故事主題: {dispatch.payload}")
         print(f"故事內容:\n{result}")
-        return result
-    
     else:  # general_question
-        result = ask(user_request, model=model)
         print(f"回答: {result}")
-        return result
+
+
+async def submit_batch(requests, poll_interval=30):
+    """
+    透過 Batch API 一次送出多個 /v1/responses 請求並等待結果
+    適合沒有即時需求的離線工作(回歸測試、大量新聞分析),費用約為一般呼叫的一半
+    
+    參數:
+        requests (list[dict]): 請求內容,參數與 client.responses.create 相同
+        poll_interval (int): 查詢批次狀態的間隔秒數,預設為 30
+    
+    回傳:
+        list[dict]: 與 requests 相同順序的回應內容(失敗的請求為 None)
+    """
+    lines = [
+        json.dumps({"custom_id": f"request-{i}", "method": "POST", "url": "/v1/responses", "body": body},
+                   ensure_ascii=False)
+        for i, body in enumerate(requests)
+    ]
+    batch_file = await _get_client().files.create(
+        file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch"
+    )
+    batch = await _get_client().batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h"
+    )
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await _get_client().batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"批次 {batch.id} 結束狀態: {batch.status}")
+
+    results = {}
+    if batch.output_file_id:
+        content = await _get_client().files.content(batch.output_file_id)
+        for line in content.text.splitlines():
+            item = json.loads(line)
+            if item.get("response") and item["response"]["status_code"] == 200:
+                results[item["custom_id"]] = item["response"]["body"]
+    return [results.get(f"request-{i}") for i in range(len(requests))]
+
+
+def _output_text(body):
+    """從 /v1/responses 的原始回應中取出文字內容"""
+    if body is None:
+        return None
+    return "".join(
+        part["text"]
+        for item in body["output"] if item["type"] == "message"
+        for part in item["content"] if part["type"] == "output_text"
+    )
 
 
 # 使用範例
-if __name__ == "__main__":
+SAMPLE_NEWS = """請分析這則新聞的5W1H:
+    台北市長蔣萬安今天(17日)上午在市政府宣布,台北市將在明年1月開始實施新的垃圾減量政策。
+    這項政策是為了因應日益嚴重的垃圾問題,透過提高垃圾處理費和加強資源回收來達成減量目標。
+    市府預計透過這項措施,在未來三年內將垃圾量減少30%。
+    """
+
+
+async def main_batch(model="gpt-5-nano"):
+    """四個測試的任務類型已知,直接跳過分派器,合併成一個 Batch API 工作送出"""
+    requests = [
+        # 測試 1: 翻譯任務
+        dict(model=model, instructions=TRANSLATOR_INSTRUCTIONS, input="Hello, how are you today?"),
+        # 測試 2: 新聞摘要任務
+        dict(model=model, instructions=NEWS_5W1H_INSTRUCTIONS, input=SAMPLE_NEWS,
+             text={"format": NEWS_5W1H_TEXT_FORMAT}),
+        # 測試 3: 故事創作任務
+        dict(model=model, instructions="Tell the story like 村上春樹", input="寫一個跟友誼有關的床邊故事，近100字的段落即可"),
+        # 測試 4: 一般問答任務
+        dict(model=model, instructions="You are a helpful assistant.", input="什麼是人工智慧?"),
+    ]
+    bodies = await submit_batch(requests)
+    for body in bodies:
+        print(_output_text(body))
+        print("-" * 60)
+
+
+async def main():
     print("=" * 60)
     print("任務分派器測試")
     print("=" * 60)
     print()
     
-    # 測試 1: 翻譯任務
-    print("【測試 1】翻譯任務")
-    task_dispatcher("請幫我翻譯: Hello, how are you today?")
-    print("\n" + "=" * 60 + "\n")
-    
-    # 測試 2: 新聞摘要任務
-    print("【測試 2】新聞摘要任務")
-    task_dispatcher("""請分析這則新聞的5W1H:
-    台北市長蔣萬安今天(17日)上午在市政府宣布,台北市將在明年1月開始實施新的垃圾減量政策。
-    這項政策是為了因應日益嚴重的垃圾問題,透過提高垃圾處理費和加強資源回收來達成減量目標。
-    市府預計透過這項措施,在未來三年內將垃圾量減少30%。
-    """)
-    print("\n" + "=" * 60 + "\n")
-    
-    # 測試 3: 故事創作任務
-    print("【測試 3】故事創作任務")
-    task_dispatcher("請寫一個關於友誼的床邊故事")
-    print("\n" + "=" * 60 + "\n")
-    
-    # 測試 4: 一般問答任務
-    print("【測試 4】一般問答任務")
-    task_dispatcher("什麼是人工智慧?")
-    print("\n" + "=" * 60 + "\n")
\ No newline at end of file
+    tests = [
+        ("【測試 1】翻譯任務", "請幫我翻譯: Hello, how are you today?"),
+        ("【測試 2】新聞摘要任務", SAMPLE_NEWS),
+        ("【測試 3】故事創作任務", "請寫一個關於友誼的床邊故事"),
+        ("【測試 4】一般問答任務", "什麼是人工智慧?"),
+    ]
+    # 四個測試彼此獨立,用 asyncio.gather 同時送出,
+    # 總等待時間約為最慢的那一個請求,而不是四個請求相加;結果等全部完成後再依序印出
+    outcomes = await asyncio.gather(*(_dispatch_and_run(request) for _, request in tests))
+    for (title, request), (dispatch, result) in zip(tests, outcomes):
+        print(title)
+        print_dispatch_result(request, dispatch, result)
+        print("\n" + "=" * 60 + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", action="store_true", help="用 Batch API 執行測試(較便宜,但非即時)")
+    args = parser.parse_args()
+    asyncio.run(main_batch() if args.batch else main())
@@ -1,108 +1,166 @@
+import asyncio
+import textwrap
+
 import ollama
 
-def ask_question(question, model='gemma3:1b'):
+# One async client for the whole module so every call reuses the same HTTP connection pool
+_client = ollama.AsyncClient(timeout=120.0)
+
+# Keep the model loaded between calls so later calls skip the multi-second reload
+KEEP_ALIVE = "30m"
+OPTIONS = {"num_ctx": 4096}
+
+
+async def _print_stream(pieces):
+    """Print streamed text pieces as they arrive; returns the full text."""
+    chunks = []
+    async for content in pieces:
+        print(content, end='', flush=True)
+        chunks.append(content)
+    print()
+    return ''.join(chunks)
+
+
+async def _generate_pieces(**request):
+    async for chunk in await _client.generate(stream=True, **request):
+        yield chunk['response']
+
+
+async def _chat_pieces(**request):
+    async for chunk in await _client.chat(stream=True, **request):
+        yield chunk['message']['content']
+
+
+async def ask_question(question, model='gemma3:1b', stream=False):
     """
     General purpose function to ask a question and get a response from Ollama.
-    
+
     Args:
         question (str): The question or prompt to send to the AI
         model (str): The Ollama model to use (default: 'gemma3:12b')
-    
+        stream (bool): Print tokens as they arrive (default: False)
+
     Returns:
         str: The AI's response
     """
+    # Single-turn prompt, so use generate and skip the chat message handling
+    request = dict(model=model, prompt=question, keep_alive=KEEP_ALIVE, options=OPTIONS)
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[
-                {'role': 'user', 'content': question}
-            ]
-        )
-        return response['message']['content']
+        if stream:
+            return await _print_stream(_generate_pieces(**request))
+        response = await _client.generate(**request)
+        return response['response']
     except Exception as e:
         print("Chat failed:", e)
         return None
 
 
-def translator(text, model='gemma3:1b'):
+# Module constant so consecutive translator calls send a byte-identical system prompt
+# and Ollama can reuse the KV cache for that prefix
+TRANSLATOR_INSTRUCTIONS = textwrap.dedent("""\
+    You are a professional translator.
+    If the input is in Traditional Chinese, translate it to English.
+    If the input is in English, translate it to Traditional Chinese.
+
+    Please structure your response in exactly this format:
+    [translated text here]
+""").strip()
+
+
+async def translator(text, model='gemma3:1b', stream=True):
     """
     Translate text between Traditional Chinese and English automatically.
     If input is Traditional Chinese, translate to English. If input is English, translate to Traditional Chinese.
-    
+
     Args:
         text (str): The text to translate (Traditional Chinese or English)
         model (str): The Ollama model to use (default: 'gemma3:12b')
-    
+        stream (bool): Print the original and the translation as it is generated;
+            set False to only return the translation (default: True)
+
     Returns:
         str: The translated text
     """
-    instructions = """You are a professional translator. 
-    If the input is in Traditional Chinese, translate it to English.
-    If the input is in English, translate it to Traditional Chinese.
-    
-    Please structure your response in exactly this format:
-    [translated text here]"""
-    
+    request = dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": TRANSLATOR_INSTRUCTIONS},
+            {"role": "user", "content": text}
+        ],
+        keep_alive=KEEP_ALIVE,
+        options=OPTIONS
+    )
     try:
-        response = ollama.chat(
-            model=model,
-            messages=[
-                {"role": "system", "content": instructions},
-                {"role": "user", "content": text}
-            ]
-        )
-        result = response['message']['content']
-        print(text)
-        print(result)
-        return result
+        if stream:
+            print(text)
+            return await _print_stream(_chat_pieces(**request))
+        response = await _client.chat(**request)
+        return response['message']['content']
     except Exception as e:
         print("Translation failed:", e)
         return None
 
 
-def research_topic(topic, model='gemma3:1b', instructions="You are a research assistant. Read the user's topic and return a concise summary of recent and reliable information in one paragraph. Include sources when relevant.", input_template="Can you help me research {topic} and summarize the latest findings?"):
+async def research_topic(topic, model='gemma3:1b', instructions="You are a research assistant. Read the user's topic and return a concise summary of recent and reliable information in one paragraph. Include sources when relevant.", input_template="Can you help me research {topic} and summarize the latest findings?", stream=False):
     """
     Research a topic and provide a summary.
-    
+
     Args:
         topic (str): The topic to research
         model (str): The Ollama model to use (default: 'gemma3:12b')
         instructions (str): System instructions for the research assistant
         input_template (str): Template for the user input
-    
+        stream (bool): Print tokens as they arrive (default: False)
+
     Returns:
         str: The AI's response
     """
-    messages = [
-        {"role": "system", "content": instructions},
-        {"role": "user", "content": input_template.format(topic=topic)}
-    ]
-    
+    request = dict(
+        model=model,
+        system=instructions,
+        prompt=input_template.format(topic=topic),
+        keep_alive=KEEP_ALIVE,
+        options=OPTIONS
+    )
+
     try:
-        response = ollama.chat(model=model, messages=messages)
-        return response['message']['content']
+        if stream:
+            return await _print_stream(_generate_pieces(**request))
+        response = await _client.generate(**request)
+        return response['response']
     except Exception as e:
         print("Research failed:", e)
         return None
 
 
-if __name__ == "__main__":
-    
+async def main():
+    # The four examples are independent, so send them together; total wall-clock is
+    # roughly the slowest call. Streaming is off here because concurrent streams
+    # would interleave their tokens on stdout.
+    answer, result, translation_en, translation_zh = await asyncio.gather(
+        ask_question('日本的首都在哪裡（簡答）？'),
+        research_topic("Echo chambers in social media"),
+        translator("Hello, how are you today?", stream=False),
+        translator("你好,今天天氣很好", stream=False),
+    )
+
     # Example 1: Simple question
     print("== Example 1: ask_question ==")
-    answer = ask_question('日本的首都在哪裡（簡答）？')
     print("Chat output:\n", answer)
     print()
-    
+
     # Example 2: Research topic
     print("== Example 2: research_topic ==")
-    result = research_topic("Echo chambers in social media")
     print("Research output:\n", result)
     print()
-    
+
     # Example 3: Translator
     print("== Example 3: translator ==")
     print("\nTranslating English to Chinese:")
-    translator("Hello, how are you today?")
+    print(translation_en)
     print("\nTranslating Chinese to English:")
-    translator("你好,今天天氣很好")
\ No newline at end of file
+    print(translation_zh)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -7,105 +7,48 @@ Run with: streamlit run ai03-app.py
 
 import streamlit as st
 import json
-from openai import OpenAI
-from pydantic import BaseModel
+from ai_core import ask, translate, news_5w1h_summarizer
 
-# OpenAI API Key
-OPENAI_API_KEY = "your-openai-api-key-here"  # Replace with your actual OpenAI API key
-
-client = OpenAI(api_key=OPENAI_API_KEY)
+# The OpenAI client, retry policy and the translator / 5W1H prompts live in ai_core.py and are
+# shared with flask_line_bot.py. Streamlit re-runs this script on every interaction, but the
+# imported module is loaded once per server process, so the client and its connection pool persist.
 
 # ==================== Functions from ai01-using-openAI.py ====================
 
-def ask_question(question, model="gpt-4.1-mini", instructions="You are a helpful assistant.", temperature=0.7):
+def ask_question(question, model="gpt-4.1-mini", instructions="You are a helpful assistant.", temperature=0.7, stream=False):
     """
     General purpose function to ask a question and get a response from OpenAI API.
+    With stream=True, returns a generator of text chunks instead of the full text.
     """
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=question,
-        temperature=temperature
-    )
-    return response.output_text
+    return ask(question, model=model, instructions=instructions, stream=stream, temperature=temperature)
 
 
 def research_topic(topic, model="gpt-4.1-mini", 
                    instructions="You are a research assistant. Read the user's topic and return a concise summary of recent and reliable information in one paragraph. Include sources when relevant.", 
                    input_template="Can you help me research {topic} and summarize the latest findings?", 
-                   temperature=0.0):
+                   temperature=0.0, stream=False):
     """
     Research a topic and provide a summary.
+    With stream=True, returns a generator of text chunks instead of the full text.
     """
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=input_template.format(topic=topic),
-        temperature=temperature
-    )
-    return response.output_text
+    return ask(input_template.format(topic=topic), model=model, instructions=instructions, stream=stream,
+               temperature=temperature)
 
 
-def translator(text, model="gpt-4.1-mini", temperature=0.3):
+def translator(text, model="gpt-4.1-mini", temperature=0.3, stream=False):
     """
     Translate text between Traditional Chinese and English automatically.
+    With stream=True, returns a generator of text chunks instead of the full text.
     """
-    instructions = """You are a professional translator. 
-    If the input is in Traditional Chinese, translate it to English.
-    If the input is in English, translate it to Traditional Chinese.
-    
-    Please structure your response in exactly this format:
-    [translated text here]"""
-    
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=text,
-        temperature=temperature
-    )
-    return response.output_text
-
-
-class News5W1H(BaseModel):
-    who: str
-    what: str
-    when: str
-    where: str
-    why: str
-    how: str
+    return translate(text, model=model, stream=stream, temperature=temperature)
 
 
 def news_5w1h_summarize(news_text, model="gpt-4.1-mini", temperature=0.2):
     """
     Extract 5W1H (Who, What, When, Where, Why, How) from news text with structured output.
+    Returns a dict with the six 5W1H fields.
     """
-    response = client.responses.parse(
-        model=model,
-        input=[
-            {
-                "role": "system",
-                "content": """You are a professional news analyst. Extract the 5W1H information from the given news article.
-                Analyze carefully and provide concise but complete information for each element:
-                - who: Main people, organizations, or entities involved
-                - what: The main event or action that occurred
-                - when: Time information (date, time, or period)
-                - where: Location or place where the event occurred
-                - why: Reasons, causes, or motivations behind the event
-                - how: Methods, processes, or manner in which it happened
-                
-                If any information is not explicitly mentioned in the text, write "Not specified" for that field."""
-            },
-            {
-                "role": "user",
-                "content": news_text
-            }
-        ],
-        temperature=temperature,
-        text_format=News5W1H
-    )
-    
-    result = response.output_parsed
-    return result.model_dump()
+    return news_5w1h_summarizer(news_text, model=model, temperature=temperature)
 
 
 # ==================== Streamlit App ====================
@@ -155,10 +98,10 @@ def main():
             if question:
                 with st.spinner("AI 正在思考..."):
                     try:
-                        result = ask_question(question, model=model, temperature=temperature)
-                        st.success("✅ 回答完成！")
+                        # Render tokens as they arrive instead of waiting for the full answer
                         st.markdown("### 回答：")
-                        st.write(result)
+                        st.write_stream(ask_question(question, model=model, temperature=temperature, stream=True))
+                        st.success("✅ 回答完成！")
                     except Exception as e:
                         st.error(f"❌ 發生錯誤：{str(e)}")
             else:
@@ -208,10 +151,9 @@ def main():
                         if input_template:
                             kwargs["input_template"] = input_template
                         
-                        result = research_topic(**kwargs)
-                        st.success("✅ 研究完成！")
                         st.markdown("### 研究結果：")
-                        st.write(result)
+                        st.write_stream(research_topic(**kwargs, stream=True))
+                        st.success("✅ 研究完成！")
                     except Exception as e:
                         st.error(f"❌ 發生錯誤：{str(e)}")
             else:
@@ -234,16 +176,14 @@ def main():
             if text:
                 with st.spinner("翻譯中..."):
                     try:
-                        result = translator(text, model=model, temperature=temperature)
-                        st.success("✅ 翻譯完成！")
-                        
                         col1, col2 = st.columns(2)
                         with col1:
                             st.markdown("### 原文：")
                             st.info(text)
                         with col2:
                             st.markdown("### 譯文：")
-                            st.success(result)
+                            st.write_stream(translator(text, model=model, temperature=temperature, stream=True))
+                        st.success("✅ 翻譯完成！")
                     except Exception as e:
                         st.error(f"❌ 發生錯誤：{str(e)}")
             else:
@@ -1,8 +1,15 @@
 import anthropic
+import httpx
 
 import os
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+# Shared HTTP/2 connection pool; `retries` re-attempts failed connection setups
+_transport = httpx.HTTPTransport(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=30),
+    retries=3,
+)
+client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, http_client=httpx.Client(transport=_transport, timeout=120.0))
 message = client.messages.create(
     model="claude-sonnet-4-5",
     max_tokens=1024,
@@ -0,0 +1,126 @@
+"""
+共用的 OpenAI 核心:client、重試策略、系統提示與基本 AI 功能函式
+
+ai03-app.py (Streamlit) 與 flask_line_bot.py (Flask + LINE Bot) 都從這裡匯入,
+兩個應用送出的系統提示前綴完全相同,OpenAI 的 prompt caching 可以跨應用命中。
+"""
+import contextlib
+import os
+
+import httpx
+import orjson
+from openai import OpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+
+from schemas import NEWS_5W1H_TEXT_FORMAT
+
+# 設定 OpenAI API Key
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "") # 建議從環境變數讀取
+
+# 共用的 HTTP/2 連線池:重複呼叫沿用已建立的連線,省去 TCP/TLS 交握;連線失敗時自動重試
+_OPENAI_TRANSPORT = httpx.HTTPTransport(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=30),
+    retries=3,
+)
+# 重試交給下方的 openai_retry 處理,SDK 內建的重試關掉以免次數相乘
+client = OpenAI(api_key=OPENAI_API_KEY, http_client=httpx.Client(transport=_OPENAI_TRANSPORT, timeout=120.0),
+                max_retries=0)
+
+# 遇到 429 / 連線錯誤 / 逾時 / 5xx 時以指數退避重試
+openai_retry = retry(
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    reraise=True,
+)
+
+
+# ==================== 系統提示 ====================
+# 固定的系統提示集中成模組常數,每次呼叫送出的前綴完全相同,
+# OpenAI 的 prompt caching 才能重複使用;使用者內容一律放在 user 訊息
+
+# 翻譯方向在本地判斷,模型不必再花 token 自行偵測語言
+_SYS_TRANSLATOR = {
+    "zh": """You are a professional translator.
+Translate the input text from Traditional Chinese (繁體中文) to English.
+Only return the translated text, nothing else.""",
+    "en": """You are a professional translator.
+Translate the input text from English to Traditional Chinese (繁體中文).
+Only return the translated text, nothing else.""",
+}
+
+_SYS_5W1H = """你是一位專業的新聞分析師。請從新聞內容中提取 5W1H 資訊:
+- who: 新聞中的主要人物或組織
+- what: 發生了什麼事件
+- when: 事件發生的時間
+- where: 事件發生的地點
+- why: 事件發生的原因或動機
+- how: 事件如何發生或執行的方式
+
+請用繁體中文回答,如果某項資訊在新聞中未提及,請填寫「未提及」。"""
+
+
+# ==================== AI 功能函式 ====================
+
+@openai_retry
+def _open_stream(stack, **request):
+    """開啟串流連線並交給 stack 管理;只有建立連線這一步會重試,
+    已經開始輸出後中斷就不重試,以免重複輸出前面的片段"""
+    return stack.enter_context(client.responses.stream(**request))
+
+
+def _stream_text(**request):
+    """逐步產生輸出的文字片段(給 st.write_stream 等串流顯示使用)"""
+    with contextlib.ExitStack() as stack:
+        stream = _open_stream(stack, **request)
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+
+
+@openai_retry
+def _create_text(**request):
+    return client.responses.create(**request).output_text
+
+
+def ask(input_text, model="gpt-5-nano", instructions="You are a helpful assistant.", stream=False, **options):
+    """通用的問答函式;stream=True 時回傳文字片段的 generator,其他參數(如 temperature)直接傳給 API"""
+    request = dict(model=model, instructions=instructions, input=input_text, **options)
+    if stream:
+        # generator 要到開始迭代才會送出請求,重試放在 _stream_text 開啟串流的地方
+        return _stream_text(**request)
+    return _create_text(**request)
+
+
+def detect_lang(text):
+    """含有中日韓統一表意文字就視為中文,否則視為英文"""
+    return 'zh' if any(0x4e00 <= ord(c) <= 0x9fff for c in text) else 'en'
+
+
+def translate(text, model="gpt-5-nano", stream=False, **options):
+    """中英互譯,回傳譯文;翻譯方向由 detect_lang 在本地判斷"""
+    return ask(text, model=model, instructions=_SYS_TRANSLATOR[detect_lang(text)], stream=stream, **options)
+
+
+@openai_retry
+def news_5w1h_summarizer(news_text, model="gpt-5-nano", **options):
+    """新聞 5W1H 摘要函式"""
+    # 結果只是要轉成 JSON 回傳,直接用預先算好的 schema 並解析原始 JSON,
+    # 省去 Pydantic 驗證再 model_dump 的來回
+    response = client.responses.create(
+        model=model,
+        input=[
+            {
+                "role": "system",
+                "content": _SYS_5W1H
+            },
+            {
+                "role": "user",
+                "content": news_text
+            }
+        ],
+        text={"format": NEWS_5W1H_TEXT_FORMAT},
+        **options
+    )
+    return orjson.loads(response.output_text)
@@ -1,8 +1,19 @@
-from flask import Flask, request, jsonify, render_template, abort
-from openai import OpenAI
+from flask import Flask, Response, request, render_template, abort
 from pydantic import BaseModel
+from ai_core import client, openai_retry, ask, translate, news_5w1h_summarizer
+from typing import Literal
+from concurrent.futures import Future, ThreadPoolExecutor
+import atexit
+import functools
 import json
+import logging
+import logging.handlers
+import orjson
 import os
+import queue
+import re
+import threading
+import time
 
 # LINE Bot SDK Imports
 from linebot.v3 import (
@@ -25,9 +36,17 @@ from linebot.v3.webhooks import (
 
 app = Flask(__name__)
 
-# 設定 OpenAI API Key
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "") # 建議從環境變數讀取
-client = OpenAI(api_key=OPENAI_API_KEY)
+# 非阻塞日誌:各執行緒只把紀錄放進佇列,由背景的 QueueListener 執行緒寫到 stderr,
+# 大量日誌時不會卡住處理請求的執行緒
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger = logging.getLogger("linebot")
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.propagate = False
 
 # LINE Bot 設定
 LINE_CHANNEL_ACCESS_TOKEN = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN", "YOUR_CHANNEL_ACCESS_TOKEN")
@@ -36,125 +55,240 @@ LINE_CHANNEL_SECRET = os.environ.get("LINE_CHANNEL_SECRET", "YOUR_CHANNEL_SECRET
 configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
+# 共用一個 LINE ApiClient:底層 urllib3 連線池保持連線,回覆訊息不必每次重新建立 TCP/TLS
+line_api_client = ApiClient(configuration)
+line_bot_api = MessagingApi(line_api_client)
+atexit.register(line_api_client.close)
 
-# 定義 5W1H 的 JSON Schema
-class News5W1H(BaseModel):
-    who: str      # 誰 - 新聞主角
-    what: str     # 什麼事 - 發生的事件
-    when: str     # 何時 - 時間
-    where: str    # 何地 - 地點
-    why: str      # 為何 - 原因
-    how: str      # 如何 - 方法或過程
+# LINE 事件在背景執行緒處理:webhook 驗證簽章後立刻回 200,
+# 不讓 OpenAI 的等待時間佔住 Flask 的請求執行緒
+line_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("LINE_HANDLER_WORKERS", "32")))
 
+# 同一個請求內互相獨立的 OpenAI 呼叫同時送出;max_workers 也限制了同時進行的呼叫數,
+# 避免超過 OpenAI 的 RPM 限制
+ai_executor = ThreadPoolExecutor(max_workers=20)
 
-# ==================== AI 功能函式 ====================
 
-def ask(input_text, model="gpt-5-nano", instructions="You are a helpful assistant."):
-    """通用的問答函式"""
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=input_text
-    )
-    return response.output_text
+# ==================== 系統提示 ====================
+# client、重試策略、翻譯與 5W1H 的系統提示和函式都在 ai_core.py,與 ai03-app.py 共用;
+# 這裡只放 LINE Bot 專用的分派提示,同樣是固定的模組常數,讓 prompt caching 可以命中
+
+_SYS_DISPATCHER = """請分析使用者請求,判斷應該使用哪個函式處理,並提取該函式需要的內容。
+
+可用的函式:
+1. translator - 用於翻譯任務,關鍵詞:翻譯、translate、中翻英、英翻中
+   payload:只放需要翻譯的文字
+2. news_summarizer - 用於新聞分析和摘要,關鍵詞:新聞、摘要、5W1H、分析新聞
+   payload:只放新聞內容文字本身
+3. story_creator - 用於創作故事,關鍵詞:故事、床邊故事、創作、寫一個故事
+   payload:只放故事主題關鍵詞
+4. general_question - 用於一般問答,其他所有情況
+   payload:使用者的問題"""
 
 
+# ==================== AI 功能函式 ====================
+
 def translator(text, model="gpt-5-nano"):
     """智能翻譯函式"""
-    instructions = """You are a professional translator.
-    If the input text is in Traditional Chinese (繁體中文), translate it to English.
-    If the input text is in English, translate it to Traditional Chinese (繁體中文).
-    Only return the translated text, nothing else."""
-    
+    return {"original": text, "translated": translate(text, model=model)}
+
+
+def news_5w1h_with_translation(news_text, model="gpt-5-nano"):
+    """新聞 5W1H 摘要並同時翻譯全文:兩個呼叫互相獨立,平行送出,總時間約為較慢的那一個"""
+    summary_future = ai_executor.submit(news_5w1h_summarizer, news_text, model=model)
+    translation_future = ai_executor.submit(translator, news_text, model=model)
+    return {"summary": summary_future.result(), "translation": translation_future.result()}
+
+
+@openai_retry
+def create_story(topic, model="gpt-5-nano", instructions="Tell the story like 村上春樹", word_count=100):
+    """根據主題創作床邊故事"""
     response = client.responses.create(
         model=model,
         instructions=instructions,
-        input=text
+        input=f"寫一個跟{topic}有關的床邊故事，近{word_count}字的段落即可"
     )
-    translated_text = response.output_text
-    return {"original": text, "translated": translated_text}
+    return response.output_text
+
+
+# 分派結果的 JSON Schema:一次呼叫同時決定任務類型並提取要處理的內容
+class DispatchDecision(BaseModel):
+    task_type: Literal["translator", "news_summarizer", "story_creator", "general_question"]
+    payload: str
 
 
-def news_5w1h_summarizer(news_text, model="gpt-5-nano"):
-    """新聞 5W1H 摘要函式"""
+# 分派只是從四個選項中挑一個,固定用最便宜、延遲最低的模型;
+# 呼叫端選擇的 model 只用在實際處理任務的步驟
+CLASSIFIER_MODEL = "gpt-4.1-nano"
+
+
+# 分派結果快取:同樣的訊息不必再跑一次 LLM 判斷
+# (lru_cache 本身是 thread-safe,Flask 多執行緒下可直接使用)
+@functools.lru_cache(maxsize=1024)
+@openai_retry
+def _decide(user_request, model=CLASSIFIER_MODEL):
+    """用一次 structured output 呼叫判斷任務類型並提取內容"""
     response = client.responses.parse(
         model=model,
         input=[
             {
                 "role": "system",
-                "content": """你是一位專業的新聞分析師。請從新聞內容中提取 5W1H 資訊:
-- who: 新聞中的主要人物或組織
-- what: 發生了什麼事件
-- when: 事件發生的時間
-- where: 事件發生的地點
-- why: 事件發生的原因或動機
-- how: 事件如何發生或執行的方式
-
-請用繁體中文回答,如果某項資訊在新聞中未提及,請填寫「未提及」。"""
+                "content": _SYS_DISPATCHER
             },
             {
                 "role": "user",
-                "content": news_text
+                "content": user_request
             }
         ],
-        text_format=News5W1H
-    )
-    result = response.output_parsed
-    return result.model_dump()
-
-
-def create_story(topic, model="gpt-5-nano", instructions="Tell the story like 村上春樹", word_count=100):
-    """根據主題創作床邊故事"""
-    response = client.responses.create(
-        model=model,
-        instructions=instructions,
-        input=f"寫一個跟{topic}有關的床邊故事，近{word_count}字的段落即可"
+        temperature=0,
+        text_format=DispatchDecision
     )
-    return response.output_text
+    return response.output_parsed
+
+
+# ==================== 分派請求合併 ====================
+# 同時湧入的多則訊息在短時間窗內合併成一次分派呼叫,攤平每次呼叫的連線與 prefill 成本
+# 以環境變數 ENABLE_BATCH=1 開啟
+ENABLE_BATCH = os.getenv("ENABLE_BATCH", "0") == "1"
+# 呼叫端最多等待分派結果的秒數,避免批次執行緒卡住時請求無限期掛著
+BATCH_SUBMIT_TIMEOUT = float(os.getenv("BATCH_SUBMIT_TIMEOUT", "60"))
+
+
+class DispatchDecisionList(BaseModel):
+    items: list[DispatchDecision]
+
+
+def _chain_future(target, source):
+    exc = source.exception()
+    if exc is not None:
+        target.set_exception(exc)
+    else:
+        target.set_result(source.result())
+
+
+class BatchedClassifier:
+    """收集 window 秒內(最多 max_batch 則)的分派請求,用一次 structured output 呼叫一起判斷"""
+
+    def __init__(self, max_batch=16, window=0.02):
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, user_request, model=CLASSIFIER_MODEL):
+        future = Future()
+        self._queue.put((user_request, model, future))
+        return future.result(timeout=BATCH_SUBMIT_TIMEOUT)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_model = {}
+            for item in batch:
+                by_model.setdefault(item[1], []).append(item)
+            for model, items in by_model.items():
+                self._resolve(model, items)
+
+    def _resolve(self, model, items):
+        # 只有一則時直接用單筆分派(也會用到 _decide 的快取)
+        if len(items) > 1:
+            try:
+                decisions = self._decide_many([req for req, _, _ in items], model)
+                for (_, _, future), decision in zip(items, decisions):
+                    future.set_result(decision)
+                return
+            except Exception as e:
+                logger.warning("Batched dispatch failed, falling back to single calls: %s", e)
+        # 逐筆分派丟到 ai_executor 執行,批次執行緒立刻回去收下一批
+        for req, _, future in items:
+            fallback = ai_executor.submit(_decide, req, model=model)
+            fallback.add_done_callback(functools.partial(_chain_future, future))
+
+    # 不重試:批次失敗就直接退回逐筆分派,不讓整批請求一起等待重試的退避時間
+    def _decide_many(self, user_requests, model):
+        messages = "\n".join(f"{i + 1}. {json.dumps(r, ensure_ascii=False)}" for i, r in enumerate(user_requests))
+        response = client.responses.parse(
+            model=model,
+            input=[
+                {
+                    "role": "system",
+                    "content": _SYS_DISPATCHER
+                },
+                {
+                    "role": "user",
+                    "content": f"以下共有 {len(user_requests)} 則使用者請求,請依相同順序,每則回傳一個分派結果:\n{messages}"
+                }
+            ],
+            temperature=0,
+            text_format=DispatchDecisionList
+        )
+        decisions = response.output_parsed.items
+        if len(decisions) != len(user_requests):
+            raise ValueError(f"expected {len(user_requests)} decisions, got {len(decisions)}")
+        return decisions
+
+
+_batched_classifier = BatchedClassifier() if ENABLE_BATCH else None
+
+
+# 關鍵字快速分派:「指令: 內容」格式且指令部分只命中一種任務的關鍵字時,
+# 直接在本地決定任務類型與內容,不必呼叫分類模型
+_KW = {
+    "translator": re.compile(r"翻譯|translate|中翻英|英翻中", re.I),
+    "news_summarizer": re.compile(r"新聞|5W1H|摘要", re.I),
+    "story_creator": re.compile(r"故事|床邊"),
+}
+_COMMAND_SEPARATOR = re.compile(r"[:：\n]")
+
+
+def _fast_decide(user_request):
+    parts = _COMMAND_SEPARATOR.split(user_request, maxsplit=1)
+    if len(parts) != 2 or not parts[1].strip():
+        return None
+    command, payload = parts
+    matches = [task_type for task_type, pattern in _KW.items() if pattern.search(command)]
+    if len(matches) != 1:
+        return None
+    return DispatchDecision(task_type=matches[0], payload=payload.strip())
 
 
 def task_dispatcher(user_request, model="gpt-5-nano"):
-    """任務分派器"""
-    classification_prompt = f"""請分析以下使用者請求,判斷應該使用哪個函式處理。
-
-使用者請求: "{user_request}"
-
-可用的函式:
-1. translator - 用於翻譯任務,關鍵詞:翻譯、translate、中翻英、英翻中
-2. news_summarizer - 用於新聞分析和摘要,關鍵詞:新聞、摘要、5W1H、分析新聞
-3. story_creator - 用於創作故事,關鍵詞:故事、床邊故事、創作、寫一個故事
-4. general_question - 用於一般問答,其他所有情況
-
-請只回答函式名稱,不要有其他內容。從以下選項中選一個:
-translator, news_summarizer, story_creator, general_question"""
-
-    function_name = ask(
-        classification_prompt,
-        model=model,
-        instructions="You are a task classifier. Return only the function name."
-    ).strip().lower()
+    """任務分派器:分派固定使用 CLASSIFIER_MODEL,model 參數只用於處理任務"""
+    user_request = user_request.strip()
+    decision = _fast_decide(user_request)
+    if decision is None:
+        if _batched_classifier is not None:
+            decision = _batched_classifier.submit(user_request)
+        else:
+            decision = _decide(user_request)
     
     # 根據判斷結果分派任務
-    if "translator" in function_name:
-        extract_prompt = f"從以下請求中提取需要翻譯的文字內容,只回傳要翻譯的文字:\n{user_request}"
-        text_to_translate = ask(extract_prompt, model=model, instructions="Extract only the text to translate.").strip()
-        result = translator(text_to_translate, model=model)
+    if decision.task_type == "translator":
+        result = translator(decision.payload, model=model)
         return {"task_type": "translator", "result": result}
     
-    elif "news_summarizer" in function_name or "news" in function_name:
-        extract_prompt = f"從以下請求中提取新聞內容文字,只回傳新聞文字本身:\n{user_request}"
-        news_content = ask(extract_prompt, model=model, instructions="Extract only the news content.").strip()
-        result = news_5w1h_summarizer(news_content, model=model)
+    elif decision.task_type == "news_summarizer":
+        result = news_5w1h_summarizer(decision.payload, model=model)
         return {"task_type": "news_summarizer", "result": result}
     
-    elif "story" in function_name:
-        extract_prompt = f"從以下請求中提取故事主題,只回傳主題關鍵詞:\n{user_request}"
-        topic = ask(extract_prompt, model=model, instructions="Extract only the story topic.").strip()
+    elif decision.task_type == "story_creator":
+        topic = decision.payload
         result = create_story(topic, model=model)
         return {"task_type": "story_creator", "result": {"topic": topic, "story": result}}
     
     else:  # general_question
-        result = ask(user_request, model=model)
+        result = ask(decision.payload, model=model)
         return {"task_type": "general_question", "result": result}
 
 
@@ -184,6 +318,11 @@ def format_result_for_line(task_result):
 
 # ==================== Web Service API Endpoints ====================
 
+def _json(payload, status=200):
+    """用 orjson(C 擴充)序列化 JSON 回應,取代 jsonify"""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
 @app.route('/')
 def home():
     """首頁 - 提供互動式 Web 介面"""
@@ -194,168 +333,168 @@ def home():
 def api_ask():
     """一般問答 API"""
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         input_text = data.get('input_text', '')
         model = data.get('model', 'gpt-5-nano')
         instructions = data.get('instructions', 'You are a helpful assistant.')
         
         if not input_text:
-            return jsonify({'error': '缺少 input_text 參數'}), 400
+            return _json({'error': '缺少 input_text 參數'}, 400)
         
         result = ask(input_text, model=model, instructions=instructions)
-        return jsonify({
+        return _json({
             'success': True,
             'input': input_text,
             'output': result
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json({'error': str(e)}, 500)
 
 
 @app.route('/api/translate', methods=['POST'])
 def api_translate():
     """翻譯 API"""
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         text = data.get('text', '')
         model = data.get('model', 'gpt-5-nano')
         
         if not text:
-            return jsonify({'error': '缺少 text 參數'}), 400
+            return _json({'error': '缺少 text 參數'}, 400)
         
         result = translator(text, model=model)
-        return jsonify({
+        return _json({
             'success': True,
             'original': result['original'],
             'translated': result['translated']
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json({'error': str(e)}, 500)
 
 
 @app.route('/api/news-summary', methods=['POST'])
 def api_news_summary():
     """新聞 5W1H 摘要 API"""
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         news_text = data.get('news_text', '')
         model = data.get('model', 'gpt-5-nano')
+        with_translation = data.get('translate', False)
         
         if not news_text:
-            return jsonify({'error': '缺少 news_text 參數'}), 400
+            return _json({'error': '缺少 news_text 參數'}, 400)
         
+        if with_translation:
+            result = news_5w1h_with_translation(news_text, model=model)
+            return _json({
+                'success': True,
+                'summary': result['summary'],
+                'translation': result['translation']
+            })
+
         result = news_5w1h_summarizer(news_text, model=model)
-        return jsonify({
+        return _json({
             'success': True,
             'summary': result
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json({'error': str(e)}, 500)
 
 
 @app.route('/api/create-story', methods=['POST'])
 def api_create_story():
     """故事創作 API"""
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         topic = data.get('topic', '')
         model = data.get('model', 'gpt-5-nano')
         word_count = data.get('word_count', 100)
         instructions = data.get('instructions', 'Tell the story like 村上春樹')
         
         if not topic:
-            return jsonify({'error': '缺少 topic 參數'}), 400
+            return _json({'error': '缺少 topic 參數'}, 400)
         
         result = create_story(topic, model=model, instructions=instructions, word_count=word_count)
-        return jsonify({
+        return _json({
             'success': True,
             'topic': topic,
             'story': result
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json({'error': str(e)}, 500)
 
 
 @app.route('/api/dispatch', methods=['POST'])
 def api_dispatch():
     """智能任務分派 API"""  
     try:
-        data = request.get_json()
+        data = orjson.loads(request.get_data())
         user_request = data.get('user_request', '')
         model = data.get('model', 'gpt-5-nano')
         
         if not user_request:
-            return jsonify({'error': '缺少 user_request 參數'}), 400
+            return _json({'error': '缺少 user_request 參數'}, 400)
         
         result = task_dispatcher(user_request, model=model)
-        return jsonify({
+        return _json({
             'success': True,
             'task_type': result['task_type'],
             'result': result['result']
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _json({'error': str(e)}, 500)
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康檢查端點"""
-    return jsonify({
+    return _json({
         'status': 'healthy',
         'service': 'AI Web Service',
         'version': '1.0.0'
     })
 
 
+# 模型清單很少變動,查詢結果快取一小時,不必每次都呼叫 OpenAI
+_MODELS_TTL = 3600
+# 查詢失敗時的預設清單只保留幾秒,OpenAI 恢復後很快就能拿到真正的清單
+_DEFAULT_MODELS_TTL = 5
+_DEFAULT_MODELS = ["gpt-4.1-mini", "gpt-5-nano", "gpt-5-mini", "gpt-4o-2024-08-06"]
+_models_cache = {"models": None, "cached_at": 0.0, "ttl": _MODELS_TTL}
+
+
+def _list_models():
+    if _models_cache["models"] is not None and time.monotonic() - _models_cache["cached_at"] < _models_cache["ttl"]:
+        return _models_cache["models"]
+
+    try:
+        models = sorted(m.id for m in client.models.list() if m.id.startswith("gpt-"))
+    except Exception as e:
+        logger.warning("Listing models failed, using defaults: %s", e)
+        models = []
+
+    _models_cache["ttl"] = _MODELS_TTL if models else _DEFAULT_MODELS_TTL
+    _models_cache["models"] = models or _DEFAULT_MODELS
+    _models_cache["cached_at"] = time.monotonic()
+    return _models_cache["models"]
+
+
 @app.route('/api/models', methods=['GET'])
 def api_models():
     """Return available models for the OpenAI-based service."""
     try:
-        models = []
-        try:
-            if hasattr(client, 'models'):
-                if hasattr(client.models, 'list'):
-                    resp = client.models.list()
-                    if isinstance(resp, dict) and 'data' in resp:
-                        data = resp['data']
-                    else:
-                        data = resp
-                    if isinstance(data, list):
-                        for m in data:
-                            if isinstance(m, dict) and 'id' in m:
-                                models.append(m['id'])
-                            elif isinstance(m, str):
-                                models.append(m)
-                else:
-                    resp = client.models()
-                    if isinstance(resp, dict) and 'data' in resp:
-                        data = resp['data']
-                    else:
-                        data = resp
-                    if isinstance(data, list):
-                        for m in data:
-                            if isinstance(m, dict) and 'id' in m:
-                                models.append(m['id'])
-                            elif isinstance(m, str):
-                                models.append(m)
-        except Exception:
-            pass
-
-        if not models:
-            models = ["gpt-4.1-mini", "gpt-5-nano", "gpt-5-mini", "gpt-4o-2024-08-06"]
-
-        return jsonify({'success': True, 'models': models})
+        return _json({'success': True, 'models': _list_models()})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return _json({'success': False, 'error': str(e)}, 500)
 
 
 @app.route('/api/service-info', methods=['GET'])
 def api_service_info():
     """Return basic service info for the current backend (openai)."""
     try:
-        return jsonify({'success': True, 'service': 'openai', 'service_label': 'OpenAI'})
+        return _json({'success': True, 'service': 'openai', 'service_label': 'OpenAI'})
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return _json({'success': False, 'error': str(e)}, 500)
 
 
 # ==================== LINE Bot Callback ====================
@@ -367,18 +506,28 @@ def callback():
 
     # get request body as text
     body = request.get_data(as_text=True)
-    app.logger.info("Request body: " + body)
+    logger.info("Request body: %s", body)
 
-    # handle webhook body
-    try:
-        handler.handle(body, signature)
-    except InvalidSignatureError:
-        app.logger.info("Invalid signature. Please check your channel access token/channel secret.")
+    # 先同步驗證簽章,無效的請求直接回 400
+    if not handler.parser.signature_validator.validate(body, signature):
+        logger.info("Invalid signature. Please check your channel access token/channel secret.")
         abort(400)
 
+    # handle webhook body in the background; the reply token stays valid long enough
+    line_executor.submit(_handle_webhook, body, signature)
+
     return 'OK'
 
 
+def _handle_webhook(body, signature):
+    try:
+        handler.handle(body, signature)
+    except InvalidSignatureError:
+        logger.info("Invalid signature. Please check your channel access token/channel secret.")
+    except Exception:
+        logger.exception("handle webhook failed")
+
+
 @handler.add(MessageEvent, message=TextMessageContent)
 def handle_message(event):
     user_text = event.message.text
@@ -391,28 +540,25 @@ def handle_message(event):
         # 格式化回覆訊息
         reply_text = format_result_for_line(result_dict)
         
-        with ApiClient(configuration) as api_client:
-            line_bot_api = MessagingApi(api_client)
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(
-                    reply_token=event.reply_token,
-                    messages=[TextMessage(text=reply_text)]
-                )
+        line_bot_api.reply_message_with_http_info(
+            ReplyMessageRequest(
+                reply_token=event.reply_token,
+                messages=[TextMessage(text=reply_text)]
             )
-    except Exception as e:
-        print(f"Error handling message: {e}")
+        )
+    except Exception:
+        logger.exception("handle_message failed")
         # 發生錯誤時，可以選擇回覆錯誤訊息或忽略
-        with ApiClient(configuration) as api_client:
-            line_bot_api = MessagingApi(api_client)
-            line_bot_api.reply_message_with_http_info(
-                ReplyMessageRequest(
-                    reply_token=event.reply_token,
-                    messages=[TextMessage(text="抱歉，系統發生錯誤，請稍後再試。")]
-                )
+        line_bot_api.reply_message_with_http_info(
+            ReplyMessageRequest(
+                reply_token=event.reply_token,
+                messages=[TextMessage(text="抱歉，系統發生錯誤，請稍後再試。")]
             )
+        )
 
 
 if __name__ == '__main__':
+    # 開發用的內建伺服器;生產環境請用 gunicorn -c gunicorn_conf.py flask_line_bot:app
     PORT = 5001  # 改用 5001 連接埠
     print("=" * 60)
     print("🚀 AI Web Service (with LINE Bot) 啟動中...")
@@ -420,4 +566,4 @@ if __name__ == '__main__':
     print(f"📍 服務位址: http://localhost:{PORT}")
     print(f"📖 API 文件: http://localhost:{PORT}")
     print("=" * 60)
-    app.run(debug=True, host='0.0.0.0', port=PORT)
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", host='0.0.0.0', port=PORT)
@@ -1,38 +1,139 @@
-from flask import Flask, request, jsonify, render_template
+from quart import Quart, Response, request, jsonify, render_template
+from collections import OrderedDict
+import asyncio
+import contextvars
+import functools
+import hashlib
 import ollama
 import json
-import re
+import orjson
+import os
+import time
+
+from schemas import NEWS_5W1H_SCHEMA
+
+# Quart 與 Flask 的 API 幾乎相同,但 view 是 coroutine:
+# 等待 Ollama 回應時不佔住執行緒,多個請求的網路 I/O 可以重疊
+app = Quart(__name__)
+
+# 整個模組共用一個 AsyncClient,所有請求沿用同一個連線池
+client = ollama.AsyncClient()
+
+# ==================== Response cache ====================
+# 相同的 (函式, 模型, 指令, 輸入) 直接回傳先前的結果,不再送到 Ollama;
+# 行程內的 LRU,超過 CACHE_MAXSIZE 筆時淘汰最久沒用到的,每筆 CACHE_TTL 秒後過期
+CACHE_TTL = int(os.environ.get("CACHE_TTL", "3600"))
+CACHE_MAXSIZE = int(os.environ.get("CACHE_MAXSIZE", "1024"))
+_cache = OrderedDict()  # key -> (expires_at, result)
+
+# 每個請求是獨立的 task,各自記錄最後一次快取查詢的結果,回應時放進 X-Cache 標頭
+_cache_status = contextvars.ContextVar("cache_status", default=None)
+
+
+def cached(ttl=CACHE_TTL, cache_if=None):
+    """快取 coroutine 的結果;cache_if(result) 為 False 時不寫入快取"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            raw_key = json.dumps([fn.__name__, args, kwargs], ensure_ascii=False, sort_keys=True, default=str)
+            key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+            entry = _cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                _cache.move_to_end(key)
+                _cache_status.set("HIT")
+                return entry[1]
+
+            result = await fn(*args, **kwargs)
+            _cache_status.set("MISS")
+            if cache_if is None or cache_if(result):
+                _cache[key] = (time.monotonic() + ttl, result)
+                _cache.move_to_end(key)
+                while len(_cache) > CACHE_MAXSIZE:
+                    _cache.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
 
-app = Flask(__name__)
 
 # ==================== Ollama-based helper functions (adapted from ai02-use-ollama.py) ====================
 
-def ask(input_text, model="gemma3:1b", instructions="You are a helpful assistant."):
-    """通用問答 (使用 Ollama)"""
-    messages = [
+def _ask_messages(input_text, instructions):
+    return [
         {"role": "system", "content": instructions},
         {"role": "user", "content": input_text},
     ]
-    resp = ollama.chat(model=model, messages=messages)
+
+
+@cached()
+async def ask(input_text, model="gemma3:1b", instructions="You are a helpful assistant."):
+    """通用問答 (使用 Ollama)"""
+    messages = _ask_messages(input_text, instructions)
+    resp = await client.chat(model=model, messages=messages)
     return resp.get("message", {}).get("content")
 
 
-def translator(text, model="gemma3:1b"):
+TRANSLATOR_INSTRUCTIONS = ("You are a professional translator.\n"
+                           "If the input text is in Traditional Chinese (繁體中文), translate it to English.\n"
+                           "If the input text is in English, translate it to Traditional Chinese (繁體中文).\n"
+                           "Only return the translated text, nothing else.")
+
+
+@cached()
+async def translator(text, model="gemma3:1b"):
     """翻譯 (使用 Ollama) - 回傳原文與譯文"""
-    instructions = ("You are a professional translator.\n"
-                    "If the input text is in Traditional Chinese (繁體中文), translate it to English.\n"
-                    "If the input text is in English, translate it to Traditional Chinese (繁體中文).\n"
-                    "Only return the translated text, nothing else.")
-    messages = [
-        {"role": "system", "content": instructions},
-        {"role": "user", "content": text},
-    ]
-    resp = ollama.chat(model=model, messages=messages)
+    messages = _ask_messages(text, TRANSLATOR_INSTRUCTIONS)
+    resp = await client.chat(model=model, messages=messages)
     translated = resp.get("message", {}).get("content")
     return {"original": text, "translated": translated}
 
 
-def news_5w1h_summarizer(news_text, model="gemma3:1b"):
+def _find_json(content):
+    """回傳 content 中第一個括號平衡的 {...} 片段;只往前掃一次,忽略字串內的括號"""
+    start = content.find("{")
+    if start < 0:
+        return None
+    depth = 0
+    in_str = False
+    esc = False
+    for i in range(start, len(content)):
+        c = content[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+        elif c == '"':
+            in_str = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return content[start:i + 1]
+    return None
+
+
+def _parse_json(content):
+    """解析模型輸出的 JSON;整段不是 JSON 時,再嘗試擷取其中的 {...} 片段。失敗回傳 None"""
+    # Try to parse JSON directly
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # Fall back to the first balanced {...} in the output
+        fragment = _find_json(content)
+        if fragment is not None:
+            try:
+                return orjson.loads(fragment)
+            except orjson.JSONDecodeError:
+                pass
+    return None
+
+
+@cached(cache_if=lambda result: "raw" not in result)
+async def news_5w1h_summarizer(news_text, model="gemma3:1b"):
     """使用 Ollama 提取 5W1H，並嘗試解析回傳的 JSON。"""
     system_prompt = (
         "你是一位專業的新聞分析師。請從新聞內容中提取 5W1H 資訊，並以 JSON 格式回傳。" 
@@ -44,22 +145,13 @@ def news_5w1h_summarizer(news_text, model="gemma3:1b"):
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": news_text}
     ]
-    resp = ollama.chat(model=model, messages=messages)
+    # 以 JSON schema 作為 format,Ollama 會限制輸出必為符合欄位的 JSON
+    resp = await client.chat(model=model, messages=messages, format=NEWS_5W1H_SCHEMA)
     content = resp.get("message", {}).get("content", "")
 
-    # Try to parse JSON directly
-    try:
-        parsed = json.loads(content)
+    parsed = _parse_json(content)
+    if parsed is not None:
         return parsed
-    except Exception:
-        # Try to extract JSON substring using regex
-        m = re.search(r"\{[\s\S]*\}", content)
-        if m:
-            try:
-                parsed = json.loads(m.group(0))
-                return parsed
-            except Exception:
-                pass
     # Fallback: return content as 'raw' field and mark other fields as '未提及'
     return {
         "who": "未提及",
@@ -72,49 +164,114 @@ def news_5w1h_summarizer(news_text, model="gemma3:1b"):
     }
 
 
-def create_story(topic, model="gemma3:1b", instructions="Tell the story like 村上春樹", word_count=100):
+def _story_messages(topic, instructions, word_count):
     prompt = f"寫一個跟 {topic} 有關的床邊故事，約 {word_count} 字的段落。請用中文。"
-    messages = [
+    return [
         {"role": "system", "content": instructions},
         {"role": "user", "content": prompt}
     ]
-    resp = ollama.chat(model=model, messages=messages)
+
+
+@cached()
+async def create_story(topic, model="gemma3:1b", instructions="Tell the story like 村上春樹", word_count=100):
+    messages = _story_messages(topic, instructions, word_count)
+    resp = await client.chat(model=model, messages=messages)
     return resp.get("message", {}).get("content")
 
 
-def task_dispatcher(user_request, model="gemma3:1b"):
-    """簡單的任務分派器，使用 ask 進行分類並呼叫對應函式"""
-    classification_prompt = f"分析以下使用者請求並回傳要使用的函式名稱：translator, news_summarizer, story_creator, general_question\n使用者請求: {user_request}"
-    function_name = ask(classification_prompt, model=model, instructions="You are a task classifier. Return only the function name.").strip().lower()
-
-    if "translator" in function_name:
-        # Extract text to translate
-        extract_prompt = f"從以下請求中提取需要翻譯的文字內容, 只回傳要翻譯的文字:\n{user_request}"
-        text_to_translate = ask(extract_prompt, model=model, instructions="Extract only the text to translate.")
-        return {"task_type": "translator", "result": translator(text_to_translate, model=model)}
-    elif "news" in function_name or "news_summarizer" in function_name:
-        extract_prompt = f"從以下請求中提取新聞內容文字, 只回傳新聞文字本身:\n{user_request}"
-        news_content = ask(extract_prompt, model=model, instructions="Extract only the news content.")
-        return {"task_type": "news_summarizer", "result": news_5w1h_summarizer(news_content, model=model)}
-    elif "story" in function_name or "story_creator" in function_name:
-        extract_prompt = f"從以下請求中提取故事主題, 只回傳主題關鍵詞:\n{user_request}"
-        topic = ask(extract_prompt, model=model, instructions="Extract only the story topic.")
-        return {"task_type": "story_creator", "result": {"topic": topic, "story": create_story(topic, model=model)}}
+DISPATCHER_INSTRUCTIONS = (
+    "You are a task dispatcher. Classify the user request and extract the content the task needs.\n"
+    "Return JSON only: {\"task\": \"translator|news_summarizer|story_creator|general_question\", \"payload\": \"...\"}\n"
+    "- translator: payload 只放需要翻譯的文字\n"
+    "- news_summarizer: payload 只放新聞內容文字本身\n"
+    "- story_creator: payload 只放故事主題關鍵詞\n"
+    "- general_question: payload 為使用者的問題"
+)
+
+
+# 選用(預設關閉):設為 "1" 時,分類的同時先把請求當成一般問題送出;分類結果是 general_question
+# 時直接用這個答案,其他任務則取消它。每次分派都會多一個完整生成,只適合 OLLAMA_NUM_PARALLEL 有餘裕時開啟
+SPECULATIVE_GENERAL_ANSWER = os.environ.get("SPECULATIVE_GENERAL_ANSWER", "0") == "1"
+
+
+async def task_dispatcher(user_request, model="gemma3:1b"):
+    """簡單的任務分派器：一次呼叫同時完成分類與內容擷取，再呼叫對應函式"""
+    # 分類與擷取合併成一個 JSON 回應,省下一整輪 prefill + decode;
+    # 不同請求之間仍可同時等待
+    messages = [
+        {"role": "system", "content": DISPATCHER_INSTRUCTIONS},
+        {"role": "user", "content": user_request},
+    ]
+    general_task = asyncio.create_task(ask(user_request, model=model)) if SPECULATIVE_GENERAL_ANSWER else None
+    try:
+        resp = await client.chat(model=model, messages=messages, format="json")
+    except BaseException:
+        if general_task is not None:
+            general_task.cancel()
+        raise
+    decision = _parse_json(resp.get("message", {}).get("content", "")) or {}
+    task = str(decision.get("task", "")).strip().lower()
+    payload = str(decision.get("payload") or "").strip() or user_request
+
+    is_general = not any(name in task for name in ("translator", "news", "story"))
+    if general_task is not None and not is_general:
+        general_task.cancel()
+
+    if "translator" in task:
+        return {"task_type": "translator", "result": await translator(payload, model=model)}
+    elif "news" in task:
+        return {"task_type": "news_summarizer", "result": await news_5w1h_summarizer(payload, model=model)}
+    elif "story" in task:
+        return {"task_type": "story_creator", "result": {"topic": payload, "story": await create_story(payload, model=model)}}
     else:
-        return {"task_type": "general_question", "result": ask(user_request, model=model)}
+        answer = await general_task if general_task is not None else await ask(user_request, model=model)
+        return {"task_type": "general_question", "result": answer}
+
+
+# ==================== Web Service API Endpoints (Quart) ====================
+
+def _wants_stream():
+    """?stream=1 時以 NDJSON 逐字串流回應;預設維持一次回傳完整 JSON"""
+    return request.args.get('stream', '0') == '1'
+
+
+def _stream_chat(model, messages, done):
+    """
+    以 NDJSON 串流 Ollama 的輸出:每個片段一行 {"type": "token"},
+    結束時送出 {"type": "done", **done(full_response)},格式與 /api/chat_memory 相同
+    """
+    async def generate():
+        try:
+            full_response = ""
+            async for chunk in await client.chat(model=model, messages=messages, stream=True):
+                content = chunk.get('message', {}).get('content', '')
+                if content:
+                    full_response += content
+                    yield orjson.dumps({"type": "token", "content": content}) + b"\n"
+            yield orjson.dumps({"type": "done", **done(full_response)}) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"type": "error", "content": str(e)}) + b"\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 
+@app.after_request
+async def add_cache_header(response):
+    status = _cache_status.get()
+    if status is not None:
+        response.headers['X-Cache'] = status
+    return response
 
-# ==================== Web Service API Endpoints (Flask) ====================
 
 @app.route('/')
-def home():
-    return render_template('index.html')
+async def home():
+    return await render_template('index.html')
 
 
 @app.route('/api/ask', methods=['POST'])
-def api_ask():
+async def api_ask():
     try:
-        data = request.get_json()
+        data = await request.get_json()
         input_text = data.get('input_text', '')
         model = data.get('model', 'gemma3:1b')
         instructions = data.get('instructions', 'You are a helpful assistant.')
@@ -122,48 +279,56 @@ def api_ask():
         if not input_text:
             return jsonify({'error': '缺少 input_text 參數'}), 400
 
-        result = ask(input_text, model=model, instructions=instructions)
+        if _wants_stream():
+            return _stream_chat(model, _ask_messages(input_text, instructions),
+                                lambda full: {'input': input_text, 'output': full})
+
+        result = await ask(input_text, model=model, instructions=instructions)
         return jsonify({'success': True, 'input': input_text, 'output': result})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/translate', methods=['POST'])
-def api_translate():
+async def api_translate():
     try:
-        data = request.get_json()
+        data = await request.get_json()
         text = data.get('text', '')
         model = data.get('model', 'gemma3:1b')
 
         if not text:
             return jsonify({'error': '缺少 text 參數'}), 400
 
-        result = translator(text, model=model)
+        if _wants_stream():
+            return _stream_chat(model, _ask_messages(text, TRANSLATOR_INSTRUCTIONS),
+                                lambda full: {'original': text, 'translated': full})
+
+        result = await translator(text, model=model)
         return jsonify({'success': True, 'original': result['original'], 'translated': result['translated']})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/news-summary', methods=['POST'])
-def api_news_summary():
+async def api_news_summary():
     try:
-        data = request.get_json()
+        data = await request.get_json()
         news_text = data.get('news_text', '')
         model = data.get('model', 'gemma3:1b')
 
         if not news_text:
             return jsonify({'error': '缺少 news_text 參數'}), 400
 
-        result = news_5w1h_summarizer(news_text, model=model)
+        result = await news_5w1h_summarizer(news_text, model=model)
         return jsonify({'success': True, 'summary': result})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/create-story', methods=['POST'])
-def api_create_story():
+async def api_create_story():
     try:
-        data = request.get_json()
+        data = await request.get_json()
         topic = data.get('topic', '')
         model = data.get('model', 'gemma3:1b')
         word_count = data.get('word_count', 100)
@@ -172,64 +337,75 @@ def api_create_story():
         if not topic:
             return jsonify({'error': '缺少 topic 參數'}), 400
 
-        result = create_story(topic, model=model, instructions=instructions, word_count=word_count)
+        if _wants_stream():
+            return _stream_chat(model, _story_messages(topic, instructions, word_count),
+                                lambda full: {'topic': topic, 'story': full})
+
+        result = await create_story(topic, model=model, instructions=instructions, word_count=word_count)
         return jsonify({'success': True, 'topic': topic, 'story': result})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/dispatch', methods=['POST'])
-def api_dispatch():
+async def api_dispatch():
     try:
-        data = request.get_json()
+        data = await request.get_json()
         user_request = data.get('user_request', '')
         model = data.get('model', 'gemma3:1b')
 
         if not user_request:
             return jsonify({'error': '缺少 user_request 參數'}), 400
 
-        result = task_dispatcher(user_request, model=model)
+        result = await task_dispatcher(user_request, model=model)
         return jsonify({'success': True, 'task_type': result['task_type'], 'result': result['result']})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/health', methods=['GET'])
-def health_check():
+async def health_check():
     return jsonify({'status': 'healthy', 'service': 'Ollama AI Web Service', 'version': '1.0.0'})
 
 
+# 已安裝的模型很少變動,清單快取 60 秒,儀表板輪詢時不必每次都問 Ollama
+_MODELS_TTL = 60
+_models_cache = {"models": None, "cached_at": 0.0}
+
+
+async def _list_models():
+    if _models_cache["models"] is not None and time.monotonic() - _models_cache["cached_at"] < _MODELS_TTL:
+        return _models_cache["models"]
+
+    models = []
+    try:
+        resp = await client.list()
+        models = [m['model'] for m in resp['models']]
+    except Exception:
+        # ignore and fallback
+        pass
+
+    if not models:
+        models = ['gemma3:1b', 'gemma3:12b']
+
+    _models_cache["models"] = models
+    _models_cache["cached_at"] = time.monotonic()
+    return models
+
+
 @app.route('/api/models', methods=['GET'])
-def api_models():
+async def api_models():
     """Return available models for this Ollama-based service.
-    Attempts to query the `ollama` client for available models; falls back to a sensible default list.
+    Queries the local Ollama server for installed models; falls back to a sensible default list.
     """
     try:
-        models = []
-        try:
-            if hasattr(ollama, 'models'):
-                resp = ollama.models()
-                # resp might be a list of model names or dicts
-                if isinstance(resp, list):
-                    for m in resp:
-                        if isinstance(m, dict) and 'name' in m:
-                            models.append(m['name'])
-                        elif isinstance(m, str):
-                            models.append(m)
-        except Exception:
-            # ignore and fallback
-            pass
-
-        if not models:
-            models = ['gemma3:1b', 'gemma3:12b']
-
-        return jsonify({'success': True, 'models': models})
+        return jsonify({'success': True, 'models': await _list_models()})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @app.route('/api/service-info', methods=['GET'])
-def api_service_info():
+async def api_service_info():
     """Return basic service info for the current backend (ollama)."""
     try:
         return jsonify({'success': True, 'service': 'ollama', 'service_label': 'Ollama'})
@@ -243,5 +419,10 @@ if __name__ == '__main__':
     print('🚀 Ollama AI Web Service 啟動中...')
     print('=' * 60)
     print(f'📍 服務位址: http://localhost:{PORT}')
+    # Ollama 端預設一次只處理少量請求;要讓多個請求真正平行,啟動 `ollama serve` 前設定:
+    print(f"⚙️  OLLAMA_NUM_PARALLEL={os.environ.get('OLLAMA_NUM_PARALLEL', '(未設定)')}  "
+          f"OLLAMA_MAX_LOADED_MODELS={os.environ.get('OLLAMA_MAX_LOADED_MODELS', '(未設定)')}")
+    print('   提高 OLLAMA_NUM_PARALLEL 可讓同時進來的請求在 Ollama 端平行解碼')
+    print('🏭 正式部署請改用: hypercorn -w 4 -b 0.0.0.0:5002 flask_ollama_app:app')
     print('=' * 60)
-    app.run(debug=True, host='0.0.0.0', port=PORT)
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", host='0.0.0.0', port=PORT)
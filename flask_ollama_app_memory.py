@@ -1,8 +1,14 @@
 from flask import Flask, request, jsonify, render_template, stream_with_context, Response
+import httpx
 import ollama
+import atexit
 import json
+import orjson
 import os
+import threading
+import time
 from datetime import datetime
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 app = Flask(__name__)
 
@@ -12,8 +18,90 @@ app = Flask(__name__)
 
 # Configuration
 DEFAULT_MODEL = "gemma3:4b"
+# One Ollama client for the whole app so every call reuses the same HTTP connection pool
+client = ollama.Client(host=os.environ.get("OLLAMA_HOST"), timeout=120.0)
+
+# Errors raised by a failed Ollama call (server error, HTTP failure, server unreachable)
+OLLAMA_ERRORS = (ollama.ResponseError, httpx.HTTPError, ConnectionError)
+
+
+def _is_transient(e):
+    """5xx responses and connection problems are worth retrying; 4xx (e.g. unknown model) are not."""
+    if isinstance(e, ollama.ResponseError):
+        return e.status_code >= 500
+    return isinstance(e, (httpx.TransportError, ConnectionError))
+
+
+@retry(
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_transient),
+    reraise=True,
+)
+def _ollama_chat(**kwargs):
+    """Non-streaming client.chat with jittered exponential backoff on transient errors."""
+    return client.chat(**kwargs)
 # File to store persistent memory
 MEMORY_FILE = "memory_data.json"
+# Seconds between background flushes of dirty memory to MEMORY_FILE
+SAVE_INTERVAL = 2.0
+# Pruned messages are summarized in batches: once this many are pending,
+# or when the oldest pending one has waited this many seconds
+SUMMARY_BATCH_SIZE = 8
+SUMMARY_MAX_DELAY = 30.0
+# Onboarding persona extraction waits for at least this many messages in the active window
+PERSONA_MIN_MESSAGES = 3
+
+# Bounds on long-term memory so the system prompt (and its prefill cost) stops growing with session age:
+# each topic keeps its most recent characters, the history its most recent lines,
+# and the prompt includes only the most recently updated topics that fit
+TOPIC_SUMMARY_MAX_CHARS = 2000
+REQUEST_HISTORY_MAX_LINES = 20
+KNOWLEDGE_GRAPH_MAX_CHARS = 4000
+
+# Topic-shift prefilter: messages shorter than this, or sharing more than this fraction of
+# character 3-grams with the previous user message, are treated as the same topic without asking the LLM
+TOPIC_SHIFT_MIN_CHARS = 20
+TOPIC_SHIFT_SIMILARITY = 0.2
+
+
+def _trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _format_transcript(messages):
+    """Render messages as 'User: ...' / 'AI: ...' lines (one join instead of repeated +=)."""
+    return "".join(f"{'User' if m['role'] == 'user' else 'AI'}: {m['content']}\n" for m in messages)
+
+
+# JSON schemas passed as Ollama's `format`, so the model output is always parseable JSON
+TOPIC_SHIFT_FORMAT = {
+    "type": "object",
+    "properties": {"shift": {"type": "boolean"}},
+    "required": ["shift"],
+}
+SUMMARY_FORMAT = {
+    "type": "object",
+    "properties": {
+        "topic": {"type": "string"},
+        "summary": {"type": "string"},
+        "history": {"type": "string"},
+    },
+    "required": ["topic", "summary", "history"],
+}
+
+# Guidelines for returning clients; kept constant (patient file goes in a separate, later
+# system message) so every turn starts with the same prompt prefix
+NORMAL_SYSTEM_PROMPT = (
+    "You are an empathetic, professional AI Therapist.\n\n"
+    "=== GUIDELINES ===\n"
+    "1. CONTINUITY: If 'Session History' is not empty, explicitly try to recall or check in on a previous topic if relevant.\n"
+    "2. EMPATHY: Be supportive, non-judgmental, and concise.\n"
+    "3. PERSONA: Tailor advice based on the 'Patient File' knowledge.\n"
+    "4. DO NOT INTERROGATE: Avoid asking too many questions at once.\n"
+    "Use the provided context to guide the session naturally."
+)
 
 class MemoryManager:
     def __init__(self):
@@ -23,14 +111,25 @@ class MemoryManager:
             "request_history": "None"
         }
         self.last_interaction = None
+        self._last_interaction_iso = None
+        self._last_interaction_mono = None
+        self._pending_summary = []  # Pruned messages waiting to be summarized
+        self._pending_model = DEFAULT_MODEL
+        self._pending_since = None
+        self._last_persona_hash = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # The flush thread and the atexit hook share one temp file
         self.load_memory()
+        # Write-behind: save_memory() only marks the state dirty; this thread writes it out
+        threading.Thread(target=self._flush_loop, daemon=True).start()
     
     def load_memory(self):
         """Load state from JSON file if exists."""
         if os.path.exists(MEMORY_FILE):
             try:
-                with open(MEMORY_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                with open(MEMORY_FILE, 'rb') as f:
+                    data = orjson.loads(f.read())
                     self.active_context = data.get("short_term_memory", [])
                     
                     lt = data.get("long_term_memory", {})
@@ -42,24 +141,55 @@ class MemoryManager:
                         
                     self.long_term_summary["request_history"] = lt.get("request_history", "None")
                     
+                    # Messages pruned before a restart still get summarized
+                    self._pending_summary = data.get("pending_summary", [])
+                    if self._pending_summary:
+                        self._pending_since = time.monotonic()
+                    
                     last_ts = data.get("last_interaction")
                     if last_ts:
-                        self.last_interaction = datetime.fromisoformat(last_ts)
+                        self._set_last_interaction(datetime.fromisoformat(last_ts))
                         
                 print(f"📂 Loaded memory from {MEMORY_FILE}")
             except Exception as e:
                 print(f"⚠️ Failed to load memory: {e}")
 
     def save_memory(self):
-        """Save current state to JSON file."""
-        data = {
-            "long_term_memory": self.long_term_summary,
-            "short_term_memory": self.active_context,
-            "last_interaction": self.last_interaction.isoformat() if self.last_interaction else None
-        }
+        """Mark state as changed; the background thread writes it within SAVE_INTERVAL seconds."""
+        with self._lock:
+            self._dirty = True
+
+    def _flush_loop(self):
+        # Only writes; summaries run on request threads (process_memory) so a slow LLM call never delays a save
+        while True:
+            time.sleep(SAVE_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Write current state to JSON file if it changed since the last write."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # Shallow copies so request threads can keep appending while we serialize
+            data = {
+                "long_term_memory": {
+                    "topics": dict(self.long_term_summary["topics"]),
+                    "request_history": self.long_term_summary["request_history"]
+                },
+                "short_term_memory": list(self.active_context),
+                "pending_summary": list(self._pending_summary),
+                "last_interaction": self._last_interaction_iso
+            }
         try:
-            with open(MEMORY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            # Serialize once with orjson (UTF-8, like ensure_ascii=False), write to a temp file
+            # and swap it in, so a crash mid-write never leaves a half-written MEMORY_FILE
+            data_bytes = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            tmp_file = MEMORY_FILE + ".tmp"
+            with self._write_lock:
+                with open(tmp_file, 'wb') as f:
+                    f.write(data_bytes)
+                os.replace(tmp_file, MEMORY_FILE)
             print(f"💾 Memory saved to {MEMORY_FILE}")
         except Exception as e:
             print(f"❌ Failed to save memory: {e}")
@@ -71,19 +201,30 @@ class MemoryManager:
                 print("🔄 Topic Shift Detected! Flushing memory...")
                 self.force_flush(model)
         
-        self.active_context.append({"role": role, "content": content})
-        self.last_interaction = datetime.now()
+        with self._lock:
+            self.active_context.append({"role": role, "content": content})
+        self._set_last_interaction(datetime.now())
         self.save_memory()
 
     def detect_topic_shift(self, new_content, model):
         """
         Ask LLM if new_content is a shift from active_context.
+        Short messages and ones similar to the last user message skip the LLM call.
         """
+        if len(new_content.strip()) < TOPIC_SHIFT_MIN_CHARS:
+            return False
+        with self._lock:
+            active_context = list(self.active_context)
+        last_user = next((m['content'] for m in reversed(active_context) if m['role'] == 'user'), None)
+        if last_user:
+            new_grams, last_grams = _trigrams(new_content), _trigrams(last_user)
+            union = new_grams | last_grams
+            if union and len(new_grams & last_grams) / len(union) > TOPIC_SHIFT_SIMILARITY:
+                return False
+
         # Take last 3 messages for context
-        recent = self.active_context[-3:]
-        context_text = ""
-        for m in recent:
-            context_text += f"{m['role']}: {m['content']}\n"
+        recent = active_context[-3:]
+        context_text = "".join(f"{m['role']}: {m['content']}\n" for m in recent)
             
         prompt = (
             "You are a conversation flow analyzer.\n"
@@ -91,32 +232,41 @@ class MemoryManager:
             f"=== NEW MESSAGE ===\nuser: {new_content}\n\n"
             "TASK: Is the NEW MESSAGE introducing a completely different topic compared to the CONTEXT? "
             "(e.g. switching from coding to cooking, or family to work).\n"
-            "Answer ONLY 'YES' or 'NO'."
+            'Answer in JSON: {"shift": true} or {"shift": false}.'
         )
         
         try:
-            resp = ollama.chat(model=model, messages=[{'role': 'user', 'content': prompt}])
-            ans = resp.get("message", {}).get("content", "").strip().upper()
-            return "YES" in ans
-        except:
+            resp = _ollama_chat(model=model, messages=[{'role': 'user', 'content': prompt}], format=TOPIC_SHIFT_FORMAT)
+            ans = orjson.loads(resp.get("message", {}).get("content", ""))
+            return ans.get("shift") is True
+        except (*OLLAMA_ERRORS, orjson.JSONDecodeError) as e:
+            print(f"⚠️ Topic shift check failed: {e}")
             return False
 
     def force_flush(self, model):
         """
-        Summarize ALL active context immediately and clear it.
+        Summarize ALL active context (and anything still pending) immediately and clear it.
         """
-        if not self.active_context: return
-        self._update_summary(self.active_context, model)
-        self.active_context = []
+        with self._lock:
+            if not self.active_context and not self._pending_summary: return
+            messages = self._pending_summary + self.active_context
+            self._pending_summary, self._pending_since = [], None
+            self.active_context = []
+        self._update_summary(messages, model)
         self.save_memory()
 
 
+    def _set_last_interaction(self, dt):
+        """Store the timestamp with its ISO string (for saving) and a monotonic stamp (for get_time_ago)."""
+        self.last_interaction = dt
+        self._last_interaction_iso = dt.isoformat()
+        self._last_interaction_mono = time.monotonic() - (datetime.now() - dt).total_seconds()
+
     def get_time_ago(self):
-        if not self.last_interaction:
+        if self._last_interaction_mono is None:
             return "a long time"
         
-        delta = datetime.now() - self.last_interaction
-        seconds = delta.total_seconds()
+        seconds = time.monotonic() - self._last_interaction_mono
         
         if seconds < 60: return "just a moment"
         if seconds < 3600: return f"{int(seconds // 60)} minutes"
@@ -126,20 +276,39 @@ class MemoryManager:
     def process_memory(self, window_size: int, model: str):
         """
         Check if active_context exceeds window_size.
-        If so, take the overflow, summarize it, and append to long_term_summary.
+        If so, move the overflow to the pending batch; the batch is summarized into
+        long_term_summary once SUMMARY_BATCH_SIZE messages are pending or after SUMMARY_MAX_DELAY seconds.
         """
         max_msgs = window_size * 2 
         
-        if len(self.active_context) > max_msgs:
-            # We need to prune
-            num_to_prune = len(self.active_context) - max_msgs
-            to_be_summarized = self.active_context[:num_to_prune]
-            self.active_context = self.active_context[num_to_prune:]
-            
-            # Perform Summarization
-            self._update_summary(to_be_summarized, model)
-            
-            # Save after pruning
+        with self._lock:
+            if len(self.active_context) > max_msgs:
+                # We need to prune
+                num_to_prune = len(self.active_context) - max_msgs
+                to_be_summarized = self.active_context[:num_to_prune]
+                self.active_context = self.active_context[num_to_prune:]
+
+                # Queue for summarization
+                self._pending_summary.extend(to_be_summarized)
+                self._pending_model = model
+                if self._pending_since is None:
+                    self._pending_since = time.monotonic()
+                # Save after pruning
+                self._dirty = True
+            due = self._pending_summary and (
+                len(self._pending_summary) >= SUMMARY_BATCH_SIZE
+                or time.monotonic() - self._pending_since >= SUMMARY_MAX_DELAY
+            )
+        if due:
+            self._summarize_pending()
+
+    def _summarize_pending(self):
+        """Summarize every pending pruned message in one LLM call."""
+        with self._lock:
+            pending, self._pending_summary, self._pending_since = self._pending_summary, [], None
+            model = self._pending_model
+        if pending:
+            self._update_summary(pending, model)
             self.save_memory()
 
     def _update_summary(self, messages, model):
@@ -148,12 +317,10 @@ class MemoryManager:
         """
         print(f"🧠 Summarizing {len(messages)} messages (Topic Routing)...")
         
-        conversation_text = ""
-        for m in messages:
-            role = "User" if m['role'] == 'user' else "AI"
-            conversation_text += f"{role}: {m['content']}\n"
+        conversation_text = _format_transcript(messages)
             
-        current_topics = ", ".join(self.long_term_summary['topics'].keys())
+        with self._lock:
+            current_topics = ", ".join(self.long_term_summary['topics'].keys())
         
         prompt = (
             "You are a memory manager. Compress this conversation into long-term memory.\n"
@@ -163,59 +330,36 @@ class MemoryManager:
             "1. Identify the PRIMARY TOPIC of this conversation (e.g., Coding, Family, Health, Travel). Use an existing one if it fits, or name a new one.\n"
             "2. Summarize key facts/events relevant to that topic.\n"
             "3. Update the 'History' log with a 1-line summary of the user's request.\n"
-            "4. FORMAT:\n"
-            "TOPIC: [Topic Name]\n"
-            "SUMMARY: [New facts to append to this topic]\n"
-            "HISTORY: [1-line request summary]"
+            "4. Answer in JSON with the keys:\n"
+            '"topic": Topic Name, "summary": New facts to append to this topic, "history": 1-line request summary'
         )
         
         try:
-            resp = ollama.chat(model=model, messages=[{'role': 'user', 'content': prompt}])
+            resp = _ollama_chat(model=model, messages=[{'role': 'user', 'content': prompt}], format=SUMMARY_FORMAT)
             raw_output = resp.get("message", {}).get("content", "")
             
-            # Parsing
-            topic_name = "General"
-            summary_text = ""
-            history_text = ""
+            # The output is schema-constrained JSON, so a single parse is enough
+            try:
+                parsed = orjson.loads(raw_output)
+            except orjson.JSONDecodeError:
+                parsed = {}
             
-            lines = raw_output.split('\n')
-            for line in lines:
-                if line.startswith("TOPIC:"):
-                    topic_name = line.replace("TOPIC:", "").strip()
-                elif line.startswith("SUMMARY:"):
-                    summary_text = line.replace("SUMMARY:", "").strip()
-                elif line.startswith("HISTORY:"):
-                    history_text = line.replace("HISTORY:", "").strip()
+            topic_name = str(parsed.get("topic") or "").strip() or "General"
+            summary_text = str(parsed.get("summary") or "").strip()
+            history_text = str(parsed.get("history") or "").strip() or "Conversation about " + topic_name
             
-            # Fallback for multiline summary (simple heuristic or regex is better, but this suffices for demo)
-            # A better parser would split by tokens. Let's do a reliable split.
-            if "TOPIC:" in raw_output and "SUMMARY:" in raw_output:
-                # Robust split
-                parts = raw_output.split("SUMMARY:")
-                topic_part = parts[0].replace("TOPIC:", "").strip()
-                rem = parts[1]
-                
-                if "HISTORY:" in rem:
-                    parts2 = rem.split("HISTORY:")
-                    summary_part = parts2[0].strip()
-                    history_part = parts2[1].strip()
-                else:
-                    summary_part = rem.strip()
-                    history_part = "Conversation about " + topic_part
-                
-                if topic_part: topic_name = topic_part
-                if summary_part: summary_text = summary_part
-                if history_part: history_text = history_part
-                
-                # Update Topic
-                old_summary = self.long_term_summary['topics'].get(topic_name, "")
-                if old_summary:
-                    self.long_term_summary['topics'][topic_name] = old_summary + "; " + summary_text
-                else:
-                    self.long_term_summary['topics'][topic_name] = summary_text
-                    
-                # Update History
-                self.long_term_summary['request_history'] = self.long_term_summary.get('request_history', "") + "\n" + history_text
+            if summary_text:
+                # The LLM call ran without the lock; apply the result atomically
+                with self._lock:
+                    # Update Topic (re-inserted so dict order tracks the most recently updated topic)
+                    topics = self.long_term_summary['topics']
+                    old_summary = topics.pop(topic_name, "")
+                    new_summary = old_summary + "; " + summary_text if old_summary else summary_text
+                    topics[topic_name] = new_summary[-TOPIC_SUMMARY_MAX_CHARS:]
+
+                    # Update History
+                    history = self.long_term_summary.get('request_history', "") + "\n" + history_text
+                    self.long_term_summary['request_history'] = "\n".join(history.split("\n")[-REQUEST_HISTORY_MAX_LINES:])
                 
                 print(f"✅ Summary Updated. Topic: {topic_name}")
                 self.save_memory()
@@ -225,20 +369,31 @@ class MemoryManager:
         except Exception as e:
             print(f"❌ Summary fail: {e}")
 
+    def snapshot(self):
+        """Copies of (topics, request_history, active_context) taken under the lock, safe to read while other threads update."""
+        with self._lock:
+            return (dict(self.long_term_summary['topics']), self.long_term_summary['request_history'],
+                    list(self.active_context))
+
     def update_persona_only(self, model):
         """
         Special check: Onboarding check.
         If we have NO topics yet, try to extract basic info.
         """
+        topics, _, active_context = self.snapshot()
         # Only run if we have 0 topics
-        if len(self.long_term_summary['topics']) > 0:
+        if len(topics) > 0:
+            return
+        # Too little to go on yet, or nothing new since the last check
+        if len(active_context) < PERSONA_MIN_MESSAGES:
+            return
+        context_hash = hash(tuple((m['role'], m['content']) for m in active_context))
+        if context_hash == self._last_persona_hash:
             return
+        self._last_persona_hash = context_hash
 
         print("🕵️‍♂️ Checking for Intro in active context...")
-        conversation_text = ""
-        for m in self.active_context:
-            role = "User" if m['role'] == 'user' else "AI"
-            conversation_text += f"{role}: {m['content']}\n"
+        conversation_text = _format_transcript(active_context)
 
         prompt = (
             "Analyze the conversation. Has the user provided their name, profession, or interests?\n"
@@ -250,12 +405,13 @@ class MemoryManager:
         )
 
         try:
-            resp = ollama.chat(model=model, messages=[{'role': 'user', 'content': prompt}])
+            resp = _ollama_chat(model=model, messages=[{'role': 'user', 'content': prompt}])
             result = resp.get("message", {}).get("content", "").strip()
             
             if result and "Unknown" not in result and len(result) < 50:
                 print(f"🎯 Intro Discovered: {result}")
-                self.long_term_summary['topics']['Personal'] = result
+                with self._lock:
+                    self.long_term_summary['topics']['Personal'] = result
                 self.save_memory()
             else:
                 print("🤷‍♂️ No intro found yet.")
@@ -267,8 +423,8 @@ class MemoryManager:
         """
         Constructs messages. Swaps prompts based on emptiness of 'topics'.
         """
-        topics = self.long_term_summary['topics']
-        history = self.long_term_summary['request_history']
+        topics, history, active_context = self.snapshot()
+        patient_file = None
         
         if len(topics) == 0:
             # ONBOARDING PROMPT
@@ -279,45 +435,60 @@ class MemoryManager:
                 "Do NOT force them to answer. Be warm and inviting."
             )
         else:
-            # Format Topics
-            knowledge_graph = ""
-            for t, content in topics.items():
-                knowledge_graph += f"[{t}]: {content}\n"
+            # Pick the most recently updated topics that fit in KNOWLEDGE_GRAPH_MAX_CHARS,
+            # then list them sorted by name so the text only changes when a topic does
+            selected = []
+            total = 0
+            for t in reversed(topics):
+                size = len(t) + len(topics[t]) + 5  # "[t]: content\n"
+                if selected and total + size > KNOWLEDGE_GRAPH_MAX_CHARS:
+                    break
+                selected.append(t)
+                total += size
+            knowledge_graph = "".join(f"[{t}]: {topics[t]}\n" for t in sorted(selected))
             
-            # NORMAL PROMPT
-            system_content = (
-                "You are an empathetic, professional AI Therapist.\n\n"
+            # NORMAL PROMPT: fixed guidelines first and the changing patient file last,
+            # so Ollama can reuse the KV cache for the unchanged prefix across turns
+            system_content = NORMAL_SYSTEM_PROMPT
+            patient_file = (
                 "=== PATIENT FILE ===\n"
                 f"{knowledge_graph}\n"
-                f"[Session History]: {history}\n\n"
-                "=== GUIDELINES ===\n"
-                "1. CONTINUITY: If 'Session History' is not empty, explicitly try to recall or check in on a previous topic if relevant.\n"
-                "2. EMPATHY: Be supportive, non-judgmental, and concise.\n"
-                "3. PERSONA: Tailor advice based on the 'Patient File' knowledge.\n"
-                "4. DO NOT INTERROGATE: Avoid asking too many questions at once.\n"
-                "Use the provided context to guide the session naturally."
+                f"[Session History]: {history}"
             )
             
         messages = [{"role": "system", "content": system_content}]
-        messages.extend(self.active_context)
+        if patient_file:
+            messages.append({"role": "system", "content": patient_file})
+        messages.extend(active_context)
         return messages
 
     def get_status(self):
+        with self._lock:
+            pending_count = len(self._pending_summary)
+        topics, history, active_context = self.snapshot()
         return {
-            "current_summary": self.long_term_summary,
-            "active_window": self.active_context,
-            "active_count": len(self.active_context)
+            "current_summary": {"topics": topics, "request_history": history},
+            "active_window": active_context,
+            "active_count": len(active_context),
+            "pending_summary_count": pending_count
         }
 
     def reset(self):
-        self.active_context = []
-        self.long_term_summary = {
-            "topics": {},
-            "request_history": "None"
-        }
-        self.last_interaction = None
+        with self._lock:
+            self.active_context = []
+            self.long_term_summary = {
+                "topics": {},
+                "request_history": "None"
+            }
+            self.last_interaction = None
+            self._last_interaction_iso = None
+            self._last_interaction_mono = None
+            self._pending_summary = []
+            self._pending_since = None
         self.save_memory()
 memory = MemoryManager()
+# Write out anything still pending when the process exits
+atexit.register(memory.flush)
 
 
 # ==========================================
@@ -362,7 +533,7 @@ def api_chat_memory():
 
         # 4. Stream Response from Ollama
         try:
-            stream = ollama.chat(model=model, messages=messages_to_send, stream=True)
+            stream = client.chat(model=model, messages=messages_to_send, stream=True)
             
             full_response = ""
             for chunk in stream:
@@ -403,12 +574,11 @@ def reset_memory():
 def api_welcome():
     """Generates a proactive greeting if the user is known."""
     try:
-        topics = memory.long_term_summary['topics']
+        topics, history, _ = memory.snapshot()
         if len(topics) == 0:
             return jsonify({'message': ''}) # No greeting for new users
 
         time_ago = memory.get_time_ago()
-        history = memory.long_term_summary['request_history']
         
         # Flatten topics for context
         topics_str = ", ".join([f"{k}: {v}" for k, v in topics.items()])
@@ -426,7 +596,7 @@ def api_welcome():
         
         # Use a model for generation (hardcoded default or query param if needed)
         # model = 'gemma3:1b'
-        resp = ollama.chat(model=DEFAULT_MODEL, messages=[{'role': 'user', 'content': prompt}])
+        resp = _ollama_chat(model=DEFAULT_MODEL, messages=[{'role': 'user', 'content': prompt}])
         greeting = resp.get("message", {}).get("content", "")
         
         # We don't save this greeting to memory immediately to avoid clutter, 
@@ -447,5 +617,8 @@ if __name__ == '__main__':
     print('🧠 Ollama Memory Chat App Started')
     print('=' * 60)
     print(f'📍 URL: http://localhost:{PORT}')
+    print(f"⚙️  OLLAMA_NUM_PARALLEL={os.environ.get('OLLAMA_NUM_PARALLEL', '(not set)')}")
+    # MemoryManager lives in this process, so production runs one worker with many threads
+    print('🏭 Production: gunicorn -k gthread -w 1 --threads 16 -b 0.0.0.0:5003 flask_ollama_app_memory:app')
     print('=' * 60)
-    app.run(debug=True, host='0.0.0.0', port=PORT)
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", host='0.0.0.0', port=PORT)
@@ -0,0 +1,47 @@
+"""
+Gunicorn 設定檔 (flask_line_bot.py 生產環境部署)
+
+啟動方式:
+    gunicorn -c gunicorn_conf.py flask_line_bot:app
+
+工作負載幾乎都在等待 OpenAI / LINE 的網路回應,所以用 gthread:
+每個 worker 行程開多條執行緒,並行數 = workers × threads。
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5001")
+
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+
+# 一次 LINE 事件可能包含數個 OpenAI 呼叫,逾時要比單次呼叫長
+timeout = 120
+keepalive = 5
+
+# 不使用 preload_app:每個 worker fork 之後才載入 app,
+# OpenAI / LINE 的連線池在各自的行程內建立,不會在 fork 前被共用
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """
+    Worker 載入 app 後先對 OpenAI 與 LINE 各送一個輕量請求,
+    讓 DNS 解析與 TLS 交握在這裡完成,第一則 LINE 訊息直接沿用 keepalive 的連線。
+    暖機失敗不影響 worker 啟動,只記錄下來。
+    """
+    from flask_line_bot import client, line_bot_api
+
+    try:
+        client.models.list()
+    except Exception:
+        worker.log.warning("OpenAI 連線預熱失敗", exc_info=True)
+
+    try:
+        line_bot_api.get_bot_info()
+    except Exception:
+        worker.log.warning("LINE 連線預熱失敗", exc_info=True)
@@ -1,6 +1,6 @@
-from flask import Flask, request, abort
+from quart import Quart, request, abort
 from linebot.v3 import (
-    WebhookHandler
+    WebhookParser
 )
 from linebot.v3.exceptions import (
     InvalidSignatureError
@@ -9,6 +9,7 @@ from linebot.v3.messaging import (
     Configuration,
     ApiClient,
     MessagingApi,
+    PushMessageRequest,
     ReplyMessageRequest,
     TextMessage
 )
@@ -16,11 +17,13 @@ from linebot.v3.webhooks import (
     MessageEvent,
     TextMessageContent
 )
+import asyncio
+import httpx
 import os
-import requests
 import json
 
-app = Flask(__name__)
+# Quart 的 view 是 coroutine:等待 AI 服務與 LINE 回覆時,事件迴圈可以處理其他 webhook
+app = Quart(__name__)
 
 # LINE Bot 設定
 # 請確保您已設定這些環境變數，或直接填入您的 Token 與 Secret
@@ -30,22 +33,74 @@ LINE_CHANNEL_SECRET = os.environ.get("LINE_CHANNEL_SECRET", "YOUR_CHANNEL_SECRET
 # AI Service 設定
 AI_SERVICE_URL = "http://localhost:5002/api/dispatch" # 指向 flask_ollama_app.py 的位址
 DEFAULT_MODEL = "gemma3:1b"
+# "http": 經由 flask_ollama_app.py 的 API;"inproc": 在本行程直接呼叫 llm.LLM,省去一次 HTTP 往返
+AI_SERVICE_MODE = os.getenv("AI_SERVICE_MODE", "http")
+# AI 服務超過這個秒數還沒回應,就先回覆「思考中」,完成後再用 push 送出結果(設為 0 則一律等完整結果再回覆)
+REPLY_ACK_AFTER = float(os.getenv("REPLY_ACK_AFTER", "3"))
+THINKING_TEXT = "思考中,請稍候..."
+# 等待 AI 服務的讀取逾時(秒);模型冷啟動時生成故事或新聞分析可能超過一分鐘
+AI_SERVICE_TIMEOUT = float(os.getenv("AI_SERVICE_TIMEOUT", "180"))
 
 configuration = Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN)
-handler = WebhookHandler(LINE_CHANNEL_SECRET)
+# 整個行程共用一個 ApiClient:回覆 LINE 時沿用 keep-alive 連線,不必每則訊息重新交握
+_api_client = ApiClient(configuration)
+_messaging_api = MessagingApi(_api_client)
+# WebhookHandler 會同步呼叫處理函式,改用 WebhookParser 取得事件後自行 await
+parser = WebhookParser(LINE_CHANNEL_SECRET)
+
+# 共用一個 AsyncClient:呼叫 AI 服務時沿用連線池中的 keep-alive 連線;連線失敗時自動重試
+# (有指定 transport 時 httpx 會忽略 client 的 limits,所以設定在 transport 上;
+#  AI 服務是 http://localhost,httpx 只在 TLS 上協商 HTTP/2,所以不開 http2)
+_ASYNC_CLIENT = httpx.AsyncClient(
+    transport=httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        retries=2,
+    ),
+    timeout=httpx.Timeout(AI_SERVICE_TIMEOUT, connect=3.0),
+)
+
+
+if AI_SERVICE_MODE == "inproc":
+    from llm import LLM
+    _LLM = LLM(provider="ollama", model=DEFAULT_MODEL)
+
+
+@app.after_serving
+async def close_async_client():
+    await _ASYNC_CLIENT.aclose()
+    _api_client.close()
 
 
-def call_ai_service(user_text):
+def _dispatch_inproc(user_text):
+    """直接呼叫 LLM.dispatch_with_task,並轉成與 HTTP API 相同的回傳格式"""
+    task, content, result = _LLM.dispatch_with_task(user_text)
+    if task == "translator":
+        return {"task_type": "translator", "result": {"original": content, "translated": result}}
+    if task == "news_5w1h":
+        # 解析失敗時與 HTTP API 一樣不帶結果,顯示「無法解析 AI 回應」
+        return {"task_type": "news_summarizer", "result": None if "error" in result else result}
+    if task == "story_teller":
+        return {"task_type": "story_creator", "result": {"topic": content, "story": result}}
+    return {"task_type": "general_question", "result": result}
+
+
+async def call_ai_service(user_text):
     """呼叫後端 AI 服務"""
+    if AI_SERVICE_MODE == "inproc":
+        try:
+            return await asyncio.to_thread(_dispatch_inproc, user_text)
+        except Exception as e:
+            print(f"Error calling AI service: {e}")
+            return {"error": str(e)}
     try:
         payload = {
             "user_request": user_text,
             "model": DEFAULT_MODEL
         }
-        response = requests.post(AI_SERVICE_URL, json=payload)
+        response = await _ASYNC_CLIENT.post(AI_SERVICE_URL, json=payload)
         response.raise_for_status() # 檢查 HTTP 錯誤
         return response.json()
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"Error calling AI service: {e}")
         return {"error": str(e)}
 
@@ -89,43 +144,84 @@ def format_result_for_line(task_result):
 
 
 @app.route("/callback", methods=['POST'])
-def callback():
+async def callback():
     # get X-Line-Signature header value
     signature = request.headers['X-Line-Signature']
 
     # get request body as text
-    body = request.get_data(as_text=True)
+    body = await request.get_data(as_text=True)
     app.logger.info("Request body: " + body)
 
-    # handle webhook body
+    # parse webhook body
     try:
-        handler.handle(body, signature)
+        events = parser.parse(body, signature)
     except InvalidSignatureError:
         app.logger.info("Invalid signature. Please check your channel access token/channel secret.")
         abort(400)
 
+    # 立即回 200 給 LINE,訊息在背景處理:AI 呼叫可能長達 AI_SERVICE_TIMEOUT 秒,
+    # 等它完成才回應會讓 webhook 逾時並被重送;同一次 webhook 內的多則訊息各自並行處理
+    for event in events:
+        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessageContent):
+            app.add_background_task(handle_message, event)
+
     return 'OK'
 
 
-@handler.add(MessageEvent, message=TextMessageContent)
-def handle_message(event):
+def _reply(reply_token, reply_text):
+    _messaging_api.reply_message_with_http_info(
+        ReplyMessageRequest(
+            reply_token=reply_token,
+            messages=[TextMessage(text=reply_text)]
+        )
+    )
+
+
+def _push(to, text):
+    _messaging_api.push_message(
+        PushMessageRequest(
+            to=to,
+            messages=[TextMessage(text=text)]
+        )
+    )
+
+
+def _push_target(source):
+    return getattr(source, "group_id", None) or getattr(source, "room_id", None) or getattr(source, "user_id", None)
+
+
+async def handle_message(event):
+    # 在背景執行,例外不會再傳回 webhook,在這裡記錄下來
+    try:
+        await _handle_message(event)
+    except Exception:
+        app.logger.exception("Failed to handle LINE message")
+
+
+async def _handle_message(event):
     user_text = event.message.text
     
     # 呼叫 AI 服務
-    ai_response = call_ai_service(user_text)
+    ai_task = asyncio.ensure_future(call_ai_service(user_text))
+
+    # 長時間的任務(例如說故事)先回覆「思考中」,讓使用者馬上看到回應,結果完成後再 push
+    push_to = _push_target(event.source)
+    if REPLY_ACK_AFTER > 0 and push_to:
+        try:
+            ai_response = await asyncio.wait_for(asyncio.shield(ai_task), timeout=REPLY_ACK_AFTER)
+        except asyncio.TimeoutError:
+            await asyncio.to_thread(_reply, event.reply_token, THINKING_TEXT)
+            reply_text = format_result_for_line(await ai_task)
+            await asyncio.to_thread(_push, push_to, reply_text)
+            return
+    else:
+        ai_response = await ai_task
     
     # 格式化回應
     reply_text = format_result_for_line(ai_response)
     
-    # 回覆 LINE
-    with ApiClient(configuration) as api_client:
-        line_bot_api = MessagingApi(api_client)
-        line_bot_api.reply_message_with_http_info(
-            ReplyMessageRequest(
-                reply_token=event.reply_token,
-                messages=[TextMessage(text=reply_text)]
-            )
-        )
+    # 回覆 LINE (SDK 是同步的,放到執行緒中執行,不阻塞事件迴圈)
+    await asyncio.to_thread(_reply, event.reply_token, reply_text)
 
 
 if __name__ == "__main__":
@@ -134,6 +230,7 @@ if __name__ == "__main__":
     print("🤖 LINE Bot Service 啟動中...")
     print("=" * 60)
     print(f"📍 服務位址: http://localhost:{PORT}")
-    print(f"🔗 連接 AI 服務: {AI_SERVICE_URL}")
+    print(f"🔗 連接 AI 服務: {AI_SERVICE_URL if AI_SERVICE_MODE == 'http' else 'llm.LLM (inproc)'}")
+    print(f"🏭 正式部署請改用: hypercorn -w 2 -b 0.0.0.0:{PORT} line_bot:app")
     print("=" * 60)
-    app.run(host="0.0.0.0", port=PORT, debug=True)
+    app.run(host="0.0.0.0", port=PORT, debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -1,18 +1,27 @@
 import os
+import asyncio
 import json
-import re
+import functools
+import hashlib
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, Type, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, Type, Union, Literal, Tuple
 from pydantic import BaseModel
 
 # Imports for providers
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
 except ImportError:
     OpenAI = None
+    AsyncOpenAI = None
 
 try:
     import ollama
+    import httpx
 except ImportError:
     ollama = None
 
@@ -31,6 +40,113 @@ class News5W1H(BaseModel):
     how: str
 
 
+# Structured output for the dispatcher: route and extracted payload in one call
+class DispatchDecision(BaseModel):
+    task: Literal["translator", "news_5w1h", "story_teller", "ask_question"]
+    content: str
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+@functools.lru_cache(maxsize=32)
+def _json_instruction_for(schema: Type[BaseModel]) -> str:
+    """JSON-format instruction for providers without native structured output, built once per schema."""
+    fields = schema.model_fields.keys()
+    return f"""
+        Return the result in valid JSON format with these exact keys: {', '.join([f'"{f}"' for f in fields])}.
+        If information is missing, use "Not specified".
+        """
+
+
+# ==========================================
+# Response Cache
+# ==========================================
+
+class LLMCache:
+    """
+    In-process LRU + TTL cache for deterministic LLM calls, keyed by a SHA-256 of the request.
+    get_or_compute also collapses concurrent identical calls into one (single-flight).
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> (threading.Event, [result, error])
+
+    @staticmethod
+    def make_key(**fields) -> str:
+        raw = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute, store: bool = True, store_if=None) -> Any:
+        """
+        Return the cached value for key, or run compute() once while concurrent callers
+        with the same key wait for that result. With store=False only the in-flight
+        dedup applies; store_if(result) can veto caching a result.
+        """
+        if store:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = (threading.Event(), [None, None])
+        event, outcome = inflight
+        if not leader:
+            event.wait()
+            if outcome[1] is not None:
+                raise outcome[1]
+            return outcome[0]
+
+        try:
+            # Another leader may have finished between our cache miss and registering
+            result = self.get(key) if store else None
+            if result is None:
+                result = compute()
+                if store and (store_if is None or store_if(result)):
+                    self.set(key, result)
+            outcome[0] = result
+            return result
+        except Exception as e:
+            outcome[1] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+
+# Only (near-)deterministic calls are cached; sampled output should stay varied
+CACHEABLE_MAX_TEMPERATURE = 0.01
+
+# Shared by every LLM instance in the process
+_LLM_CACHE = LLMCache()
+
+
 # ==========================================
 # Strategy Interface & Concrete Strategies
 # ==========================================
@@ -43,16 +159,35 @@ class LLMProvider(ABC):
         self.api_key = api_key
 
     @abstractmethod
-    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None) -> str:
+    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
         pass
 
     @abstractmethod
     def generate_structured(self, prompt: str, system_prompt: str, schema: Type[BaseModel], model: str = None) -> dict:
         pass
 
+    async def agenerate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
+        """Async generate_text. Providers with an async SDK override this; the default runs the sync call in a thread."""
+        return await asyncio.to_thread(self.generate_text, prompt, system_prompt, temperature, model, max_tokens)
+
     def _get_model(self, override_model: str = None) -> str:
         return override_model or self.default_model
 
+    def _parse_json_fallback(self, text: str) -> dict:
+        """Return the first JSON object that decodes from free-form model output, trying each '{' in turn."""
+        start = text.find("{")
+        if start < 0:
+            return {"error": "Could not parse JSON", "raw_output": text}
+        while start >= 0:
+            try:
+                obj, _ = _JSON_DECODER.raw_decode(text, start)
+                if isinstance(obj, dict):
+                    return obj
+            except json.JSONDecodeError:
+                pass
+            start = text.find("{", start + 1)
+        return {"error": "Invalid JSON returned", "raw_output": text}
+
 
 class OpenAIProvider(LLMProvider):
     def __init__(self, model: str = "gpt-4.1-mini", api_key: str = None):
@@ -63,13 +198,25 @@ class OpenAIProvider(LLMProvider):
         if not key:
             print("Warning: No OpenAI API key provided.")
         self.client = OpenAI(api_key=key)
+        self.aclient = AsyncOpenAI(api_key=key)
 
-    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None) -> str:
+    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
         response = self.client.responses.create(
             model=self._get_model(model),
             instructions=system_prompt,
             input=prompt,
-            temperature=temperature
+            temperature=temperature,
+            **({"max_output_tokens": max_tokens} if max_tokens else {})
+        )
+        return response.output_text
+
+    async def agenerate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
+        response = await self.aclient.responses.create(
+            model=self._get_model(model),
+            instructions=system_prompt,
+            input=prompt,
+            temperature=temperature,
+            **({"max_output_tokens": max_tokens} if max_tokens else {})
         )
         return response.output_text
 
@@ -87,13 +234,20 @@ class OpenAIProvider(LLMProvider):
 
 
 class OllamaProvider(LLMProvider):
+    # Keep the model loaded between calls so the dispatcher's follow-up call skips the reload
+    KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
     def __init__(self, model: str = "gemma3:1b", api_key: str = None):
         super().__init__(model, api_key)
         if ollama is None:
             raise ImportError("Ollama package not installed.")
-        self.client = ollama
+        # Explicit clients hold one keep-alive connection pool each (extra kwargs go to httpx)
+        host = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+        limits = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+        self.client = ollama.Client(host=host, limits=limits)
+        self.aclient = ollama.AsyncClient(host=host, limits=limits)
 
-    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None) -> str:
+    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
         response = self.client.chat(
             model=self._get_model(model),
             messages=[
@@ -102,33 +256,31 @@ class OllamaProvider(LLMProvider):
             ],
             # Note: Ollama python lib options might need 'options' dict for temp, 
             # but sticking to simple chat interface as requested.
+            options={"num_predict": max_tokens} if max_tokens else None,
+            keep_alive=self.KEEP_ALIVE,
+        )
+        return response['message']['content']
+
+    async def agenerate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
+        response = await self.aclient.chat(
+            model=self._get_model(model),
+            messages=[
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': prompt}
+            ],
+            options={"num_predict": max_tokens} if max_tokens else None,
+            keep_alive=self.KEEP_ALIVE,
         )
         return response['message']['content']
 
     def generate_structured(self, prompt: str, system_prompt: str, schema: Type[BaseModel], model: str = None) -> dict:
         # Fallback logic for providers without native structured output
-        # Get schema fields to instruct the model
-        fields = schema.model_fields.keys()
-        json_instruction = f"""
-        Return the result in valid JSON format with these exact keys: {', '.join([f'"{f}"' for f in fields])}.
-        If information is missing, use "Not specified".
-        """
-        
-        full_system_prompt = f"{system_prompt}\n{json_instruction}"
+        full_system_prompt = f"{system_prompt}\n{_json_instruction_for(schema)}"
         
         raw_response = self.generate_text(prompt, full_system_prompt, temperature=0.2, model=model)
         
         return self._parse_json_fallback(raw_response)
 
-    def _parse_json_fallback(self, text: str) -> dict:
-        try:
-            json_match = re.search(r"\{[\s\S]*\}", text)
-            if json_match:
-                return json.loads(json_match.group(0))
-            return {"error": "Could not parse JSON", "raw_output": text}
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON returned", "raw_output": text}
-
 
 class AnthropicProvider(LLMProvider):
     def __init__(self, model: str = "claude-sonnet-4-5", api_key: str = None):
@@ -139,11 +291,24 @@ class AnthropicProvider(LLMProvider):
         if not key:
             print("Warning: No Anthropic API key provided.")
         self.client = anthropic.Anthropic(api_key=key)
+        self.aclient = anthropic.AsyncAnthropic(api_key=key)
 
-    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None) -> str:
+    def generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
         response = self.client.messages.create(
             model=self._get_model(model),
-            max_tokens=1024,
+            max_tokens=max_tokens or 1024,
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature
+        )
+        return response.content[0].text
+
+    async def agenerate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
+        response = await self.aclient.messages.create(
+            model=self._get_model(model),
+            max_tokens=max_tokens or 1024,
             system=system_prompt,
             messages=[
                 {"role": "user", "content": prompt}
@@ -154,23 +319,11 @@ class AnthropicProvider(LLMProvider):
 
     def generate_structured(self, prompt: str, system_prompt: str, schema: Type[BaseModel], model: str = None) -> dict:
         # Reuse fallback logic similar to Ollama
-        fields = schema.model_fields.keys()
-        json_instruction = f"""
-        Return the result in valid JSON format with these exact keys: {', '.join([f'"{f}"' for f in fields])}.
-        If information is missing, use "Not specified".
-        """
-        full_system_prompt = f"{system_prompt}\n{json_instruction}"
+        full_system_prompt = f"{system_prompt}\n{_json_instruction_for(schema)}"
         
         raw_response = self.generate_text(prompt, full_system_prompt, temperature=0.2, model=model)
         
-        # Reuse the parsing logic (could be shared in base class, but kept here for now)
-        try:
-            json_match = re.search(r"\{[\s\S]*\}", raw_response)
-            if json_match:
-                return json.loads(json_match.group(0))
-            return {"error": "Could not parse JSON", "raw_output": raw_response}
-        except json.JSONDecodeError:
-            return {"error": "Invalid JSON returned", "raw_output": raw_response}
+        return self._parse_json_fallback(raw_response)
 
 
 # RAG Imports
@@ -179,6 +332,7 @@ try:
     from langchain_text_splitters import RecursiveCharacterTextSplitter
     from langchain_community.embeddings import OllamaEmbeddings
     from langchain_chroma import Chroma
+    import numpy as np
     HAS_RAG_LIBS = True
 except ImportError:
     HAS_RAG_LIBS = False
@@ -188,21 +342,29 @@ except ImportError:
 # RAG Engine (Local Retrieval)
 # ==========================================
 
+@functools.lru_cache(maxsize=4)
+def get_embeddings(model: str = "all-minilm"):
+    """One OllamaEmbeddings client per model, shared by the RAG engine and the semantic cache."""
+    if not HAS_RAG_LIBS:
+        raise ImportError("RAG libraries (langchain, chroma) not installed.")
+    return OllamaEmbeddings(model=model, base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+
+
 class RAGEngine:
+    # HNSW index parameters, applied when the collection is first created
+    HNSW_METADATA = {"hnsw:space": "cosine", "hnsw:M": 32, "hnsw:construction_ef": 200, "hnsw:search_ef": 64}
+    EMBED_BATCH_SIZE = 64
+    EMBED_WORKERS = 4
+
     def __init__(self, data_dir="rag_data", db_path="rag_data/chroma_db", embedding_model="all-minilm"):
         self.data_dir = data_dir
         self.db_path = db_path
         self.embedding_model = embedding_model
         self.vector_store = None
-        self._embeddings = None
 
     @property
     def embeddings(self):
-        if not self._embeddings:
-            if not HAS_RAG_LIBS:
-                raise ImportError("RAG libraries (langchain, chroma) not installed.")
-            self._embeddings = OllamaEmbeddings(model=self.embedding_model, base_url="http://localhost:11434")
-        return self._embeddings
+        return get_embeddings(self.embedding_model)
 
     def initialize_vector_store(self):
         """Initialize or Create Vector Store"""
@@ -211,30 +373,39 @@ class RAGEngine:
             return
 
         if os.path.exists(self.db_path) and os.listdir(self.db_path):
+            # Open the collection as built: HNSW settings (space included) are fixed at creation,
+            # and passing them here could label an l2-built index as cosine
             self.vector_store = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings)
+            metadata = self.vector_store._collection.metadata or {}
+            if any(metadata.get(k) != v for k, v in self.HNSW_METADATA.items()):
+                print(f"ℹ️ Vector store at {self.db_path} predates the current HNSW settings; "
+                      "delete it and re-index to use them.")
         else:
             self._create_index()
 
+    def _load_one(self, filename: str) -> list:
+        file_path = os.path.join(self.data_dir, filename)
+        try:
+            if filename.endswith(".pdf"):
+                return PyPDFLoader(file_path).load()
+            elif filename.endswith(".docx"):
+                return Docx2txtLoader(file_path).load()
+        except Exception as e:
+            print(f"Error loading {filename}: {e}")
+        return []
+
     def _create_index(self):
         print(f"Creating new vector store from {self.data_dir}...")
-        docs = []
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir, exist_ok=True)
             print(f"Created directory {self.data_dir}. Please put PDF/DOCX files there.")
             return
 
-        for filename in os.listdir(self.data_dir):
-            file_path = os.path.join(self.data_dir, filename)
-            try:
-                if filename.endswith(".pdf"):
-                    loader = PyPDFLoader(file_path)
-                    docs.extend(loader.load())
-                elif filename.endswith(".docx"):
-                    loader = Docx2txtLoader(file_path)
-                    docs.extend(loader.load())
-            except Exception as e:
-                print(f"Error loading {filename}: {e}")
-        
+        docs = []
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            for loaded in pool.map(self._load_one, sorted(os.listdir(self.data_dir))):
+                docs.extend(loaded)
+
         if not docs:
             print("No documents found to index.")
             return
@@ -242,11 +413,23 @@ class RAGEngine:
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         splits = text_splitter.split_documents(docs)
         
-        self.vector_store = Chroma.from_documents(
-            documents=splits, 
-            embedding=self.embeddings, 
-            persist_directory=self.db_path
+        self.vector_store = Chroma(
+            embedding_function=self.embeddings,
+            persist_directory=self.db_path,
+            collection_metadata=self.HNSW_METADATA,
         )
+        # Embed batches concurrently against the Ollama server, then write them with the
+        # precomputed vectors so Chroma does not embed them again
+        batches = [splits[i:i + self.EMBED_BATCH_SIZE] for i in range(0, len(splits), self.EMBED_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=self.EMBED_WORKERS) as pool:
+            vectors = pool.map(lambda batch: self.embeddings.embed_documents([d.page_content for d in batch]), batches)
+            for batch, embeddings in zip(batches, vectors):
+                self.vector_store._collection.add(
+                    ids=[str(uuid.uuid4()) for _ in batch],
+                    documents=[d.page_content for d in batch],
+                    metadatas=[d.metadata for d in batch],
+                    embeddings=embeddings,
+                )
         print("Vector store created.")
 
     def retrieve(self, query: str, k: int = 3) -> str:
@@ -262,6 +445,103 @@ class RAGEngine:
         results = self.vector_store.similarity_search(query, k=k)
         return "\n\n".join([doc.page_content for doc in results])
 
+    def retrieve_many(self, queries: list, k: int = 3) -> list:
+        """retrieve() for several queries: one batched embedding request and one Chroma query."""
+        if not HAS_RAG_LIBS:
+            return ["Error: RAG libraries not installed."] * len(queries)
+
+        if not self.vector_store:
+            self.initialize_vector_store()
+
+        if not self.vector_store:
+            return ["Error: No documents indexed."] * len(queries)
+
+        results = self.vector_store._collection.query(
+            query_embeddings=self.embeddings.embed_documents(queries),
+            n_results=k,
+            include=["documents"],
+        )
+        return ["\n\n".join(docs) for docs in results["documents"]]
+
+
+# ==========================================
+# Semantic Cache (embedding similarity)
+# ==========================================
+
+class SemanticLLMCache:
+    """
+    Returns a stored completion when a new prompt is a near-duplicate of an earlier one
+    (e.g. "Translate Hello" / "translate: Hello"), judged by embedding cosine similarity.
+    Entries are namespaced so only the same provider/model/task/instructions can match.
+
+    Each namespace keeps its unit-normalised embeddings in one contiguous int8 ring buffer
+    of at most `maxsize` rows, with a float32 per-row scale vector (symmetric quantization,
+    a quarter of the float32 footprint). A lookup is a single matrix-vector product
+    rescaled by the row scales: `(matrix @ key) * scales`.
+    """
+
+    # Minimum cosine similarity per task; translation needs a closer match than open Q&A
+    THRESHOLDS = {"translator": 0.95, "qa": 0.92}
+    INITIAL_ROWS = 1024
+
+    def __init__(self, embeddings, maxsize: int = 100_000):
+        self.embeddings = embeddings
+        self.maxsize = maxsize
+        # namespace -> [matrix (rows, dim) int8, scales (rows,) float32, completions, count]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def embed(self, text: str):
+        """Unit-normalised float32 embedding of text."""
+        v = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return v / (np.linalg.norm(v) or 1.0)
+
+    @staticmethod
+    def _quantize(key):
+        scale = float(np.abs(key).max()) / 127.0 or 1.0
+        return np.round(key / scale).astype(np.int8), scale
+
+    def lookup(self, key, namespace: str, task: str) -> Optional[str]:
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is None:
+                return None
+            matrix, scales, completions, count = bucket
+            rows = min(count, len(matrix))
+            scores = (matrix[:rows] @ key) * scales[:rows]
+            best = int(np.argmax(scores))
+            if scores[best] >= self.THRESHOLDS.get(task, 0.92):
+                return completions[best]
+        return None
+
+    def add(self, key, completion: str, namespace: str) -> None:
+        quantized, scale = self._quantize(key)
+        with self._lock:
+            bucket = self._buckets.get(namespace)
+            if bucket is None:
+                rows = min(self.INITIAL_ROWS, self.maxsize)
+                bucket = self._buckets[namespace] = [
+                    np.empty((rows, key.shape[0]), dtype=np.int8),
+                    np.empty(rows, dtype=np.float32),
+                    [None] * rows,
+                    0,
+                ]
+            matrix, scales, completions, count = bucket
+            if count == len(matrix) < self.maxsize:
+                # Grow geometrically until maxsize; after that the oldest row is overwritten
+                rows = min(2 * len(matrix), self.maxsize)
+                grown = np.empty((rows, matrix.shape[1]), dtype=np.int8)
+                grown[:count] = matrix
+                grown_scales = np.empty(rows, dtype=np.float32)
+                grown_scales[:count] = scales
+                bucket[0], bucket[1] = matrix, scales = grown, grown_scales
+                completions.extend([None] * (rows - count))
+            row = count % len(matrix)
+            matrix[row] = quantized
+            scales[row] = scale
+            completions[row] = completion
+            bucket[3] = count + 1
+
 
 # ==========================================
 # Main Factory / Context Class
@@ -273,10 +553,19 @@ class LLM:
     Delegates actual work to the underlying Provider Strategy.
     """
 
-    def __init__(self, provider: str = "openai", model: str = None, api_key: str = None):
+    def __init__(self, provider: str = "openai", model: str = None, api_key: str = None, semantic_cache: bool = None):
         self.provider_name = provider.lower()
         self.provider = self._create_provider(self.provider_name, model, api_key)
-        self.rag_engine = RAGEngine() # Initialize RAG Engine
+        self.cache = _LLM_CACHE
+        # Opt-in (needs the RAG libraries and the Ollama embedding model); shares the RAG engine's embeddings client
+        if semantic_cache is None:
+            semantic_cache = os.getenv("LLM_SEMANTIC_CACHE") == "1"
+        self.semantic_cache = SemanticLLMCache(get_embeddings()) if semantic_cache and HAS_RAG_LIBS else None
+
+    @functools.cached_property
+    def rag_engine(self) -> RAGEngine:
+        """Created on first use; most tasks never touch RAG."""
+        return RAGEngine()
 
     def _create_provider(self, provider_name: str, model: str, api_key: str) -> LLMProvider:
         if provider_name == "openai":
@@ -288,15 +577,79 @@ class LLM:
         else:
             raise ValueError(f"Unknown provider: {provider_name}")
 
-    def ask_question(self, question: str, instructions: str = "You are a helpful assistant.", temperature: float = 0.7, model: str = None) -> str:
-        """General purpose Question & Answering."""
-        return self.provider.generate_text(
-            prompt=question, 
-            system_prompt=instructions, 
-            temperature=temperature, 
-            model=model
+    def _generate_text(self, prompt: str, system_prompt: str, temperature: float, model: str = None, max_tokens: Optional[int] = None) -> str:
+        """
+        provider.generate_text, served from the cache when temperature is ~0.
+        Concurrent identical calls share one request either way.
+        """
+        key = self.cache.make_key(kind="text", provider=self.provider_name, model=self.provider._get_model(model),
+                                  system=system_prompt, prompt=prompt, temp=temperature, max_tokens=max_tokens)
+        return self.cache.get_or_compute(
+            key,
+            lambda: self.provider.generate_text(prompt, system_prompt, temperature, model=model, max_tokens=max_tokens),
+            store=temperature <= CACHEABLE_MAX_TEMPERATURE,
         )
 
+    def _generate_structured(self, prompt: str, system_prompt: str, schema: Type[BaseModel], model: str = None) -> dict:
+        """provider.generate_structured, cached unless the output could not be parsed."""
+        key = self.cache.make_key(kind="structured", provider=self.provider_name, model=self.provider._get_model(model),
+                                  system=system_prompt, prompt=prompt, schema=schema.__name__)
+        return self.cache.get_or_compute(
+            key,
+            lambda: self.provider.generate_structured(prompt, system_prompt, schema, model=model),
+            store_if=lambda result: "error" not in result,
+        )
+
+    def _semantic_cached(self, task: str, text: str, instructions: str, model: str, compute):
+        """Serve compute() from the semantic cache when enabled; cache failures fall back to compute()."""
+        if self.semantic_cache is None:
+            return compute()
+        namespace = "|".join([self.provider_name, self.provider._get_model(model), task,
+                              hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16]])
+        try:
+            key = self.semantic_cache.embed(text)
+            cached = self.semantic_cache.lookup(key, namespace, task)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {e}")
+            return compute()
+
+        result = compute()
+        try:
+            self.semantic_cache.add(key, result, namespace)
+        except Exception as e:
+            print(f"Semantic cache store failed: {e}")
+        return result
+
+    def ask_question(self, question: str, instructions: str = "You are a helpful assistant.", temperature: float = 0.7, model: str = None, use_semantic_cache: bool = True, max_tokens: Optional[int] = None) -> str:
+        """General purpose Question & Answering."""
+        def compute():
+            return self._generate_text(
+                prompt=question, 
+                system_prompt=instructions, 
+                temperature=temperature, 
+                model=model,
+                max_tokens=max_tokens
+            )
+        if not use_semantic_cache:
+            return compute()
+        return self._semantic_cached("qa", question, instructions, model, compute)
+
+    async def aask_question(self, question: str, instructions: str = "You are a helpful assistant.", temperature: float = 0.7, model: str = None, max_tokens: Optional[int] = None) -> str:
+        """Async ask_question for callers running in an event loop (exact cache only)."""
+        if temperature > CACHEABLE_MAX_TEMPERATURE:
+            return await self.provider.agenerate_text(question, instructions, temperature, model=model, max_tokens=max_tokens)
+
+        key = self.cache.make_key(kind="text", provider=self.provider_name, model=self.provider._get_model(model),
+                                  system=instructions, prompt=question, temp=temperature, max_tokens=max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        result = await self.provider.agenerate_text(question, instructions, temperature, model=model, max_tokens=max_tokens)
+        self.cache.set(key, result)
+        return result
+
     def translator(self, text: str, model: str = None) -> str:
         """Translate between Chinese and English."""
         instructions = """You are a professional translator. 
@@ -304,19 +657,23 @@ class LLM:
         If the input is in English, translate it to Traditional Chinese.
         Only return the translated text."""
         
-        return self.ask_question(text, instructions=instructions, temperature=0.3, model=model)
+        return self._semantic_cached(
+            "translator", text, instructions, model,
+            lambda: self.ask_question(text, instructions=instructions, temperature=0.3, model=model, use_semantic_cache=False)
+        )
 
     def story_teller(self, topic: str, model: str = None) -> str:
         """Tell a bedside story about the topic."""
         instructions = "You are a creative storyteller. Write a short bedtime story (approx 100 words)."
         prompt = f"Write a bedtime story about {topic}."
         
-        return self.ask_question(prompt, instructions=instructions, temperature=0.9, model=model)
+        return self.ask_question(prompt, instructions=instructions, temperature=0.9, model=model, use_semantic_cache=False,
+                                 max_tokens=256)
 
     def news_5w1h(self, news_text: str, model: str = None) -> Dict[str, Any]:
         """Extract 5W1H from news text."""
         system_prompt = "You are a professional news analyst. Extract the 5W1H information."
-        return self.provider.generate_structured(
+        return self._generate_structured(
             prompt=news_text,
             system_prompt=system_prompt,
             schema=News5W1H,
@@ -327,41 +684,44 @@ class LLM:
         """
         Intelligent task dispatcher. 
         """
-        classification_prompt = f"""Analyze the user request and determine which function to use.
-        
-        Request: "{user_request}"
-        
+        return self.dispatch_with_task(user_request, model=model)[2]
+
+    def dispatch_with_task(self, user_request: str, model: str = None) -> Tuple[str, str, Any]:
+        """
+        Like dispatcher, but returns (task, content, result): the function routed to
+        ("translator", "news_5w1h", "story_teller" or "ask_question") and the input extracted for it.
+        """
+        system_prompt = """Route the user request to one function and extract that function's input.
+
         Functions:
-        1. translator - For translation (keywords: translate, 翻譯, Chinese, English)
-        2. news_5w1h - For news analysis (keywords: news, 5W1H, summarize news, 分析新聞)
-        3. story_teller - For stories (keywords: story, tell me a story, 故事)
-        4. ask_question - General questions (everything else)
+        1. translator - For translation (keywords: translate, 翻譯, Chinese, English). content: only the text to translate.
+        2. news_5w1h - For news analysis (keywords: news, 5W1H, summarize news, 分析新聞). content: only the news article text.
+        3. story_teller - For stories (keywords: story, tell me a story, 故事). content: only the story topic.
+        4. ask_question - General questions (everything else). content: the user's question."""
         
-        Respond ONLY with the function name: 'translator', 'news_5w1h', 'story_teller', or 'ask_question'."""
-        
-        # Self-delegation for classification
-        func_name = self.ask_question(classification_prompt, temperature=0.0, model=model).strip().lower()
+        # Classification and content extraction in a single structured call
+        decision = self._generate_structured(
+            prompt=user_request,
+            system_prompt=system_prompt,
+            schema=DispatchDecision,
+            model=model
+        )
+        func_name = str(decision.get("task", "")).strip().lower()
+        content = str(decision.get("content") or "").strip() or user_request
         
         print(f"[{self.provider_name}] Dispatcher routing to: {func_name}")
 
         if "translator" in func_name:
-            extract_prompt = f"Extract only the text content that needs to be translated from this request: '{user_request}'. Return only the content."
-            content = self.ask_question(extract_prompt, model=model).strip()
-            if not content: content = user_request
-            return self.translator(content, model=model)
+            return "translator", content, self.translator(content, model=model)
             
         elif "news_5w1h" in func_name:
-            extract_prompt = f"Extract only the news article text from this request: '{user_request}'. Return only the content."
-            content = self.ask_question(extract_prompt, model=model).strip()
-            return self.news_5w1h(content, model=model)
+            return "news_5w1h", content, self.news_5w1h(content, model=model)
             
         elif "story_teller" in func_name:
-            extract_prompt = f"Extract the main topic for the story from this request: '{user_request}'. Return only the topic."
-            topic = self.ask_question(extract_prompt, model=model).strip()
-            return self.story_teller(topic, model=model)
+            return "story_teller", content, self.story_teller(content, model=model)
             
         else:
-            return self.ask_question(user_request, model=model)
+            return "ask_question", user_request, self.ask_question(user_request, model=model)
 
     def rag_query(self, question: str, model: str = None) -> str:
         """
@@ -383,7 +743,7 @@ class LLM:
             f"Context:\n{context}"
         )
         
-        return self.ask_question(question, instructions=system_prompt, model=model)
+        return self.ask_question(question, instructions=system_prompt, model=model, use_semantic_cache=False)
 
 
 # Example Usage & Testing
@@ -430,44 +790,37 @@ if __name__ == "__main__":
                 continue
 
             print(f"🚀 Running 6 Missions for {provider_name}...")
-            
-            try:
-                # Mission 1: Ask Question
-                print(f"  1. [Ask] What is 1+1? -> ", end="", flush=True)
-                res = llm.ask_question("What is 1+1? Answer briefly.")
-                print(f"{res.strip()[:50]}...")
-
-                # Mission 2: Translator
-                print(f"  2. [Translate] 'Hello' -> ", end="", flush=True)
-                res = llm.translator("Hello")
-                print(f"{res.strip()[:50]}...")
-
-                # Mission 3: Story Teller
-                print(f"  3. [Story] Topic 'Coffee' -> ", end="", flush=True)
-                res = llm.story_teller("Coffee")
-                print(f"(Length: {len(res)} chars)")
-
-                # Mission 4: News 5W1H
-                print(f"  4. [News] Analyzing Apple news... -> ", end="", flush=True)
-                res = llm.news_5w1h(news_sample)
-                print(f"Success (Who: {res.get('who', 'Unknown')})")
-
-                # Mission 5: Dispatcher
-                print(f"  5. [Dispatch] 'Tell me a story about a cat' -> ", end="", flush=True)
-                res = llm.dispatcher("Tell me a story about a cat")
+
+            def describe_dispatch(res):
                 if isinstance(res, str):
-                    print(f"Routed to Story (Length: {len(res)} chars)")
-                else: 
-                    print(f"Result type: {type(res)}")
-                
-                # Mission 6: RAG
-                print(f"  6. [RAG] Querying 'What is in the context?' -> ", end="", flush=True)
+                    return f"Routed to Story (Length: {len(res)} chars)"
+                return f"Result type: {type(res)}"
+
+            # (label, call, summary of the result); missions are independent, so run them concurrently
+            missions = [
+                ("1. [Ask] What is 1+1?", lambda: llm.ask_question("What is 1+1? Answer briefly."),
+                 lambda res: f"{res.strip()[:50]}..."),
+                ("2. [Translate] 'Hello'", lambda: llm.translator("Hello"),
+                 lambda res: f"{res.strip()[:50]}..."),
+                ("3. [Story] Topic 'Coffee'", lambda: llm.story_teller("Coffee"),
+                 lambda res: f"(Length: {len(res)} chars)"),
+                ("4. [News] Analyzing Apple news...", lambda: llm.news_5w1h(news_sample),
+                 lambda res: f"Success (Who: {res.get('who', 'Unknown')})"),
+                ("5. [Dispatch] 'Tell me a story about a cat'", lambda: llm.dispatcher("Tell me a story about a cat"),
+                 describe_dispatch),
                 # Note: This might fail gracefully if no docs, but verifies method exists
-                res = llm.rag_query("What is mentioned in the documents?")
-                print(f"{res.strip()[:50]}...")
-
-            except Exception as e:
-                print(f"\n❌ Error during execution: {e}")
+                ("6. [RAG] Querying 'What is in the context?'", lambda: llm.rag_query("What is mentioned in the documents?"),
+                 lambda res: f"{res.strip()[:50]}..."),
+            ]
+
+            with ThreadPoolExecutor(max_workers=len(missions)) as executor:
+                futures = {executor.submit(call): (label, summarize) for label, call, summarize in missions}
+                for future in as_completed(futures):
+                    label, summarize = futures[future]
+                    try:
+                        print(f"  {label} -> {summarize(future.result())}")
+                    except Exception as e:
+                        print(f"  {label} -> ❌ Error during execution: {e}")
 
             print("-" * 60)
 
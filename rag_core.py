@@ -1,5 +1,9 @@
 import os
 import shutil
+import hashlib
+import pickle
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_ollama import OllamaEmbeddings, ChatOllama
@@ -8,14 +12,58 @@ from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate
 
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_one(file_path):
+    """Load one PDF/DOCX file; runs in a worker process, so errors are returned instead of raised."""
+    try:
+        if file_path.endswith(".pdf"):
+            return PyPDFLoader(file_path).load()
+        return Docx2txtLoader(file_path).load()
+    except Exception as e:
+        return e
+
+
 class RAGSystem:
+    # Texts per embedding request / rows per Chroma write
+    EMBED_BATCH_SIZE = 64
+    WRITE_BATCH_SIZE = 1000
+
+    SYSTEM_PROMPT = (
+        "You are a helpful AI assistant for Question-Answering tasks. "
+        "Use the following pieces of retrieved context to answer the question. "
+        "If you don't know the answer, say that you don't know. "
+        "Keep the answer concise."
+        "\n\n"
+        "{context}"
+    )
+
     def __init__(self, data_dir="rag_data", db_path="rag_data/chroma_db_v2", model_name="gemma3:4b", embedding_model="all-minilm"):
         self.data_dir = data_dir
         self.db_path = db_path
+        # Chunks + embeddings per file content hash; lives outside db_path so it survives clear_index
+        self.embed_cache_path = os.path.join(data_dir, f".embed_cache_{embedding_model}.pkl")
         self.model_name = model_name
         self.embedding_model = embedding_model
         self.embeddings = OllamaEmbeddings(model=embedding_model, base_url="http://localhost:11434")
         self.vector_store = None
+
+        # The LLM and QA chain don't depend on the index, so they are built once;
+        # the retrieval chain is rebuilt only when vector_store changes (see _ensure_chain)
+        self._llm = ChatOllama(model=self.model_name, base_url="http://localhost:11434")
+        self._prompt = ChatPromptTemplate.from_messages([
+            ("system", self.SYSTEM_PROMPT),
+            ("human", "{input}"),
+        ])
+        self._qa_chain = create_stuff_documents_chain(self._llm, self._prompt)
+        self._rag_chain = None
+        self._chain_store = None
         
         # Initialize vector store if it exists
         if os.path.exists(self.db_path) and os.listdir(self.db_path):
@@ -33,83 +81,121 @@ class RAGSystem:
         self.vector_store = None
         return "Index cleared."
 
+    def _load_embed_cache(self):
+        try:
+            with open(self.embed_cache_path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+
+    def _save_embed_cache(self, cache):
+        tmp_path = self.embed_cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.embed_cache_path)
+
+    def _embed(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.EMBED_BATCH_SIZE):
+            vectors.extend(self.embeddings.embed_documents(texts[i:i + self.EMBED_BATCH_SIZE]))
+        return vectors
+
     def load_and_index(self):
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             return "Created data directory. Please add files."
             
-        documents = []
         files_found = []
         
         # Check if directory is empty
         if not os.listdir(self.data_dir):
             return "rag_data directory is empty."
 
+        # Unchanged files (same content hash) reuse their cached chunks and embeddings;
+        # only new or modified files are loaded, split and embedded again
+        cache = self._load_embed_cache()
+        new_cache = {}
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+        to_load = []  # (filename, file_path, file_hash) of files missing from the cache
         for filename in os.listdir(self.data_dir):
+            if not filename.endswith((".pdf", ".docx")):
+                continue
             file_path = os.path.join(self.data_dir, filename)
             try:
-                if filename.endswith(".pdf"):
-                    loader = PyPDFLoader(file_path)
-                    documents.extend(loader.load())
-                    files_found.append(filename)
-                elif filename.endswith(".docx"):
-                    loader = Docx2txtLoader(file_path)
-                    documents.extend(loader.load())
-                    files_found.append(filename)
+                file_hash = _file_sha256(file_path)
+            except OSError as e:
+                print(f"Error loading {filename}: {e}")
+                continue
+            if file_hash in cache:
+                new_cache[file_hash] = cache[file_hash]
+                files_found.append(filename)
+            else:
+                to_load.append((filename, file_path, file_hash))
+
+        # PDF parsing is CPU-bound pure Python, so several new files are parsed in separate processes
+        if len(to_load) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(to_load), os.cpu_count() or 1)) as pool:
+                loaded = list(pool.map(_load_one, [file_path for _, file_path, _ in to_load]))
+        else:
+            loaded = [_load_one(file_path) for _, file_path, _ in to_load]
+
+        for (filename, _, file_hash), documents in zip(to_load, loaded):
+            try:
+                if isinstance(documents, Exception):
+                    raise documents
+                splits = text_splitter.split_documents(documents)
+                vectors = self._embed([d.page_content for d in splits])
+                new_cache[file_hash] = {
+                    "pages": len(documents),
+                    "chunks": [(d.page_content, d.metadata, v) for d, v in zip(splits, vectors)],
+                }
+                files_found.append(filename)
             except Exception as e:
                 print(f"Error loading {filename}: {e}")
-        
-        if not documents:
+
+        page_count = sum(entry["pages"] for entry in new_cache.values())
+        chunks = [chunk for entry in new_cache.values() for chunk in entry["chunks"]]
+        if not page_count:
             return "No supported documents (PDF/DOCX) found in rag_data."
 
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = text_splitter.split_documents(documents)
-        
-        self.vector_store = Chroma.from_documents(
-            documents=splits, 
-            embedding=self.embeddings, 
-            persist_directory=self.db_path
-        )
+        if new_cache.keys() != cache.keys():
+            self._save_embed_cache(new_cache)
+
+        self.vector_store = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings)
+        for i in range(0, len(chunks), self.WRITE_BATCH_SIZE):
+            batch = chunks[i:i + self.WRITE_BATCH_SIZE]
+            self.vector_store._collection.add(
+                ids=[str(uuid.uuid4()) for _ in batch],
+                documents=[text for text, _, _ in batch],
+                metadatas=[metadata for _, metadata, _ in batch],
+                embeddings=[vector for _, _, vector in batch],
+            )
         
-        return f"Indexed {len(documents)} pages/chunks from {len(files_found)} files."
+        return f"Indexed {page_count} pages/chunks from {len(files_found)} files."
+
+    def _ensure_chain(self):
+        if self._chain_store is not self.vector_store:
+            retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
+            self._rag_chain = create_retrieval_chain(retriever, self._qa_chain)
+            self._chain_store = self.vector_store
+        return self._rag_chain
 
     def query(self, question):
         if not self.vector_store:
             return {"answer": "Please index the documents first.", "sources": []}
-            
-        retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-        llm = ChatOllama(model=self.model_name, base_url="http://localhost:11434")
-        
-        system_prompt = (
-            "You are a helpful AI assistant for Question-Answering tasks. "
-            "Use the following pieces of retrieved context to answer the question. "
-            "If you don't know the answer, say that you don't know. "
-            "Keep the answer concise."
-            "\n\n"
-            "{context}"
-        )
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "{input}"),
-        ])
-        
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
-        rag_chain = create_retrieval_chain(retriever, question_answer_chain)
         
-        response = rag_chain.invoke({"input": question})
+        response = self._ensure_chain().invoke({"input": question})
         
-        sources = []
-        if "context" in response:
-            for doc in response["context"]:
-                source = doc.metadata.get("source", "Unknown")
-                page = doc.metadata.get("page", None)
-                if page is not None:
-                    sources.append(f"{os.path.basename(source)} (Page {page+1})")
-                else:
-                    sources.append(os.path.basename(source))
+        sources = [
+            f"{os.path.basename(doc.metadata.get('source', 'Unknown'))} (Page {doc.metadata['page'] + 1})"
+            if doc.metadata.get("page") is not None
+            else os.path.basename(doc.metadata.get("source", "Unknown"))
+            for doc in response.get("context", [])
+        ]
         
+        # Dedup in retrieval order, so the most relevant source stays first
         return {
             "answer": response["answer"],
-            "sources": sorted(list(set(sources)))
+            "sources": list(dict.fromkeys(sources))
         }
@@ -1,7 +1,22 @@
 import os
+import re
+import json
 import sys
+import asyncio
 import argparse
 import shutil
+import hashlib
+import heapq
+import zlib
+import uuid
+import sqlite3
+import threading
+import httpx
+import numpy as np
+import itertools
+from array import array
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import OllamaEmbeddings
@@ -9,27 +24,402 @@ from langchain_ollama import ChatOllama
 from langchain_chroma import Chroma
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
 
 # Configuration
 DATA_DIR = "rag_data"
 DB_PATH = "rag_data/chroma_db"
 MODEL_NAME = "gemma3:12b"
 EMBEDDING_MODEL = "all-minilm"
+LOAD_DOCUMENTS_NUMBER_OF_THREADS = int(os.environ.get("LOAD_DOCUMENTS_NUMBER_OF_THREADS", max(1, (os.cpu_count() or 2) - 1)))
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+OLLAMA_LIMITS = httpx.Limits(max_keepalive_connections=40, max_connections=100, keepalive_expiry=30.0)
+EMBED_BATCH_SIZE = 64
+EMBED_WORKERS = 2
+# Keep the chat model loaded between questions: Ollama then reuses the KV cache of the
+# unchanged prompt prefix (QA_SYSTEM_PROMPT up to {context}) instead of re-running prefill
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# These are read by `ollama serve`, not by this process
+OLLAMA_SERVER_ENV_HELP = """\
+Ollama server settings (export before `ollama serve`):
+  OLLAMA_NUM_PARALLEL=4       requests served at once per model, so a chat answer and
+                              page summaries run concurrently instead of queueing
+  OLLAMA_MAX_LOADED_MODELS=2  keep the chat and embedding models loaded together
+"""
+# Near-duplicate chunk detection: bottom-k MinHash over 5-character shingles;
+# the first FUZZY_BANDS hashes of each sketch are indexed to find candidates.
+# With k=256 the Jaccard estimate's standard deviation near 0.95 is ~0.014
+FUZZY_SKETCH_SIZE = 256
+FUZZY_BANDS = 8
+# Opt-in: reuse a cached embedding for a chunk whose estimated Jaccard similarity is at least this
+FUZZY_EMBED_THRESHOLD = float(os.environ["RAG_FUZZY_EMBED_REUSE"]) if os.environ.get("RAG_FUZZY_EMBED_REUSE") else None
+
+# Chunks retrieved per question
+RETRIEVER_K = 3
+# Opt-in: reuse answers for repeated / near-identical stand-alone questions (see SemanticAnswerCache)
+RAG_ANSWER_CACHE = os.environ.get("RAG_ANSWER_CACHE") == "1"
+
+# "page <n> [explain]" command parsing
+PAGE_NUM_RE = re.compile(r'\d+')
+TRANSLATE_KEYWORDS = ("explain", "translate", "翻譯", "解釋")
+
+# Strict prompt to only use context
+QA_SYSTEM_PROMPT = (
+    "You are an assistant for question-answering tasks. "
+    "Use the following pieces of retrieved context to answer "
+    "the question. If you don't know the answer, say that you "
+    "don't know. Use three sentences maximum and keep the "
+    "answer concise."
+    "\n\n"
+    "{context}"
+)
+
+
+def ollama_parallel_warning():
+    """Warning text when OLLAMA_NUM_PARALLEL is not set in this environment, else None."""
+    if os.environ.get("OLLAMA_NUM_PARALLEL"):
+        return None
+    return ("OLLAMA_NUM_PARALLEL is not set; unless the Ollama server sets it, concurrent "
+            "questions and page summaries may be queued one at a time.")
+
+
+def load_document_file(file_path):
+    """Load one PDF/DOCX file into a list of Documents."""
+    if file_path.endswith(".pdf"):
+        return PyPDFLoader(file_path).load()
+    return Docx2txtLoader(file_path).load()
+
+
+def format_source(metadata):
+    """Source label for a retrieved chunk: file name, plus the 1-indexed page for PDFs."""
+    source_file = os.path.basename(metadata.get("source", "Unknown"))
+    page = metadata.get("page")
+    return f"{source_file} (Page {page + 1})" if isinstance(page, int) else source_file
+
+
+def save_pages_sidecar(path, documents):
+    """Write the loaded pages next to the vector store so page lookups don't re-run the loaders."""
+    pages = [{"metadata": doc.metadata, "content": doc.page_content} for doc in documents]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(pages, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_pages_sidecar(path):
+    """Pages written by save_pages_sidecar, or None if there is no sidecar."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            pages = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return [Document(page_content=p["content"], metadata=p["metadata"]) for p in pages]
+
+
+def minhash_sketch(text, k=FUZZY_SKETCH_SIZE, n=5):
+    """Bottom-k MinHash sketch (sorted uint32 hashes) of the text's n-character shingles."""
+    text = " ".join(text.split())
+    shingles = {zlib.crc32(text[i:i + n].encode("utf-8")) for i in range(max(len(text) - n + 1, 1))}
+    return array("I", heapq.nsmallest(k, shingles))
+
+
+def sketch_similarity(a, b, k=FUZZY_SKETCH_SIZE):
+    """Jaccard similarity estimated from two bottom-k sketches."""
+    union = heapq.nsmallest(k, set(a) | set(b))
+    both = set(a) & set(b)
+    return sum(h in both for h in union) / len(union)
+
+
+def quantize_int8(vector):
+    """Symmetric int8 quantization with one float scale per vector."""
+    v = np.asarray(vector, dtype=np.float32)
+    scale = float(np.abs(v).max()) / 127 or 1.0
+    return np.round(v / scale).astype(np.int8), scale
+
+
+def dequantize_int8(q, scale):
+    return (q.astype(np.float32) * scale).tolist()
+
+
+def add_splits_in_batches(vector_store, embeddings, splits):
+    """
+    Embed splits EMBED_BATCH_SIZE at a time (one Ollama request per batch, a few batches in
+    flight) and write them with the precomputed vectors, so Chroma does not embed them again.
+    """
+    batches = [splits[i:i + EMBED_BATCH_SIZE] for i in range(0, len(splits), EMBED_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as pool:
+        vectors = pool.map(lambda batch: embeddings.embed_documents([d.page_content for d in batch]), batches)
+        for batch, batch_vectors in zip(batches, vectors):
+            vector_store._collection.add(
+                ids=[str(uuid.uuid4()) for _ in batch],
+                documents=[d.page_content for d in batch],
+                metadatas=[d.metadata for d in batch],
+                embeddings=batch_vectors,
+            )
+
+
+class EmbeddingCache(Embeddings):
+    """
+    LRU cache in front of an embeddings model; only texts not seen before are sent to Ollama.
+    With persist_path, vectors are also kept in SQLite (as float32 bytes) so a re-index after
+    clearing the vector store only embeds new or changed chunks.
+    A document chunk whose estimated shingle Jaccard similarity to a cached chunk reaches
+    fuzzy_threshold (re-OCR noise, typo fixes) reuses that chunk's vector; None (the default)
+    disables this, since exact-hash reuse already covers an unchanged re-index.
+    With quantize, document vectors go through an int8 round trip: SQLite stores the int8
+    bytes plus a scale (a quarter of float32), and callers get the dequantized vector.
+    """
+
+    def __init__(self, inner, model_name, maxsize=10_000, persist_path=None, fuzzy_threshold=None,
+                 quantize=True):
+        self.inner = inner
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self.fuzzy_threshold = fuzzy_threshold
+        self.quantize = quantize
+        self._cache = OrderedDict()
+        self._sketches = {}  # doc key -> minhash_sketch of its text
+        self._buckets = defaultdict(set)  # leading sketch hash -> doc keys
+        self._lock = threading.Lock()
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings_int8 (key BLOB PRIMARY KEY, scale REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            # Table named by sketch size so sketches of another size are never compared
+            self._sketch_table = f"sketches_{FUZZY_SKETCH_SIZE}"
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {self._sketch_table} (key BLOB PRIMARY KEY, sketch BLOB NOT NULL)")
+            for key, sketch in self._db.execute(f"SELECT key, sketch FROM {self._sketch_table}"):
+                self._add_sketch(key, array("I", sketch))
+
+    def _key(self, kind, text):
+        # Query and document embeddings can use different instructions, so they are cached apart
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).digest()
+
+    def _get(self, key):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                return vector
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT scale, vector FROM embeddings_int8 WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                row = self._db.execute("SELECT NULL, vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        scale, blob = row
+        vector = array("f", blob).tolist() if scale is None else dequantize_int8(np.frombuffer(blob, dtype=np.int8), scale)
+        self._put(key, vector)
+        return vector
+
+    def _put(self, key, vector):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def _add_sketch(self, key, sketch):
+        self._sketches[key] = sketch
+        for h in sketch[:FUZZY_BANDS]:
+            self._buckets[h].add(key)
+
+    def _get_similar(self, sketch):
+        """Vector of the most similar cached chunk at or above fuzzy_threshold, or None."""
+        with self._lock:
+            candidates = set().union(*(self._buckets.get(h, ()) for h in sketch[:FUZZY_BANDS]))
+            scored = sorted(((sketch_similarity(sketch, self._sketches[k]), k) for k in candidates), reverse=True)
+        for score, key in scored:
+            if score < self.fuzzy_threshold:
+                break
+            vector = self._get(key)
+            if vector is not None:
+                return vector
+        return None
+
+    def _persist(self, items, sketches=(), quantized=None):
+        if self._db is None or not items:
+            return
+        with self._lock:
+            if quantized is None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", vector).tobytes()) for key, vector in items],
+                )
+            else:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings_int8 (key, scale, vector) VALUES (?, ?, ?)",
+                    [(key, scale, q.tobytes()) for (key, _), (q, scale) in zip(items, quantized)],
+                )
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO {self._sketch_table} (key, sketch) VALUES (?, ?)",
+                [(key, sketch.tobytes()) for key, sketch in sketches],
+            )
+            self._db.commit()
+
+    def embed_documents(self, texts):
+        keys = [self._key("doc", t) for t in texts]
+        vectors = [self._get(k) for k in keys]
+        misses = [i for i, v in enumerate(vectors) if v is None]
+        if not misses:
+            return vectors
+
+        sketches = []
+        if self.fuzzy_threshold is not None:
+            by_text = {t: minhash_sketch(t) for t in dict.fromkeys(texts[i] for i in misses)}
+            sketches = [(keys[i], by_text[texts[i]]) for i in misses]
+            for i in misses:
+                vectors[i] = self._get_similar(by_text[texts[i]])
+
+        # One request for the remaining misses only, each distinct text embedded once
+        unique = list(dict.fromkeys(texts[i] for i in misses if vectors[i] is None))
+        if unique:
+            fresh = dict(zip(unique, self.inner.embed_documents(unique)))
+            for i in misses:
+                if vectors[i] is None:
+                    vectors[i] = fresh[texts[i]]
+
+        quantized = None
+        if self.quantize:
+            # Chroma is given the same dequantized vector a later cache hit returns
+            quantized = [quantize_int8(vectors[i]) for i in misses]
+            for i, (q, scale) in zip(misses, quantized):
+                vectors[i] = dequantize_int8(q, scale)
+
+        for i in misses:
+            self._put(keys[i], vectors[i])
+        with self._lock:
+            for key, sketch in sketches:
+                self._add_sketch(key, sketch)
+        self._persist([(keys[i], vectors[i]) for i in misses], sketches, quantized)
+        return vectors
+
+    def embed_query(self, text):
+        key = self._key("query", text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self._put(key, vector)
+            self._persist([(key, vector)])
+        return vector
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of query() results. A question whose normalised text was asked before
+    gets the cached answer; a different question only does when its embedding's cosine
+    similarity to a cached one reaches `threshold` AND it retrieved the same context
+    chunks, since MiniLM scores questions differing in one number or name above 0.95.
+    """
+
+    def __init__(self, threshold=0.95, maxsize=1000):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        # Ring buffer of unit-normalised question embeddings, allocated once the dimension is known;
+        # a new entry overwrites the oldest slot, so inserts never copy the matrix
+        self._matrix = None
+        self._results = [None] * maxsize
+        self._questions = [None] * maxsize
+        self._contexts = [None] * maxsize
+        self._exact = {}  # normalised question -> slot
+        self._count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        v = np.asarray(vector, dtype=np.float32)
+        return v / (np.linalg.norm(v) or 1.0)
+
+    @staticmethod
+    def _normalize_text(question):
+        return " ".join(question.lower().split())
+
+    def lookup(self, question, vector, context):
+        with self._lock:
+            slot = self._exact.get(self._normalize_text(question))
+            if slot is not None:
+                return self._results[slot]
+            if not self._count:
+                return None
+            # One BLAS matrix-vector product over the filled rows
+            scores = self._matrix[:self._count] @ self._normalize(vector)
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for slot in candidates[np.argsort(-scores[candidates])]:
+                if self._contexts[slot] == context:
+                    return self._results[slot]
+        return None
+
+    def add(self, question, vector, context, result):
+        row = self._normalize(vector)
+        question = self._normalize_text(question)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((self.maxsize, row.shape[0]), dtype=np.float32)
+            slot = self._next
+            if self._exact.get(self._questions[slot]) == slot:
+                del self._exact[self._questions[slot]]
+            self._matrix[slot] = row
+            self._results[slot] = result
+            self._questions[slot] = question
+            self._contexts[slot] = context
+            self._exact[question] = slot
+            self._next = (slot + 1) % self.maxsize
+            self._count = min(self._count + 1, self.maxsize)
+
+    def clear(self):
+        with self._lock:
+            self._results = [None] * self.maxsize
+            self._questions = [None] * self.maxsize
+            self._contexts = [None] * self.maxsize
+            self._exact = {}
+            self._count = 0
+            self._next = 0
+
 
 class RAGOllamaApp:
-    def __init__(self, data_dir=DATA_DIR, db_path=DB_PATH, model_name=MODEL_NAME, embedding_model=EMBEDDING_MODEL):
+    def __init__(self, data_dir=DATA_DIR, db_path=DB_PATH, model_name=MODEL_NAME, embedding_model=EMBEDDING_MODEL,
+                 answer_cache=RAG_ANSWER_CACHE):
         self.data_dir = data_dir
         self.db_path = db_path
+        self.pages_path = os.path.join(db_path, "pages.json")
         self.model_name = model_name
         self.embedding_model = embedding_model
-        self.embeddings = OllamaEmbeddings(model=embedding_model, base_url="http://localhost:11434")
+        # The persistent cache sits in data_dir, outside db_path, so it survives clear_database
+        os.makedirs(data_dir, exist_ok=True)
+        self.embeddings = EmbeddingCache(
+            OllamaEmbeddings(model=embedding_model, base_url="http://localhost:11434"), embedding_model,
+            persist_path=os.path.join(data_dir, ".embedding_cache.sqlite3"), fuzzy_threshold=FUZZY_EMBED_THRESHOLD,
+        )
         self.vector_store = None
         self.documents = None
+        self._page_map = None  # page number -> content, built from self.documents on first lookup
+        self.answer_cache = SemanticAnswerCache() if answer_cache else None
+        # One chat client for every query and summary, so calls reuse its keep-alive connections
+        self._llm = ChatOllama(model=model_name, base_url="http://localhost:11434", keep_alive=OLLAMA_KEEP_ALIVE,
+                               client_kwargs={"limits": OLLAMA_LIMITS})
+        # Prompt and QA chain don't depend on the index, so they are built once; chat history
+        # goes through a placeholder instead of being baked into a per-query prompt
+        self._prompt = ChatPromptTemplate.from_messages([
+            ("system", QA_SYSTEM_PROMPT),
+            MessagesPlaceholder("history", optional=True),
+            ("human", "{input}"),
+        ])
+        self._qa_chain = create_stuff_documents_chain(self._llm, self._prompt)
+        self._rag_chain = None
+        self._chain_store = None
 
     def clear_database(self):
         """Clear the existing vector store."""
         self.vector_store = None
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
         if os.path.exists(self.db_path):
             try:
                 shutil.rmtree(self.db_path)
@@ -46,18 +436,19 @@ class RAGOllamaApp:
             print(f"Data directory {self.data_dir} not found.")
             return []
 
-        for filename in os.listdir(self.data_dir):
-            file_path = os.path.join(self.data_dir, filename)
-            if filename.endswith(".pdf"):
-                print(f"Loading PDF: {filename}...")
-                loader = PyPDFLoader(file_path)
-                documents.extend(loader.load())
-            elif filename.endswith(".docx"):
-                print(f"Loading DOCX: {filename}...")
-                loader = Docx2txtLoader(file_path)
-                documents.extend(loader.load())
+        paths = []
+        with os.scandir(self.data_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(SUPPORTED_EXTENSIONS):
+                    print(f"Loading {entry.name.rsplit('.', 1)[1].upper()}: {entry.name}...")
+                    paths.append(entry.path)
+
+        # Files are independent, so they are parsed concurrently; map keeps the listing order
+        with ThreadPoolExecutor(max_workers=LOAD_DOCUMENTS_NUMBER_OF_THREADS) as pool:
+            documents = list(itertools.chain.from_iterable(pool.map(load_document_file, paths)))
         
         self.documents = documents
+        self._page_map = None
         return documents
 
     def initialize_vector_store(self):
@@ -82,37 +473,38 @@ class RAGOllamaApp:
             print(f"Split into {len(splits)} chunks.")
 
             # 3. Create Vector Store
-            self.vector_store = Chroma.from_documents(
-                documents=splits, 
-                embedding=self.embeddings, 
-                persist_directory=self.db_path
-            )
+            self.vector_store = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings)
+            add_splits_in_batches(self.vector_store, self.embeddings, splits)
+            save_pages_sidecar(self.pages_path, docs)
             print("Vector store created and persisted.")
 
+    def _build_page_map(self):
+        # Create a map of page number to document content
+        # This assumes self.documents is a flat list of pages/chunks with metadata
+        page_map = {}
+        for i, doc in enumerate(self.documents):
+            # Try to get page number from metadata, default to list index + 1 if missing
+            p_num = doc.metadata.get("page", i)
+            if isinstance(p_num, int):
+                p_num += 1 # 0-indexed to 1-indexed
+            page_map[p_num] = doc.page_content
+        self._page_map = page_map
+        return page_map
+
     def get_page_content(self, page_numbers):
         """Retrieve content for specific pages (1-indexed).
         Note: This works best for PDFs where 'page' metadata exists.
         For DOCX, it might treat the whole doc as one 'page' or index differently.
         """
+        if not self.documents:
+            self.documents = load_pages_sidecar(self.pages_path)
+            self._page_map = None
         if not self.documents:
             print("Loading documents for lookup...")
             self.load_documents()
         
         results = {}
-        # Create a map of page number to document content
-        # This assumes self.documents is a flat list of pages/chunks with metadata
-        
-        # Filter for documents that actually have page numbers (PDFs)
-        # or map index to "page" for others if needed.
-        # For now, we'll stick to the existing logic but handle missing 'page' metadata
-        
-        page_map = {}
-        for i, doc in enumerate(self.documents):
-            # Try to get page number from metadata, default to list index + 1 if missing
-            p_num = doc.metadata.get("page", i)
-            if isinstance(p_num, int):
-                p_num += 1 # 0-indexed to 1-indexed
-            page_map[p_num] = doc.page_content
+        page_map = self._page_map or self._build_page_map()
 
         for page_num in page_numbers:
             if page_num in page_map:
@@ -128,73 +520,79 @@ class RAGOllamaApp:
             "Traditional Chinese (繁體中文) and provide a concise summary.\n\n"
             f"Text:\n{text}"
         )
-        llm = ChatOllama(model=self.model_name, base_url="http://localhost:11434")
-        response = llm.invoke(prompt)
+        response = self._llm.invoke(prompt)
         return response.content
 
+    async def asummarize_text(self, text):
+        """
+        Async summarize_text. Runs the sync client in a worker thread: the shared ChatOllama's
+        async connection pool would stay bound to the first event loop that used it.
+        """
+        return await asyncio.to_thread(self.summarize_text, text)
+
+    def summarize_many(self, texts):
+        """Summarize several texts concurrently; Ollama serves up to OLLAMA_NUM_PARALLEL of them at once."""
+        with ThreadPoolExecutor(max_workers=max(1, len(texts))) as pool:
+            return list(pool.map(self.summarize_text, texts))
+
+    def _ensure_chain(self):
+        """Retrieval + QA chain, rebuilt only when the vector store is replaced."""
+        if self._chain_store is not self.vector_store:
+            retriever = self.vector_store.as_retriever(search_kwargs={"k": RETRIEVER_K})
+            self._rag_chain = create_retrieval_chain(retriever, self._qa_chain)
+            self._chain_store = self.vector_store
+        return self._rag_chain
+
+    def _format_response(self, response):
+        # Deduplicate sources, keeping retrieval order (most relevant first)
+        unique_sources = list(dict.fromkeys(format_source(doc.metadata) for doc in response.get("context", ())))
+        
+        return {
+            "answer": response["answer"],
+            "sources": unique_sources
+        }
+
+    def _probe_answer_cache(self, question, history):
+        """
+        (probe, cached result) when the answer cache is on, else (None, None). Only stand-alone
+        questions are cached; with chat history the answer depends on the conversation.
+        """
+        if self.answer_cache is None or history:
+            return None, None
+        vector = self.embeddings.embed_query(question)
+        # A similar question only reuses an answer that was built from the same retrieved chunks
+        docs = self.vector_store.similarity_search_by_vector(vector, k=RETRIEVER_K)
+        probe = (question, vector, tuple(d.page_content for d in docs))
+        return probe, self.answer_cache.lookup(*probe)
+
     def query(self, question, history=None):
         """Query the RAG system."""
         if not self.vector_store:
             self.initialize_vector_store()
 
-        # 1. Create Retriever
-        retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-
-        # 2. Create LLM
-        llm = ChatOllama(model=self.model_name, base_url="http://localhost:11434")
-
-        # 3. Create Prompt
-        # Strict prompt to only use context
-        system_prompt = (
-            "You are an assistant for question-answering tasks. "
-            "Use the following pieces of retrieved context to answer "
-            "the question. If you don't know the answer, say that you "
-            "don't know. Use three sentences maximum and keep the "
-            "answer concise."
-            "\n\n"
-            "{context}"
-        )
-
-        messages = [("system", system_prompt)]
-        
-        if history:
-            for role, content in history:
-                messages.append((role, content))
-        
-        messages.append(("human", "{input}"))
-
-        prompt = ChatPromptTemplate.from_messages(messages)
+        probe, cached = self._probe_answer_cache(question, history)
+        if cached is not None:
+            return cached
 
-        # 4. Create Chain
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
-        rag_chain = create_retrieval_chain(retriever, question_answer_chain)
+        response = self._ensure_chain().invoke({"input": question, "history": history or []})
+        result = self._format_response(response)
+        if probe is not None:
+            self.answer_cache.add(*probe, result)
+        return result
 
-        # 5. Invoke
-        response = rag_chain.invoke({"input": question})
-        
-        # Extract sources
-        sources = []
-        if "context" in response:
-            for doc in response["context"]:
-                # Try to get page number
-                page = doc.metadata.get("page", None)
-                source_file = os.path.basename(doc.metadata.get("source", "Unknown"))
-                
-                if page is not None and isinstance(page, int):
-                    sources.append(f"{source_file} (Page {page + 1})")
-                else:
-                    sources.append(f"{source_file}")
-        
-        # Deduplicate sources
-        unique_sources = sorted(list(set(sources)))
-        
-        return {
-            "answer": response["answer"],
-            "sources": unique_sources
-        }
+    async def aquery(self, question, history=None):
+        """
+        Async query; several questions can be awaited together with asyncio.gather.
+        query() runs in a worker thread for the same reason as asummarize_text.
+        """
+        return await asyncio.to_thread(self.query, question, history)
 
 def main():
-    parser = argparse.ArgumentParser(description="RAG App using Ollama and local PDF")
+    parser = argparse.ArgumentParser(
+        description="RAG App using Ollama and local PDF",
+        epilog=OLLAMA_SERVER_ENV_HELP,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
     parser.add_argument("--reindex", action="store_true", help="Force re-indexing of the PDF")
     parser.add_argument("--clear", action="store_true", help="Clear the existing database and exit")
     args = parser.parse_args()
@@ -217,7 +615,11 @@ def main():
 
     print("\n=== RAG System Ready (Type 'exit' to quit) ===")
     print(f"Model: {MODEL_NAME}")
-    print(f"Data Directory: {DATA_DIR}\n")
+    print(f"Data Directory: {DATA_DIR}")
+    print(f"OLLAMA_NUM_PARALLEL: {os.environ.get('OLLAMA_NUM_PARALLEL', 'unset')}\n")
+    warning = ollama_parallel_warning()
+    if warning:
+        print(f"Warning: {warning}\n")
     print("Commands:")
     print("  - Ask a question")
     print("  - 'page <n>' to view raw page content")
@@ -243,15 +645,18 @@ def main():
             if user_input.lower().startswith("page"):
                 try:
                     # Extract numbers from the input string
-                    import re
-                    page_nums = [int(n) for n in re.findall(r'\d+', user_input)]
+                    page_nums = [int(n) for n in PAGE_NUM_RE.findall(user_input)]
                     
                     # Check if translation/explanation is requested
-                    keywords = ["explain", "translate", "翻譯", "解釋"]
-                    do_translate = any(k in user_input.lower() for k in keywords)
+                    lowered = user_input.lower()
+                    do_translate = any(k in lowered for k in TRANSLATE_KEYWORDS)
 
                     if page_nums:
                         contents = app.get_page_content(page_nums)
+                        summaries = {}
+                        if do_translate:
+                            print(f"\nTranslating/Summarizing {len(contents)} page(s)...")
+                            summaries = dict(zip(contents, app.summarize_many(list(contents.values()))))
                         for p_num, content in contents.items():
                             print(f"\n--- Page {p_num} ---")
                             # Limit raw output if it's too long and we are going to translate
@@ -262,9 +667,7 @@ def main():
                             print("------------------")
                             
                             if do_translate:
-                                print(f"\nTranslating/Summarizing Page {p_num}...")
-                                summary = app.summarize_text(content)
-                                print(f"\n[中文摘要/翻譯]:\n{summary}\n")
+                                print(f"\n[中文摘要/翻譯]:\n{summaries[p_num]}\n")
                                 print("------------------")
 
                         print()
@@ -1,14 +1,35 @@
 import os
 import shutil
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import OllamaEmbeddings
 from langchain_ollama import ChatOllama
 from langchain_chroma import Chroma
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from rag_ollama import (
+    EmbeddingCache,
+    SemanticAnswerCache,
+    add_splits_in_batches,
+    save_pages_sidecar,
+    load_pages_sidecar,
+    load_document_file,
+    format_source,
+    ollama_parallel_warning,
+    LOAD_DOCUMENTS_NUMBER_OF_THREADS,
+    SUPPORTED_EXTENSIONS,
+    OLLAMA_LIMITS,
+    OLLAMA_KEEP_ALIVE,
+    PAGE_NUM_RE,
+    TRANSLATE_KEYWORDS,
+    RETRIEVER_K,
+    RAG_ANSWER_CACHE,
+    FUZZY_EMBED_THRESHOLD,
+)
 
 # Configuration
 DATA_DIR = "rag_data"
@@ -16,19 +37,55 @@ DB_PATH = "rag_data/chroma_db"
 MODEL_NAME = "gemma3:4b"
 EMBEDDING_MODEL = "all-minilm"
 
+# Strict prompt to only use context
+QA_SYSTEM_PROMPT = (
+    "You are an assistant for question-answering tasks. "
+    "Use the following pieces of retrieved context to answer "
+    "the question. If you don't know the answer, say that you "
+    "don't know. Use three sentences maximum and keep the "
+    "answer concise."
+    "\n\n"
+    "{context}"
+)
+
+
 class RAGOllamaApp:
-    def __init__(self, data_dir=DATA_DIR, db_path=DB_PATH, model_name=MODEL_NAME, embedding_model=EMBEDDING_MODEL):
+    def __init__(self, data_dir=DATA_DIR, db_path=DB_PATH, model_name=MODEL_NAME, embedding_model=EMBEDDING_MODEL,
+                 answer_cache=RAG_ANSWER_CACHE):
         self.data_dir = data_dir
         self.db_path = db_path
+        self.pages_path = os.path.join(db_path, "pages.json")
         self.model_name = model_name
         self.embedding_model = embedding_model
-        self.embeddings = OllamaEmbeddings(model=embedding_model, base_url="http://localhost:11434")
+        # The persistent cache sits in data_dir, outside db_path, so it survives clear_database
+        os.makedirs(data_dir, exist_ok=True)
+        self.embeddings = EmbeddingCache(
+            OllamaEmbeddings(model=embedding_model, base_url="http://localhost:11434"), embedding_model,
+            persist_path=os.path.join(data_dir, ".embedding_cache.sqlite3"), fuzzy_threshold=FUZZY_EMBED_THRESHOLD,
+        )
         self.vector_store = None
         self.documents = None
+        self._page_map = None  # page number -> content, built from self.documents on first lookup
+        self.answer_cache = SemanticAnswerCache() if answer_cache else None
+        # One chat client for every query and summary, so calls reuse its keep-alive connections
+        self._llm = ChatOllama(model=model_name, base_url="http://localhost:11434", keep_alive=OLLAMA_KEEP_ALIVE,
+                               client_kwargs={"limits": OLLAMA_LIMITS})
+        # Prompt and QA chain don't depend on the index, so they are built once; chat history
+        # goes through a placeholder instead of being baked into a per-query prompt
+        self._prompt = ChatPromptTemplate.from_messages([
+            ("system", QA_SYSTEM_PROMPT),
+            MessagesPlaceholder("history", optional=True),
+            ("human", "{input}"),
+        ])
+        self._qa_chain = create_stuff_documents_chain(self._llm, self._prompt)
+        self._rag_chain = None
+        self._chain_store = None
 
     def clear_database(self):
         """Clear the existing vector store."""
         self.vector_store = None
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
         if os.path.exists(self.db_path):
             try:
                 shutil.rmtree(self.db_path)
@@ -40,20 +97,16 @@ class RAGOllamaApp:
 
     def load_documents(self):
         """Load all supported documents from the data directory."""
-        documents = []
         if not os.path.exists(self.data_dir):
             return []
 
-        for filename in os.listdir(self.data_dir):
-            file_path = os.path.join(self.data_dir, filename)
-            if filename.endswith(".pdf"):
-                loader = PyPDFLoader(file_path)
-                documents.extend(loader.load())
-            elif filename.endswith(".docx"):
-                loader = Docx2txtLoader(file_path)
-                documents.extend(loader.load())
+        with os.scandir(self.data_dir) as it:
+            paths = [e.path for e in it if e.is_file() and e.name.endswith(SUPPORTED_EXTENSIONS)]
+        with ThreadPoolExecutor(max_workers=LOAD_DOCUMENTS_NUMBER_OF_THREADS) as pool:
+            documents = list(itertools.chain.from_iterable(pool.map(load_document_file, paths)))
         
         self.documents = documents
+        self._page_map = None
         return documents
 
     def initialize_vector_store(self):
@@ -72,25 +125,31 @@ class RAGOllamaApp:
             splits = text_splitter.split_documents(docs)
 
             # 3. Create Vector Store
-            self.vector_store = Chroma.from_documents(
-                documents=splits, 
-                embedding=self.embeddings, 
-                persist_directory=self.db_path
-            )
+            self.vector_store = Chroma(persist_directory=self.db_path, embedding_function=self.embeddings)
+            add_splits_in_batches(self.vector_store, self.embeddings, splits)
+            save_pages_sidecar(self.pages_path, docs)
             return f"Created new vector store with {len(splits)} chunks."
 
-    def get_page_content(self, page_numbers):
-        """Retrieve content for specific pages (1-indexed)."""
-        if not self.documents:
-            self.load_documents()
-        
-        results = {}
+    def _build_page_map(self):
         page_map = {}
         for i, doc in enumerate(self.documents):
             p_num = doc.metadata.get("page", i)
             if isinstance(p_num, int):
                 p_num += 1 
             page_map[p_num] = doc.page_content
+        self._page_map = page_map
+        return page_map
+
+    def get_page_content(self, page_numbers):
+        """Retrieve content for specific pages (1-indexed)."""
+        if not self.documents:
+            self.documents = load_pages_sidecar(self.pages_path)
+            self._page_map = None
+        if not self.documents:
+            self.load_documents()
+        
+        results = {}
+        page_map = self._page_map or self._build_page_map()
 
         for page_num in page_numbers:
             if page_num in page_map:
@@ -106,57 +165,100 @@ class RAGOllamaApp:
             "Traditional Chinese (繁體中文) and provide a concise summary.\n\n"
             f"Text:\n{text}"
         )
-        llm = ChatOllama(model=self.model_name, base_url="http://localhost:11434")
-        response = llm.invoke(prompt)
+        response = self._llm.invoke(prompt)
         return response.content
 
-    def query(self, question):
-        """Query the RAG system."""
-        if not self.vector_store:
-            self.initialize_vector_store()
+    async def asummarize_text(self, text):
+        """
+        Async summarize_text. Runs the sync client in a worker thread: the shared ChatOllama's
+        async connection pool would stay bound to the first event loop that used it.
+        """
+        return await asyncio.to_thread(self.summarize_text, text)
 
-        retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-        llm = ChatOllama(model=self.model_name, base_url="http://localhost:11434")
-
-        system_prompt = (
-            "You are an assistant for question-answering tasks. "
-            "Use the following pieces of retrieved context to answer "
-            "the question. If you don't know the answer, say that you "
-            "don't know. Use three sentences maximum and keep the "
-            "answer concise."
-            "\n\n"
-            "{context}"
-        )
+    def summarize_many(self, texts):
+        """Summarize several texts concurrently; Ollama serves up to OLLAMA_NUM_PARALLEL of them at once."""
+        with ThreadPoolExecutor(max_workers=max(1, len(texts))) as pool:
+            return list(pool.map(self.summarize_text, texts))
 
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", system_prompt),
-                ("human", "{input}"),
-            ]
-        )
+    def _ensure_chain(self):
+        """Retrieval + QA chain, rebuilt only when the vector store is replaced."""
+        if self._chain_store is not self.vector_store:
+            retriever = self.vector_store.as_retriever(search_kwargs={"k": RETRIEVER_K})
+            self._rag_chain = create_retrieval_chain(retriever, self._qa_chain)
+            self._chain_store = self.vector_store
+        return self._rag_chain
 
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
-        rag_chain = create_retrieval_chain(retriever, question_answer_chain)
-        response = rag_chain.invoke({"input": question})
-        
-        sources = []
-        if "context" in response:
-            for doc in response["context"]:
-                page = doc.metadata.get("page", None)
-                source_file = os.path.basename(doc.metadata.get("source", "Unknown"))
-                
-                if page is not None and isinstance(page, int):
-                    sources.append(f"{source_file} (Page {page + 1})")
-                else:
-                    sources.append(f"{source_file}")
-        
-        unique_sources = sorted(list(set(sources)))
-        
+    def _format_response(self, response):
+        unique_sources = list(dict.fromkeys(format_source(doc.metadata) for doc in response.get("context", ())))
         return {
             "answer": response["answer"],
             "sources": unique_sources
         }
 
+    def _probe_answer_cache(self, question, history):
+        """
+        (probe, cached result) when the answer cache is on, else (None, None). Only stand-alone
+        questions are cached; with chat history the answer depends on the conversation.
+        """
+        if self.answer_cache is None or history:
+            return None, None
+        vector = self.embeddings.embed_query(question)
+        # A similar question only reuses an answer that was built from the same retrieved chunks
+        docs = self.vector_store.similarity_search_by_vector(vector, k=RETRIEVER_K)
+        probe = (question, vector, tuple(d.page_content for d in docs))
+        return probe, self.answer_cache.lookup(*probe)
+
+    def query(self, question, history=None):
+        """Query the RAG system."""
+        if not self.vector_store:
+            self.initialize_vector_store()
+
+        probe, cached = self._probe_answer_cache(question, history)
+        if cached is not None:
+            return cached
+
+        response = self._ensure_chain().invoke({"input": question, "history": history or []})
+        result = self._format_response(response)
+        if probe is not None:
+            self.answer_cache.add(*probe, result)
+        return result
+
+    async def aquery(self, question, history=None):
+        """
+        Async query; several questions can be awaited together with asyncio.gather.
+        query() runs in a worker thread for the same reason as asummarize_text.
+        """
+        return await asyncio.to_thread(self.query, question, history)
+
+    def stream_query(self, question, history=None):
+        """
+        Streaming query: yields answer text pieces as the model decodes them,
+        then the final {"answer", "sources"} dict as the last item.
+        """
+        if not self.vector_store:
+            self.initialize_vector_store()
+
+        probe, cached = self._probe_answer_cache(question, history)
+        if cached is not None:
+            yield cached["answer"]
+            yield cached
+            return
+
+        # The retrieval chain emits the retrieved context once, then the answer token by token
+        response = {"answer": "", "context": []}
+        for chunk in self._ensure_chain().stream({"input": question, "history": history or []}):
+            if "context" in chunk:
+                response["context"] = chunk["context"]
+            piece = chunk.get("answer", "")
+            if piece:
+                response["answer"] += piece
+                yield piece
+
+        result = self._format_response(response)
+        if probe is not None:
+            self.answer_cache.add(*probe, result)
+        yield result
+
 # Streamlit App
 def main():
     st.set_page_config(page_title="RAG Ollama Assistant", layout="wide")
@@ -180,6 +282,9 @@ def main():
         st.header("Configuration")
         st.write(f"**Model:** {MODEL_NAME}")
         st.write(f"**Embedding:** {EMBEDDING_MODEL}")
+        parallel_warning = ollama_parallel_warning()
+        if parallel_warning:
+            st.warning(f"{parallel_warning} Start Ollama with e.g. `OLLAMA_NUM_PARALLEL=4 OLLAMA_MAX_LOADED_MODELS=2 ollama serve`.")
         
         st.divider()
         
@@ -195,10 +300,10 @@ def main():
         
         st.header("Indexed Files")
         if os.path.exists(DATA_DIR):
-            files = os.listdir(DATA_DIR)
-            for f in files:
-                if f.endswith(('.pdf', '.docx')):
-                    st.text(f"📄 {f}")
+            with os.scandir(DATA_DIR) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(SUPPORTED_EXTENSIONS):
+                        st.text(f"📄 {entry.name}")
         else:
             st.warning("Data directory not found!")
 
@@ -232,14 +337,17 @@ def main():
         if prompt.lower().startswith("page"):
             with st.chat_message("assistant"):
                 try:
-                    import re
-                    page_nums = [int(n) for n in re.findall(r'\d+', prompt)]
+                    page_nums = [int(n) for n in PAGE_NUM_RE.findall(prompt)]
                     
-                    keywords = ["explain", "translate", "翻譯", "解釋"]
-                    do_translate = any(k in prompt.lower() for k in keywords)
+                    lowered = prompt.lower()
+                    do_translate = any(k in lowered for k in TRANSLATE_KEYWORDS)
 
                     if page_nums:
                         contents = app.get_page_content(page_nums)
+                        summaries = {}
+                        if do_translate:
+                            with st.spinner(f"Translating {len(contents)} page(s)..."):
+                                summaries = dict(zip(contents, app.summarize_many(list(contents.values()))))
                         response_text = ""
                         for p_num, content in contents.items():
                             response_text += f"**--- Page {p_num} ---**\n\n"
@@ -249,9 +357,7 @@ def main():
                                 response_text += content + "\n\n"
                             
                             if do_translate:
-                                with st.spinner(f"Translating Page {p_num}..."):
-                                    summary = app.summarize_text(content)
-                                    response_text += f"**[中文摘要/翻譯]:**\n{summary}\n\n"
+                                response_text += f"**[中文摘要/翻譯]:**\n{summaries[p_num]}\n\n"
                         
                         st.markdown(response_text)
                         st.session_state.messages.append({"role": "assistant", "content": response_text})
@@ -264,6 +370,7 @@ def main():
         else:
             # Standard RAG Query
             with st.chat_message("assistant"):
+                response_placeholder = st.empty()
                 with st.spinner("Thinking..."):
                     # Get history (last 3 turns, excluding current prompt which is already appended but we want to pass history separately or handle it)
                     # Actually, we haven't appended the current prompt to history passed to LLM yet in the backend logic I wrote?
@@ -283,16 +390,28 @@ def main():
                         role = "human" if msg["role"] == "user" else "ai"
                         formatted_history.append((role, msg["content"]))
 
-                    result = app.query(prompt, history=formatted_history)
-                    answer = result["answer"]
-                    sources = result["sources"]
-                    
-                    full_response = f"{answer}\n\n"
-                    if sources:
-                        full_response += f"**Sources:** {', '.join(sources)}"
-                    
-                    st.markdown(full_response)
-                    st.session_state.messages.append({"role": "assistant", "content": full_response})
+                    pieces = app.stream_query(prompt, history=formatted_history)
+                    # The spinner only covers retrieval and prefill; it goes away with the first token
+                    first = next(pieces)
+
+                # Render tokens as they arrive; the last item from stream_query is the full result
+                streamed = ""
+                for piece in itertools.chain([first], pieces):
+                    if isinstance(piece, dict):
+                        result = piece
+                        break
+                    streamed += piece
+                    response_placeholder.markdown(streamed + "▌")
+
+                answer = result["answer"]
+                sources = result["sources"]
+
+                full_response = f"{answer}\n\n"
+                if sources:
+                    full_response += f"**Sources:** {', '.join(sources)}"
+
+                response_placeholder.markdown(full_response)
+                st.session_state.messages.append({"role": "assistant", "content": full_response})
 
 if __name__ == "__main__":
     main()
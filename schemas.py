@@ -0,0 +1,38 @@
+"""
+Shared structured-output schemas
+
+The Pydantic models are defined once here and imported by every script, and
+their JSON schemas are computed once at import time instead of on every call.
+"""
+from pydantic import BaseModel, ConfigDict
+
+
+# 定義 5W1H 的 JSON Schema
+class News5W1H(BaseModel):
+    # Strict structured outputs require additionalProperties: false
+    model_config = ConfigDict(extra="forbid")
+
+    who: str      # 誰 - 新聞主角
+    what: str     # 什麼事 - 發生的事件
+    when: str     # 何時 - 時間
+    where: str    # 何地 - 地點
+    why: str      # 為何 - 原因
+    how: str      # 如何 - 方法或過程
+
+
+# 多則新聞一次分析時的輸出格式
+class News5W1HList(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    items: list[News5W1H]
+
+
+# Precomputed schema and `text.format` payload for calls that bypass responses.parse
+# (raw responses.create, Batch API request bodies)
+NEWS_5W1H_SCHEMA = News5W1H.model_json_schema()
+NEWS_5W1H_TEXT_FORMAT = {
+    "type": "json_schema",
+    "name": "News5W1H",
+    "schema": NEWS_5W1H_SCHEMA,
+    "strict": True,
+}